@@ -0,0 +1,27 @@
+import argparse
+import logging
+import time
+from synthetic import synthetic_features
+from train_model import train_isolation_forest
+
+def main(args):
+    logging.basicConfig(level=logging.WARNING)
+    X = synthetic_features(args.rows)
+    print(f"Training {args.trees} trees on {args.rows:,} synthetic rows (n_jobs={args.n_jobs})")
+    for chunk in args.chunks:
+        start = time.perf_counter()
+        train_isolation_forest(X, total_estimators=args.trees, n_jobs=args.n_jobs,
+                               chunk_trees=chunk, progress=lambda built, total: None)
+        elapsed = time.perf_counter() - start
+        label = "one tree per fit (old loop)" if chunk == 1 else (
+            "all trees in one fit" if chunk == 0 else f"{chunk} trees per fit")
+        print(f"{label:>28}: {elapsed:8.2f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare chunked and per-tree forest training.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic dataset size")
+    parser.add_argument("--trees", type=int, default=100, help="Total number of trees")
+    parser.add_argument("--n_jobs", type=int, default=-1, help="Number of parallel jobs")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1, 25, 0],
+                        help="chunk_trees values to compare (1 = old loop, 0 = single fit)")
+    main(parser.parse_args())
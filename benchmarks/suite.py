@@ -0,0 +1,295 @@
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+from synthetic import synthetic_features, synthetic_frames
+
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.json")
+DEFAULT_THRESHOLD = 0.10
+BENCHMARKS = ("extract", "capture_writer", "load_data", "training", "detection")
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB (None if unavailable)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB everywhere else.
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+def timed_calls(func, items) -> dict:
+    """Call ``func`` on every item, returning throughput and per-call latency percentiles."""
+    latencies = np.empty(len(items), dtype=np.int64)
+    clock = time.perf_counter_ns
+    started = clock()
+    for i, item in enumerate(items):
+        start = clock()
+        func(item)
+        latencies[i] = clock() - start
+    elapsed = (clock() - started) / 1e9
+    return {
+        "per_s": len(items) / elapsed,
+        "p50_us": float(np.percentile(latencies, 50)) / 1e3,
+        "p99_us": float(np.percentile(latencies, 99)) / 1e3,
+    }
+
+def timed_once(func, items: int) -> dict:
+    """Time a single call processing ``items`` items."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    return {"seconds_s": elapsed, "per_s": items / elapsed}
+
+def bench_extract(args) -> dict:
+    """Feature extraction (scapy reference, fast scapy path, raw frames, batched) and encoding."""
+    from scapy.layers.l2 import Ether
+    from encoding import FeatureEncoding
+    from features import (HEADERS, extract_features, extract_features_scapy,
+                          extract_features_frame, extract_features_batch)
+
+    frames = synthetic_frames(args.packets)
+    packets = [Ether(frame) for frame in frames]
+    batches = [frames[i:i + args.batch_size] for i in range(0, len(frames), args.batch_size)]
+    batched = timed_calls(extract_features_batch, batches)
+    encoding = FeatureEncoding(HEADERS)
+    rows = [extract_features_batch(batch)[0] for batch in batches]
+    encoded = timed_calls(encoding.transform, rows)
+    return {
+        "scapy": timed_calls(extract_features_scapy, packets),
+        "fast": timed_calls(extract_features, packets),
+        "frame": timed_calls(extract_features_frame, frames),
+        # Latencies are per batch; throughput is per packet.
+        "batch": dict(batched, per_s=batched["per_s"] * args.batch_size),
+        "encode": dict(encoded, per_s=encoded["per_s"] * args.batch_size),
+    }
+
+def bench_capture_writer(args) -> dict:
+    """Row-at-a-time writes through CaptureWriter, as the capture callback does."""
+    from capture_writer import CaptureWriter
+
+    rows = [tuple(row) for row in synthetic_features(args.rows).tolist()]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, name in (("csv", "capture.csv"), ("npy", "capture")):
+            writer = CaptureWriter(os.path.join(tmp, name), fmt)
+            start = time.perf_counter()
+            stats = timed_calls(writer.write, rows)
+            writer.close()
+            # Throughput includes the final flush to disk.
+            stats["per_s"] = len(rows) / (time.perf_counter() - start)
+            results[fmt] = stats
+    return results
+
+def bench_load_data(args) -> dict:
+    """train_model.load_data on CSV and npy captures of ``--rows`` rows, loaded and mapped."""
+    from capture_writer import CaptureWriter
+    from train_model import load_data
+
+    data = synthetic_features(args.rows)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, name in (("csv", "capture.csv"), ("npy", "capture")):
+            path = os.path.join(tmp, name)
+            writer = CaptureWriter(path, fmt)
+            writer.write_block(data)
+            writer.close()
+            results[fmt] = timed_once(lambda: load_data(path), args.rows)
+        # The first mapping builds the float32 training matrix; later ones reuse it.
+        results["npy_mmap_build"] = timed_once(lambda: load_data(path, mmap=True), args.rows)
+        results["npy_mmap"] = timed_once(lambda: load_data(path, mmap=True), args.rows)
+    return results
+
+def bench_training(args) -> dict:
+    """train_isolation_forest at every ``--train-rows`` size and ``--n-jobs`` value."""
+    from encoding import FeatureEncoding
+    from features import HEADERS
+    from train_model import train_isolation_forest, MATRIX_DTYPE
+
+    results = {}
+    for rows in args.train_rows:
+        X = FeatureEncoding(HEADERS).transform(synthetic_features(rows), MATRIX_DTYPE)
+        for n_jobs in args.n_jobs:
+            results[f"{rows}_rows_{n_jobs}_jobs"] = timed_once(
+                lambda: train_isolation_forest(X, total_estimators=args.trees, n_jobs=n_jobs,
+                                               progress=lambda built, total: None),
+                rows,
+            )
+    return results
+
+def bench_detection(args) -> dict:
+    """detect_threat per packet against BatchDetector, with sklearn and compiled models."""
+    from scapy.layers.l2 import Ether
+    from encoding import EncodedModel, FeatureEncoding
+    from features import HEADERS, extract_features_batch
+    from forest import CompiledForest
+    from ids import detect_threat, BatchDetector
+    from train_model import train_isolation_forest, MATRIX_DTYPE
+
+    frames = synthetic_frames(args.packets)
+    encoding = FeatureEncoding(HEADERS)
+    # Trained on the same traffic, so only the usual share of packets is reported.
+    model = train_isolation_forest(encoding.transform(extract_features_batch(frames)[0], MATRIX_DTYPE),
+                                   total_estimators=args.trees, progress=lambda built, total: None)
+    results = {}
+    for name, forest in (("sklearn", model), ("compiled", CompiledForest.from_sklearn(model))):
+        # Detectors score raw records, as with a model loaded by ids.load_model.
+        scorer = EncodedModel(forest, encoding)
+        # Single-packet scoring is slow with sklearn, so it gets a smaller sample.
+        packets = [Ether(frame) for frame in frames[:args.single_packets]]
+        results[f"single_{name}"] = timed_calls(lambda p: detect_threat(p, scorer), packets)
+
+        detector = BatchDetector(scorer, args.batch_size, max_latency_ms=1e9)
+        flush_latencies = []
+        original_flush = detector._flush_locked
+
+        def timed_flush():
+            start = time.perf_counter_ns()
+            original_flush()
+            flush_latencies.append(time.perf_counter_ns() - start)
+
+        detector._flush_locked = timed_flush
+        start = time.perf_counter()
+        for frame in frames:
+            detector.add_frame(frame, 1)
+        detector.flush()
+        elapsed = time.perf_counter() - start
+        latencies = np.asarray(flush_latencies)
+        results[f"batch_{name}"] = {
+            "per_s": len(frames) / elapsed,
+            # Latency of scoring and reporting one full batch.
+            "p50_us": float(np.percentile(latencies, 50)) / 1e3,
+            "p99_us": float(np.percentile(latencies, 99)) / 1e3,
+        }
+    return results
+
+def run_benchmark(name: str, args, conn) -> None:
+    """Run one benchmark in this (fresh) process and send back its results and peak RSS."""
+    logging.basicConfig(level=logging.WARNING)
+    started = time.perf_counter()
+    results = globals()[f"bench_{name}"](args)
+    results["process"] = {"wall_s": time.perf_counter() - started, "peak_rss_mb": peak_rss_mb()}
+    conn.send(results)
+    conn.close()
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """Flatten nested results into ``{"a.b.metric": value}``."""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Return the metrics that got worse than the baseline by more than ``threshold``.
+
+    Metrics ending in ``per_s`` are better when higher; all the others
+    (latencies, seconds and RSS) are better when lower.
+    """
+    current, previous = flatten(results["benchmarks"]), flatten(baseline["benchmarks"])
+    regressions = []
+    for metric in sorted(current.keys() & previous.keys()):
+        new, old = current[metric], previous[metric]
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if metric.endswith("per_s") else change
+        if worse > threshold:
+            regressions.append((metric, old, new, change))
+    return regressions
+
+def main(args):
+    names = args.only or BENCHMARKS
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "benchmarks": {},
+    }
+    # A fresh process per benchmark keeps peak RSS figures independent. It is not
+    # a daemon (unlike Pool workers), so joblib may still start its own workers.
+    context = mp.get_context("spawn")
+    for name in names:
+        print(f"⏱️ Running {name}...", flush=True)
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=run_benchmark, args=(name, args, sender))
+        process.start()
+        sender.close()
+        try:
+            results["benchmarks"][name] = receiver.recv()
+        except EOFError:
+            process.join()
+            print(f"❌ {name} failed (exit code {process.exitcode})")
+            return 1
+        process.join()
+        for metric, value in flatten(results["benchmarks"][name]).items():
+            print(f"   {metric:<40} {value:14,.2f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✔️ Results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✔️ Baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.threshold)
+    if not regressions:
+        print(f"✔️ No regressions over {args.threshold:.0%} against {args.baseline}")
+        return 0
+    print(f"❌ {len(regressions)} regression(s) against {args.baseline}:")
+    for metric, old, new, change in regressions:
+        print(f"   {metric:<40} {old:14,.2f} -> {new:14,.2f} ({change:+.1%})")
+    return 1
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the capture, training and detection paths on synthetic data."
+    )
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Benchmarks to run")
+    parser.add_argument("--packets", type=int, default=20_000,
+                        help="Synthetic packets for extraction and batched detection")
+    parser.add_argument("--single-packets", type=int, default=2_000,
+                        help="Packets scored one at a time with detect_threat")
+    parser.add_argument("--rows", type=int, default=200_000,
+                        help="Feature rows written and loaded by the I/O benchmarks")
+    parser.add_argument("--train-rows", type=int, nargs="+", default=[10_000, 100_000],
+                        help="Training set sizes")
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1, -1],
+                        help="n_jobs values used for training")
+    parser.add_argument("--trees", type=int, default=50, help="Trees per forest")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Batch size for batched extraction and detection")
+    parser.add_argument("--output", type=str, default=RESULTS_FILE, help="Where to write the JSON results")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="Baseline JSON to compare against; regressions exit with status 1")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the --baseline file instead of comparing")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown flagged as a regression (0.10 = 10%%)")
+    args = parser.parse_args()
+    if args.save_baseline and not args.baseline:
+        parser.error("--save-baseline needs --baseline")
+    sys.exit(main(args))
@@ -0,0 +1,62 @@
+import os
+import struct
+import sys
+import numpy as np
+
+# Benchmarks import the scripts the same way the scripts import each other.
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+def synthetic_features(n_rows: int, seed: int = 0) -> np.ndarray:
+    """Generate capture-like feature rows (src_ip, dst_ip, ports, protocol, size).
+
+    Most rows come from a small set of hosts and well-known services, with a
+    long tail of random traffic, so the model sees a realistic mix of
+    repeated and unusual rows.
+    """
+    rng = np.random.default_rng(seed)
+    hosts = rng.integers(0, 2 ** 32, size=64)
+    services = np.array([80, 443, 53, 22, 123, 8080])
+    data = np.empty((n_rows, 6), dtype=np.int64)
+    data[:, 0] = hosts[rng.integers(0, len(hosts), n_rows)]
+    data[:, 1] = hosts[rng.integers(0, len(hosts), n_rows)]
+    data[:, 2] = rng.integers(1024, 65536, n_rows)
+    data[:, 3] = services[rng.integers(0, len(services), n_rows)]
+    data[:, 4] = rng.choice([6, 17, 1], size=n_rows, p=[0.8, 0.18, 0.02])
+    data[:, 5] = np.clip(rng.lognormal(5.5, 1.0, n_rows), 42, 1514).astype(np.int64)
+    tail = rng.random(n_rows) < 0.01
+    data[tail, 0] = rng.integers(0, 2 ** 32, tail.sum())
+    data[tail, 3] = rng.integers(0, 65536, tail.sum())
+    data[data[:, 4] != 6, 2:4] = 0
+    return data
+
+def synthetic_frames(n_frames: int, seed: int = 0) -> list:
+    """Generate raw Ethernet/IPv4 frames with the same traffic mix.
+
+    Frames are packed with ``struct`` rather than built with scapy, so large
+    datasets are cheap to create. TCP, UDP and ICMP are all represented.
+    """
+    rng = np.random.default_rng(seed)
+    hosts = rng.integers(0, 2 ** 32, size=64, dtype=np.uint64)
+    services = np.array([80, 443, 53, 22, 123, 8080])
+    src = hosts[rng.integers(0, len(hosts), n_frames)]
+    dst = hosts[rng.integers(0, len(hosts), n_frames)]
+    sport = rng.integers(1024, 65536, n_frames)
+    dport = services[rng.integers(0, len(services), n_frames)]
+    proto = rng.choice([6, 17, 1], size=n_frames, p=[0.8, 0.18, 0.02])
+    size = np.clip(rng.lognormal(5.5, 1.0, n_frames), 60, 1514).astype(np.int64)
+    ethernet = b"\x02\x00\x00\x00\x00\x01\x02\x00\x00\x00\x00\x02\x08\x00"
+    frames = []
+    for i in range(n_frames):
+        if proto[i] == 6:
+            l4 = struct.pack("!HHIIBBHHH", sport[i], dport[i], i, 0, 0x50, 0x18, 65535, 0, 0)
+        elif proto[i] == 17:
+            l4 = struct.pack("!HHHH", sport[i], dport[i], size[i] - 34, 0)
+        else:
+            l4 = struct.pack("!BBHHH", 8, 0, 0, 1, i & 0xFFFF)
+        ip = struct.pack("!BBHHHBBHII", 0x45, 0, size[i] - 14, i & 0xFFFF, 0, 64,
+                         proto[i], 0, src[i], dst[i])
+        frame = ethernet + ip + l4
+        frames.append(frame.ljust(size[i], b"\0"))
+    return frames
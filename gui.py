@@ -1,21 +1,239 @@
 import sys
 import os
+import codecs
+from collections import deque
+from datetime import datetime
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QPlainTextEdit, QLabel, QSizePolicy, QProgressBar, QMessageBox,
-    QFrame, QSpacerItem
+    QFrame, QSpacerItem, QCheckBox, QLineEdit, QListWidget, QListWidgetItem
 )
-from PySide6.QtCore import QProcess, Qt, QTimer
-from PySide6.QtGui import QPalette, QColor, QFont
+from PySide6.QtCore import QProcess, Qt, QTimer, QPointF, QRectF
+from PySide6.QtGui import QPalette, QColor, QFont, QPainter, QPen, QPolygonF
+import numpy as np
+
+# The scripts' IPC framing is shared with the dashboard.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from ipc import FrameDecoder, VERDICTS, COUNTERS, PROGRESS, SCORE_RANGE, SCORE_BINS, TOP_TALKERS
+
+# Buffered output is written to the console at most once per tick (~30 Hz).
+CONSOLE_REFRESH_MS = 33
+# Oldest lines are dropped beyond this, both in the console and in the buffer.
+CONSOLE_MAX_LINES = 5000
+# Lines kept by the "Anomalies only" filter: threats, plus errors so failures stay visible.
+ALERT_MARKERS = ("🚨", "❌")
+# Seconds of per-second aggregates kept for the charts.
+HISTORY_SECONDS = 300
+# The score distribution and top talkers cover the most recent window.
+CHART_WINDOW_SECONDS = 60
+
+def format_ip(ip):
+    return ".".join(str(ip >> shift & 0xFF) for shift in (24, 16, 8, 0))
+
+class TrafficHistory:
+    """Per-second verdict aggregates in fixed-size NumPy ring buffers.
+
+    Each verdict frame from the detector fills one row; once full, the oldest
+    row is overwritten, so memory stays constant however long a run lasts.
+    """
+
+    def __init__(self, size=HISTORY_SECONDS):
+        self.size = size
+        self.packets = np.zeros(size)
+        self.anomalies = np.zeros(size)
+        self.histograms = np.zeros((size, SCORE_BINS))
+        self.talkers = np.zeros((size, TOP_TALKERS, 3), dtype=np.int64)  # address, packets, anomalies
+        self.clear()
+
+    def clear(self):
+        self.next = 0
+        self.count = 0
+        self.histograms[:] = 0
+        self.talkers[:] = 0
+
+    def append(self, interval, scored, anomalies, histogram, talkers):
+        row = self.next
+        # Counts per second; the last frame of a run may cover less than a second.
+        seconds = max(interval, 1.0)
+        self.packets[row] = scored / seconds
+        self.anomalies[row] = anomalies / seconds
+        self.histograms[row] = 0
+        self.histograms[row, :len(histogram)] = histogram[:SCORE_BINS]
+        self.talkers[row] = 0
+        if talkers:
+            talkers = talkers[:TOP_TALKERS]
+            self.talkers[row, :len(talkers)] = talkers
+        self.next = (row + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def _rows(self, seconds):
+        """Indices of the last ``seconds`` rows, oldest first."""
+        n = min(seconds, self.count)
+        return (self.next - n + np.arange(n)) % self.size
+
+    def series(self, values, seconds=HISTORY_SECONDS):
+        return values[self._rows(seconds)]
+
+    def anomaly_rate(self, seconds=HISTORY_SECONDS):
+        rows = self._rows(seconds)
+        packets = self.packets[rows]
+        return np.divide(self.anomalies[rows], packets, out=np.zeros(len(rows)), where=packets > 0)
+
+    def score_distribution(self, seconds=CHART_WINDOW_SECONDS):
+        return self.histograms[self._rows(seconds)].sum(axis=0)
+
+    def top_talkers(self, seconds=CHART_WINDOW_SECONDS, n=TOP_TALKERS):
+        """``(address, packets, anomalies)`` rows of the busiest sources in the window."""
+        rows = self.talkers[self._rows(seconds)].reshape(-1, 3)
+        rows = rows[rows[:, 1] > 0]
+        if not len(rows):
+            return []
+        addresses, inverse = np.unique(rows[:, 0], return_inverse=True)
+        packets = np.bincount(inverse, weights=rows[:, 1])
+        anomalies = np.bincount(inverse, weights=rows[:, 2])
+        order = np.argsort(packets)[::-1][:n]
+        return [(int(addresses[i]), int(packets[i]), int(anomalies[i])) for i in order]
+
+class Chart(QWidget):
+    """A small dark chart panel; subclasses draw their data in ``draw``."""
+
+    def __init__(self, title, color):
+        super().__init__()
+        self.title = title
+        self.color = QColor(color)
+        self.caption = ""
+        self.setMinimumSize(160, 110)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), QColor("#1E1E1E"))
+        painter.setPen(QColor("#AAAAAA"))
+        painter.drawText(QRectF(8, 4, self.width() - 16, 16), Qt.AlignLeft, self.title)
+        painter.setPen(QColor("#E0E0E0"))
+        painter.drawText(QRectF(8, 4, self.width() - 16, 16), Qt.AlignRight, self.caption)
+        self.draw(painter, QRectF(8, 24, self.width() - 16, self.height() - 30))
+        painter.end()
+
+    def draw(self, painter, area):
+        raise NotImplementedError
+
+class LineChart(Chart):
+    """A time series, scaled to its own maximum."""
+
+    def __init__(self, title, color, fmt):
+        super().__init__(title, color)
+        self.fmt = fmt
+        self.values = np.zeros(0)
+
+    def set_values(self, values):
+        self.values = values
+        self.caption = self.fmt.format(values[-1]) if len(values) else ""
+        self.update()
+
+    def draw(self, painter, area):
+        if len(self.values) < 2:
+            return
+        top = self.values.max() or 1.0
+        x = area.left() + area.width() * np.arange(len(self.values)) / (len(self.values) - 1)
+        y = area.bottom() - area.height() * self.values / top
+        painter.setPen(QPen(self.color, 1.5))
+        painter.drawPolyline(QPolygonF([QPointF(a, b) for a, b in zip(x.tolist(), y.tolist())]))
+
+class HistogramChart(Chart):
+    """Score distribution; bins below zero (anomalies) are drawn in red."""
+
+    def __init__(self, title, color):
+        super().__init__(title, color)
+        self.counts = np.zeros(SCORE_BINS)
+        self.centers = np.linspace(*SCORE_RANGE, SCORE_BINS + 1)[:-1] + (
+            SCORE_RANGE[1] - SCORE_RANGE[0]) / SCORE_BINS / 2
+
+    def set_counts(self, counts):
+        self.counts = counts
+        total = counts.sum()
+        self.caption = f"{counts[self.centers < 0].sum() / total:.1%} < 0" if total else ""
+        self.update()
+
+    def draw(self, painter, area):
+        top = self.counts.max()
+        if not top:
+            return
+        width = area.width() / len(self.counts)
+        for i, count in enumerate(self.counts.tolist()):
+            height = area.height() * count / top
+            color = QColor("#E74C3C") if self.centers[i] < 0 else self.color
+            painter.fillRect(QRectF(area.left() + i * width + 1, area.bottom() - height,
+                                    width - 2, height), color)
+
+class TalkersChart(Chart):
+    """Busiest source addresses as horizontal bars, anomalies in red."""
+
+    def __init__(self, title, color):
+        super().__init__(title, color)
+        self.talkers = []
+
+    def set_talkers(self, talkers):
+        self.talkers = talkers
+        self.update()
+
+    def draw(self, painter, area):
+        if not self.talkers:
+            return
+        top = self.talkers[0][1]
+        row = area.height() / TOP_TALKERS
+        for i, (address, packets, anomalies) in enumerate(self.talkers):
+            y = area.top() + i * row
+            painter.fillRect(QRectF(area.left(), y + 1, area.width() * packets / top, row - 2),
+                             QColor(self.color.red(), self.color.green(), self.color.blue(), 90))
+            painter.fillRect(QRectF(area.left(), y + 1, area.width() * anomalies / top, row - 2),
+                             QColor("#E74C3C"))
+            painter.setPen(QColor("#E0E0E0"))
+            painter.drawText(QRectF(area.left() + 4, y, area.width() - 8, row),
+                             Qt.AlignVCenter | Qt.AlignLeft, format_ip(address))
+            painter.drawText(QRectF(area.left() + 4, y, area.width() - 8, row),
+                             Qt.AlignVCenter | Qt.AlignRight, f"{packets:,}")
+
+class Job:
+    """A script run by the dashboard, with everything decoded from its output."""
+
+    def __init__(self, number, script_name, process):
+        self.script_name = script_name
+        self.name = f"{script_name} #{number}"
+        self.process = process
+        self.frames = FrameDecoder()  # None once stdout turned out not to be framed
+        # Reads can end mid-character (emoji are 4 bytes) or mid-line.
+        self.text = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.partial_output = ""
+        self.history = TrafficHistory()
+        self.total_scored = self.total_anomalies = 0
+        self.counters = {}
+        self.progress = None  # (done, total, label) of the latest progress frame
+        self.state = "starting"
+
+    @property
+    def running(self):
+        return self.process.state() != QProcess.NotRunning
+
+    def describe(self):
+        parts = [self.name, self.state]
+        if self.running and self.history.count:
+            parts.append(f"{self.history.series(self.history.packets, 1)[0]:,.0f} packets/s")
+        if self.progress:
+            done, total, label = self.progress
+            parts.append(f"{label} {done}/{total}")
+        return " · ".join(parts)
 
 class Dashboard(QMainWindow):
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Big Defend 🛡️")
-        self.resize(900, 700)
+        self.resize(900, 850)
         self.setMinimumSize(800, 600)
-        self.processes = {}  # key: process, value: script name
-        self.current_process = None  # Initialize current_process to None
+        self.jobs = {}  # key: process, value: Job
+        self.jobs_started = 0
+        self.selected_job = None  # Job shown in the stats line and charts
 
         # Define the base directory for scripts
         self.script_dir = os.path.join(os.getcwd(), "scripts")
@@ -103,10 +321,35 @@ class Dashboard(QMainWindow):
             }
         """)
         self.progress_bar.hide()
+
+        # Live figures decoded from the running script's IPC frames.
+        self.stats_label = QLabel("")
+        self.stats_label.setAlignment(Qt.AlignCenter)
+        self.stats_label.setStyleSheet("font-size: 13px; color: #AAAAAA; padding: 2px;")
         
         status_layout.addWidget(status_header)
         status_layout.addWidget(self.status_label)
+        status_layout.addWidget(self.stats_label)
         status_layout.addWidget(self.progress_bar)
+
+        # Every job run from this window; the selected one is shown and stopped.
+        self.job_list = QListWidget()
+        self.job_list.setMaximumHeight(90)
+        self.job_list.setStyleSheet("""
+            QListWidget {
+                background-color: #1E1E1E;
+                color: #E0E0E0;
+                border: 1px solid #333333;
+                border-radius: 5px;
+                font-size: 13px;
+            }
+            QListWidget::item:selected {
+                background-color: #264F78;
+            }
+        """)
+        self.job_list.currentItemChanged.connect(self.on_job_selected)
+        self.job_list.hide()
+        status_layout.addWidget(self.job_list)
         
         main_layout.addWidget(status_frame)
 
@@ -173,8 +416,47 @@ class Dashboard(QMainWindow):
         button_layout.addWidget(self.clear_btn)
         
         control_layout.addLayout(button_layout)
+
+        # Interfaces for IDS and capture jobs; several jobs may run at once.
+        iface_layout = QHBoxLayout()
+        iface_label = QLabel("Interfaces:")
+        iface_label.setStyleSheet("color: #AAAAAA; font-size: 13px; border: none;")
+        self.iface_input = QLineEdit()
+        self.iface_input.setPlaceholderText("default (e.g. eth0 eth1)")
+        self.iface_input.setToolTip("Space-separated interfaces passed to Run IDS and Packet Capture")
+        self.iface_input.setStyleSheet("""
+            QLineEdit {
+                background-color: #1E1E1E;
+                color: #E0E0E0;
+                border: 1px solid #333333;
+                border-radius: 4px;
+                padding: 4px;
+            }
+        """)
+        iface_layout.addWidget(iface_label)
+        iface_layout.addWidget(self.iface_input)
+        control_layout.addLayout(iface_layout)
         main_layout.addWidget(control_frame)
 
+        # Live charts, shown once a detector starts sending verdict aggregates.
+        self.charts_frame = QFrame()
+        self.charts_frame.setStyleSheet("""
+            QFrame {
+                background-color: rgba(40, 44, 52, 0.7);
+                border-radius: 8px;
+                border: 1px solid #3A3A3A;
+            }
+        """)
+        charts_layout = QHBoxLayout(self.charts_frame)
+        self.packets_chart = LineChart("Packets/s", "#4C9EE8", "{:,.0f}")
+        self.anomaly_chart = LineChart("Anomaly rate", "#E74C3C", "{:.1%}")
+        self.score_chart = HistogramChart(f"Scores (last {CHART_WINDOW_SECONDS}s)", "#8BC34A")
+        self.talkers_chart = TalkersChart(f"Top talkers (last {CHART_WINDOW_SECONDS}s)", "#4C9EE8")
+        for chart in (self.packets_chart, self.anomaly_chart, self.score_chart, self.talkers_chart):
+            charts_layout.addWidget(chart)
+        self.charts_frame.hide()
+        main_layout.addWidget(self.charts_frame)
+
         # Console output with better styling
         console_frame = QFrame()
         console_frame.setStyleSheet("""
@@ -189,9 +471,21 @@ class Dashboard(QMainWindow):
         console_header = QLabel("System Console")
         console_header.setStyleSheet("font-size: 16px; font-weight: bold; color: #E0E0E0;")
         console_header.setAlignment(Qt.AlignCenter)
+
+        self.anomalies_only = QCheckBox("Anomalies only")
+        self.anomalies_only.setStyleSheet("color: #AAAAAA; font-size: 13px; border: none;")
+        self.anomalies_only.setToolTip("Show only threat and error lines from running scripts")
+
+        console_header_layout = QHBoxLayout()
+        console_header_layout.addStretch()
+        console_header_layout.addWidget(console_header)
+        console_header_layout.addStretch()
+        console_header_layout.addWidget(self.anomalies_only)
         
         self.console = QPlainTextEdit()
         self.console.setReadOnly(True)
+        # The document drops its oldest lines, so memory use stays bounded.
+        self.console.setMaximumBlockCount(CONSOLE_MAX_LINES)
         self.console.setStyleSheet("""
             QPlainTextEdit {
                 background-color: #1E1E1E;
@@ -221,8 +515,23 @@ class Dashboard(QMainWindow):
         """)
         self.console.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         
-        console_layout.addWidget(console_header)
+        console_layout.addLayout(console_header_layout)
         console_layout.addWidget(self.console)
+
+        # Console output buffer, flushed by a single-shot timer armed on new output.
+        self.pending_lines = deque(maxlen=CONSOLE_MAX_LINES)
+        self.skipped_lines = 0
+        self.console_timer = QTimer(self)
+        self.console_timer.setSingleShot(True)
+        self.console_timer.setInterval(CONSOLE_REFRESH_MS)
+        self.console_timer.timeout.connect(self.flush_console)
+
+        # Live counters and charts fed by IPC frames, redrawn at most once per second
+        # however fast frames arrive.
+        self.charts_dirty = False
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)
         
         main_layout.addWidget(console_frame)
 
@@ -243,8 +552,8 @@ class Dashboard(QMainWindow):
         self.ids_btn.clicked.connect(lambda: self.run_script("ids.py"))
         self.packet_btn.clicked.connect(lambda: self.run_script("packet_capture.py"))
         self.train_btn.clicked.connect(lambda: self.run_script("train_model.py"))
-        self.stop_btn.clicked.connect(self.stop_current_process)
-        self.clear_btn.clicked.connect(self.console.clear)
+        self.stop_btn.clicked.connect(self.stop_selected_job)
+        self.clear_btn.clicked.connect(self.clear_console)
 
         # Initial state of stop button
         self.stop_btn.setEnabled(False)
@@ -302,56 +611,160 @@ class Dashboard(QMainWindow):
 
     def run_script(self, script_name):
         """Executes the given script in a subprocess and captures its output."""
-        # Check if another process is running
-        if self.current_process and self.current_process.state() != QProcess.NotRunning:
-            self.append_console("⚠️ Another process is already running")
-            return
-
         # Construct full script path using the script directory
         script_path = os.path.join(self.script_dir, script_name)
         if not os.path.exists(script_path):
             self.append_console(f"❌ Script not found: {script_path}\n")
             return
 
-        # Create and configure QProcess
+        # Create and configure QProcess. With --ipc, stdout carries binary frames
+        # and all human-readable output goes to stderr.
         process = QProcess(self)
-        process.setProcessChannelMode(QProcess.MergedChannels)
+        process.setProcessChannelMode(QProcess.SeparateChannels)
+        self.jobs_started += 1
+        job = Job(self.jobs_started, script_name, process)
+        self.jobs[process] = job
 
         # Connect signals to capture output and status
-        process.readyRead.connect(lambda: self.handle_output(process))
-        process.started.connect(lambda: self.on_process_started(script_name))
-        process.finished.connect(lambda exitCode, exitStatus: 
-                               self.on_process_finished(script_name, exitCode, exitStatus))
-        process.errorOccurred.connect(lambda error: self.on_process_error(error, script_name))
+        process.readyReadStandardOutput.connect(lambda: self.handle_frames(job))
+        process.readyReadStandardError.connect(lambda: self.handle_output(job))
+        process.started.connect(lambda: self.on_process_started(job))
+        process.finished.connect(lambda exitCode, exitStatus: self.end_output(job))
+        process.finished.connect(lambda exitCode, exitStatus:
+                               self.on_process_finished(job, exitCode, exitStatus))
+        process.errorOccurred.connect(lambda error: self.on_process_error(error, job))
+
+        arguments = [script_path, "--ipc"]
+        interfaces = self.iface_input.text().split()
+        if interfaces and script_name in ("ids.py", "packet_capture.py"):
+            arguments += ["--iface"] + interfaces
+
+        # New jobs are shown until another one is picked from the list
+        job.item = QListWidgetItem(job.describe())
+        self.job_list.addItem(job.item)
+        self.job_list.setCurrentItem(job.item)
+        self.job_list.show()
 
         # Start the process using the same Python interpreter
         python_executable = sys.executable
-        process.start(python_executable, [script_path])
-
-        # Track the current process
-        self.current_process = process
-        self.processes[process] = script_name
+        process.start(python_executable, arguments)
 
-    def on_process_started(self, script_name):
-        self.append_console(f"🚀 Starting {script_name}...")
-        self.status_label.setText(f"Running: {script_name}")
-        self.status_label.setStyleSheet("font-size: 14px; color: #4C9EE8; padding: 5px;")
-        self.progress_bar.show()
+    def on_process_started(self, job):
+        job.state = "running"
+        self.append_console(f"🚀 Starting {job.name}...")
         self.stop_btn.setEnabled(True)
-        
-        # Disable other action buttons while process is running
-        self.ids_btn.setEnabled(False)
-        self.packet_btn.setEnabled(False)
-        self.train_btn.setEnabled(False)
-
-    def handle_output(self, process):
-        """Reads output from the process and appends it to the console."""
-        if process.state() == QProcess.Running:
-            output = process.readAll().data().decode("utf-8", errors="replace")
-            if output:
-                self.append_console(output)
-
-    def on_process_error(self, error, script_name):
+        self.update_status()
+
+    def on_job_selected(self, item, previous=None):
+        self.selected_job = next((job for job in self.jobs.values() if job.item is item), None)
+        self.charts_dirty = True
+        self.update_stats()
+
+    def update_status(self):
+        """Summarise the running jobs in the status label."""
+        running = [job.name for job in self.jobs.values() if job.running]
+        if running:
+            self.status_label.setText(f"Running: {', '.join(running)}")
+            self.status_label.setStyleSheet("font-size: 14px; color: #4C9EE8; padding: 5px;")
+        self.stop_btn.setEnabled(bool(running))
+        job = self.selected_job
+        self.progress_bar.setVisible(job is not None and job.running)
+        if job is not None:
+            if job.progress:
+                done, total, _ = job.progress
+                self.progress_bar.setRange(0, max(int(total), 1))
+                self.progress_bar.setValue(int(done))
+            else:
+                self.progress_bar.setRange(0, 0)  # Indeterminate until progress frames arrive
+
+    def handle_output(self, job):
+        """Reads text output from the process and queues it for the console."""
+        if job.running:
+            self.queue_output(job, job.process.readAllStandardError().data())
+
+    def handle_frames(self, job):
+        """Decodes IPC frames from the process's stdout and updates the job's figures."""
+        data = job.process.readAllStandardOutput().data()
+        if job.frames is None:
+            self.queue_output(job, data)
+            return
+        try:
+            messages = job.frames.feed(data)
+        except ValueError:
+            # Not a framed stream (e.g. a script without --ipc support): show it as text.
+            buffered, job.frames = bytes(job.frames.buffer), None
+            self.queue_output(job, buffered)
+            return
+        for kind, message in messages:
+            if kind == VERDICTS:
+                _, interval, scored, anomalies, histogram, talkers = message
+                job.history.append(interval, scored, anomalies, histogram, talkers)
+                job.total_scored += scored
+                job.total_anomalies += anomalies
+                if job is self.selected_job:
+                    self.charts_dirty = True
+            elif kind == COUNTERS:
+                job.counters.update(message)
+            elif kind == PROGRESS:
+                job.progress = message
+
+    def update_stats(self):
+        """Render the selected job's figures and charts received since the last tick."""
+        for job in self.jobs.values():
+            job.item.setText(job.describe())
+        self.update_status()
+        job = self.selected_job
+        if job is None:
+            return
+        parts = []
+        if job.total_scored:
+            packets = job.history.series(job.history.packets, 1)[0]
+            rate = job.history.anomaly_rate(1)[0]
+            parts.append(f"{packets:,.0f} packets/s · anomaly rate {rate:.1%} · "
+                         f"{job.total_scored:,} scored, {job.total_anomalies:,} anomalies")
+        if "rows" in job.counters:
+            parts.append(f"{int(job.counters['rows']):,} rows captured")
+        if job.progress:
+            done, total, label = job.progress
+            parts.append(f"{label} {done}/{total}")
+        self.stats_label.setText(f"{job.name}: {' · '.join(parts)}" if parts else "")
+        if self.charts_dirty:
+            self.update_charts()
+
+    def update_charts(self):
+        if self.isMinimized():
+            return  # Nothing to paint; the charts catch up once the window is restored.
+        self.charts_dirty = False
+        history = self.selected_job.history
+        self.charts_frame.setVisible(bool(history.count))
+        self.packets_chart.set_values(history.series(history.packets))
+        self.anomaly_chart.set_values(history.anomaly_rate())
+        self.score_chart.set_counts(history.score_distribution())
+        self.talkers_chart.set_talkers(history.top_talkers())
+
+    def queue_output(self, job, data, final=False):
+        """Split process output into complete lines, filter them and queue them."""
+        text = job.partial_output + job.text.decode(data, final=final)
+        job.partial_output = ""
+        lines = text.split("\n")
+        if final:
+            lines = [line for line in lines if line]
+        elif lines[-1]:
+            job.partial_output = lines.pop()
+        else:
+            lines.pop()
+        lines = [line.rstrip("\r") for line in lines]
+        if self.anomalies_only.isChecked():
+            lines = [line for line in lines if any(marker in line for marker in ALERT_MARKERS)]
+        # Several jobs' output may be interleaved, so every line names its job.
+        self.queue_lines([f"[{job.name}] {line}" for line in lines])
+
+    def end_output(self, job):
+        """Queue whatever a finished process still had buffered."""
+        self.handle_frames(job)
+        self.queue_output(job, job.process.readAllStandardError().data(), final=True)
+
+    def on_process_error(self, error, job):
         """Handles process errors"""
         error_messages = {
             QProcess.FailedToStart: "The process failed to start.",
@@ -363,86 +776,100 @@ class Dashboard(QMainWindow):
         }
         
         error_msg = error_messages.get(error, "An unspecified error occurred.")
-        self.append_console(f"❌ Error with {script_name}: {error_msg}")
-        self.status_label.setText("Error")
-        self.status_label.setStyleSheet("font-size: 14px; color: #E74C3C; padding: 5px;")
-        self.progress_bar.hide()
-        self.stop_btn.setEnabled(False)
-        
-        # Re-enable action buttons
-        self.ids_btn.setEnabled(True)
-        self.packet_btn.setEnabled(True)
-        self.train_btn.setEnabled(True)
+        self.append_console(f"❌ Error with {job.name}: {error_msg}")
+        if error == QProcess.FailedToStart:
+            job.state = "failed"
+            self.set_idle_status("Error", "#E74C3C")
 
-    def on_process_finished(self, script_name, exitCode, exitStatus):
+    def on_process_finished(self, job, exitCode, exitStatus):
         if exitStatus == QProcess.NormalExit:
-            self.append_console(f"✅ {script_name} finished with exit code {exitCode}")
-            self.status_label.setText("Idle")
-            self.status_label.setStyleSheet("font-size: 14px; color: #8BC34A; padding: 5px;")
-        else:
-            self.append_console(f"⚠️ {script_name} terminated abnormally with exit code {exitCode}")
-            self.status_label.setText("Terminated")
-            self.status_label.setStyleSheet("font-size: 14px; color: #FFA726; padding: 5px;")
-        
-        self.progress_bar.hide()
-        self.stop_btn.setEnabled(False)
-        
-        # Re-enable action buttons
-        self.ids_btn.setEnabled(True)
-        self.packet_btn.setEnabled(True)
-        self.train_btn.setEnabled(True)
-
-    def stop_current_process(self):
-        """Stops the currently running process if any."""
-        if self.current_process and self.current_process.state() != QProcess.NotRunning:
-            script_name = self.processes.get(self.current_process, "Unknown process")
-            self.append_console(f"⛔ Terminating {script_name}...")
-            
-            # Attempt graceful termination first
-            self.current_process.terminate()
-            
-            # Wait a bit for the process to terminate gracefully
-            if not self.current_process.waitForFinished(3000):  # 3 seconds timeout
-                self.current_process.kill()  # Force kill if it doesn't respond
-                self.append_console("⛔ Process was forcefully killed.")
-            
-            self.status_label.setText("Terminated")
-            self.status_label.setStyleSheet("font-size: 14px; color: #FFA726; padding: 5px;")
-            self.progress_bar.hide()
-            self.stop_btn.setEnabled(False)
-            
-            # Re-enable action buttons
-            self.ids_btn.setEnabled(True)
-            self.packet_btn.setEnabled(True)
-            self.train_btn.setEnabled(True)
+            self.append_console(f"✅ {job.name} finished with exit code {exitCode}")
+            job.state = f"finished ({exitCode})"
+            self.set_idle_status("Idle", "#8BC34A")
         else:
+            self.append_console(f"⚠️ {job.name} terminated abnormally with exit code {exitCode}")
+            job.state = "terminated"
+            self.set_idle_status("Terminated", "#FFA726")
+        self.update_stats()
+
+    def set_idle_status(self, text, color):
+        """Show how the last job ended, unless other jobs are still running."""
+        if not any(job.running for job in self.jobs.values()):
+            self.status_label.setText(text)
+            self.status_label.setStyleSheet(f"font-size: 14px; color: {color}; padding: 5px;")
+        self.update_status()
+
+    def stop_selected_job(self):
+        """Stops the job selected in the list, or the newest running one."""
+        job = self.selected_job
+        if job is None or not job.running:
+            job = next((job for job in reversed(list(self.jobs.values())) if job.running), None)
+        if job is None:
             QMessageBox.information(self, "No Process Running", "There is no active process to stop.")
+            return
+        self.append_console(f"⛔ Terminating {job.name}...")
+
+        # Attempt graceful termination first
+        job.process.terminate()
+
+        # Wait a bit for the process to terminate gracefully
+        if not job.process.waitForFinished(3000):  # 3 seconds timeout
+            job.process.kill()  # Force kill if it doesn't respond
+            self.append_console("⛔ Process was forcefully killed.")
+        self.update_status()
 
     def append_console(self, text):
-        """Append text to the console widget with timestamp and scroll to the bottom."""
-        from datetime import datetime
-        
+        """Queue a dashboard message for the console (never filtered)."""
+        self.queue_lines(text.rstrip().split("\n"))
+
+    def queue_lines(self, lines):
+        """Buffer lines until the next console tick, keeping only the newest ones."""
+        if not lines:
+            return
+        self.skipped_lines += max(0, len(self.pending_lines) + len(lines) - CONSOLE_MAX_LINES)
+        self.pending_lines.extend(lines)
+        if not self.console_timer.isActive():
+            self.console_timer.start()
+
+    def flush_console(self):
+        """Write the buffered lines with one timestamp and one append per tick."""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        formatted_text = f"[{timestamp}] {text.rstrip()}"
-        self.console.appendPlainText(formatted_text)
-        # Ensure the latest output is visible
-        self.console.verticalScrollBar().setValue(self.console.verticalScrollBar().maximum())
+        lines = [f"[{timestamp}] {line}" for line in self.pending_lines]
+        if self.skipped_lines:
+            lines.insert(0, f"[{timestamp}] … {self.skipped_lines} lines skipped")
+        self.pending_lines.clear()
+        self.skipped_lines = 0
+        if not lines:
+            return
+        scrollbar = self.console.verticalScrollBar()
+        # Only follow the output if the user has not scrolled up to read something.
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        self.console.appendPlainText("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def clear_console(self):
+        self.pending_lines.clear()
+        self.skipped_lines = 0
+        self.console.clear()
 
     def cleanup_processes(self):
-        """Clean up finished processes"""
-        for process in list(self.processes.keys()):
-            if process.state() == QProcess.NotRunning:
-                process.deleteLater()
-                del self.processes[process]
-                if self.current_process == process:
-                    self.current_process = None
+        """Forget finished jobs, keeping the ten most recent in the list."""
+        finished = [job for job in self.jobs.values() if not job.running]
+        for job in finished[:max(0, len(finished) - 10)]:
+            if job is self.selected_job:
+                continue
+            job.process.deleteLater()
+            self.job_list.takeItem(self.job_list.row(job.item))
+            del self.jobs[job.process]
 
     def closeEvent(self, event):
         """Handle application close event - terminate any running processes"""
-        if self.current_process and self.current_process.state() != QProcess.NotRunning:
+        running = [job for job in self.jobs.values() if job.running]
+        if running:
             dialog = QMessageBox(self)
             dialog.setWindowTitle("Confirm Exit")
-            dialog.setText("A script is still running.")
+            dialog.setText(f"{len(running)} script(s) still running.")
             dialog.setInformativeText("Are you sure you want to quit?")
             dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
             dialog.setDefaultButton(QMessageBox.No)
@@ -472,10 +899,9 @@ class Dashboard(QMainWindow):
             
             if reply == QMessageBox.Yes:
                 # Terminate all running processes
-                for process in list(self.processes.keys()):
-                    if process.state() != QProcess.NotRunning:
-                        process.kill()
-                        process.waitForFinished(1000)
+                for job in running:
+                    job.process.kill()
+                    job.process.waitForFinished(1000)
                 event.accept()
             else:
                 event.ignore()
@@ -484,6 +910,7 @@ class Dashboard(QMainWindow):
 
         # Stop the cleanup timer
         self.cleanup_timer.stop()
+        self.stats_timer.stop()
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
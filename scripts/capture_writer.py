@@ -0,0 +1,220 @@
+import csv
+import os
+import queue
+import threading
+import numpy as np
+from features import HEADERS
+
+FORMATS = ("csv", "npy")
+DEFAULT_FLUSH_ROWS = 65536
+DEFAULT_FLUSH_INTERVAL = 1.0
+# Fixed-width on-disk type of each column in the binary format.
+COLUMN_DTYPES = {
+    "src_addr": np.dtype("<u4"),
+    "dst_addr": np.dtype("<u4"),
+    "src_port": np.dtype("<u2"),
+    "dst_port": np.dtype("<u2"),
+    "protocol": np.dtype("<u2"),
+    "packet_size": np.dtype("<i4"),
+}
+# Room for any row count in the .npy header, so it can be rewritten in place.
+NPY_HEADER_LEN = 128
+
+class NpyColumn:
+    """A single-column .npy file that can be appended to.
+
+    The header is padded to a fixed size so the row count can be updated in
+    place after every append, keeping the file loadable (and memory-mappable)
+    with ``np.load`` at all times. With ``width``, the file holds a row-major
+    (rows, width) matrix instead, appended to a block of rows at a time.
+    """
+
+    def __init__(self, path: str, dtype: np.dtype, width: int = None):
+        self.dtype = dtype
+        self.width = width
+        if os.path.exists(path):
+            self.rows = len(np.load(path, mmap_mode="r"))
+            self.file = open(path, "r+b")
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.rows = 0
+            self.file = open(path, "w+b")
+            self._write_header()
+
+    def _write_header(self) -> None:
+        header = repr({
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (self.rows,) if self.width is None else (self.rows, self.width),
+        })
+        magic = np.lib.format.magic(1, 0)
+        # Magic string, 2-byte header length, then the padded header dict.
+        header = header.ljust(NPY_HEADER_LEN - len(magic) - 3) + "\n"
+        self.file.seek(0)
+        self.file.write(magic + len(header).to_bytes(2, "little") + header.encode("latin1"))
+        self.file.seek(0, os.SEEK_END)
+
+    def append(self, values: np.ndarray) -> None:
+        self.file.write(np.ascontiguousarray(values, dtype=self.dtype).tobytes())
+        self.rows += len(values)
+        self._write_header()
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+def capture_columns(path: str, columns) -> list:
+    """Columns of an existing CSV file or npy capture directory (None if there is none yet).
+
+    A directory only reports ``columns`` if it holds every one of their files.
+    """
+    if os.path.isdir(path):
+        present = [name for name in columns if os.path.exists(os.path.join(path, f"{name}.npy"))]
+        if not present:
+            return None
+        return list(columns) if len(present) == len(columns) else present
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, newline="") as f:
+        return next(csv.reader(f), None)
+
+def check_capture_columns(path: str, columns) -> None:
+    """Refuse a capture written with other columns, e.g. before addresses were stored in full."""
+    found = capture_columns(path, columns)
+    if found is not None and found != list(columns):
+        raise ValueError(f"{path} does not hold a capture of {', '.join(columns)} "
+                         f"(found {', '.join(found)}); captures from before full IPv4 "
+                         f"addresses were recorded must be recaptured.")
+
+class CsvSink:
+    """Appends blocks of rows to a CSV file kept open for the whole capture."""
+
+    def __init__(self, path: str, column_dtypes=COLUMN_DTYPES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        check_capture_columns(path, list(column_dtypes))
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.dtypes = list(column_dtypes.values())
+        self.file = open(path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        if is_new:
+            self.writer.writerow(list(column_dtypes))
+
+    def write(self, block: np.ndarray) -> None:
+        # Cast per column so integer columns are written without a decimal point.
+        columns = [block[:, i].astype(dtype).tolist() for i, dtype in enumerate(self.dtypes)]
+        self.writer.writerows(zip(*columns))
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+class NpySink:
+    """Writes each feature column to its own appendable .npy file in a directory."""
+
+    def __init__(self, path: str, column_dtypes=COLUMN_DTYPES):
+        os.makedirs(path, exist_ok=True)
+        check_capture_columns(path, list(column_dtypes))
+        self.columns = [NpyColumn(os.path.join(path, f"{name}.npy"), dtype)
+                        for name, dtype in column_dtypes.items()]
+
+    def write(self, block: np.ndarray) -> None:
+        for index, column in enumerate(self.columns):
+            column.append(block[:, index])
+
+    def close(self) -> None:
+        for column in self.columns:
+            column.close()
+
+def open_sink(path: str, fmt: str, column_dtypes=COLUMN_DTYPES):
+    """Create the sink for the given output format and columns."""
+    if fmt == "csv":
+        return CsvSink(path, column_dtypes)
+    if fmt == "npy":
+        return NpySink(path, column_dtypes)
+    raise ValueError(f"Unknown capture format '{fmt}'. Choose from {', '.join(FORMATS)}.")
+
+def load_columns(path: str, mmap_mode=None, headers=HEADERS) -> np.ndarray:
+    """Load a binary (npy) capture directory as an (N, len(headers)) array."""
+    columns = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+               for name in headers]
+    return np.column_stack(columns)
+
+class CaptureWriter:
+    """Buffers captured feature rows in memory and writes them in large blocks.
+
+    Rows go into a preallocated array (int64 for packet features). When it
+    fills up, or every ``flush_interval`` seconds, the filled part is handed
+    to a background thread that appends it to the sink, so the capture
+    callback never touches the disk. ``column_dtypes`` selects the columns,
+    e.g. ``flows.FLOW_COLUMN_DTYPES`` for flow records. A ``sink`` given
+    explicitly (e.g. a ``shards.ShardedSink``) replaces the one for ``path``.
+    """
+
+    def __init__(self, path: str, fmt: str = "csv", flush_rows: int = DEFAULT_FLUSH_ROWS,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, column_dtypes=COLUMN_DTYPES,
+                 sink=None):
+        if flush_rows < 1:
+            raise ValueError("flush_rows must be at least 1")
+        self.sink = sink or open_sink(path, fmt, column_dtypes)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.dtype = np.result_type(np.int32, *column_dtypes.values())
+        self.buffer = np.empty((flush_rows, len(column_dtypes)), dtype=self.dtype)
+        self.count = 0
+        self.rows_written = 0
+        self.lock = threading.Lock()
+        self.blocks = queue.Queue()
+        self.closed = False
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self.thread.start()
+
+    def write(self, row) -> None:
+        """Append one feature row to the buffer."""
+        with self.lock:
+            self.buffer[self.count] = row
+            self.count += 1
+            if self.count == self.flush_rows:
+                self._hand_off_locked()
+
+    def write_block(self, rows: np.ndarray) -> None:
+        """Append many rows at once, e.g. a batch of expired flows."""
+        with self.lock:
+            while len(rows):
+                take = min(len(rows), self.flush_rows - self.count)
+                self.buffer[self.count:self.count + take] = rows[:take]
+                self.count += take
+                rows = rows[take:]
+                if self.count == self.flush_rows:
+                    self._hand_off_locked()
+
+    def _hand_off_locked(self) -> None:
+        if self.count:
+            self.blocks.put(self.buffer[:self.count])
+            self.buffer = np.empty_like(self.buffer)
+            self.count = 0
+
+    def _flush_loop(self) -> None:
+        while True:
+            try:
+                block = self.blocks.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self.lock:
+                    self._hand_off_locked()
+                continue
+            if block is None:
+                break
+            self.sink.write(block)
+            self.rows_written += len(block)
+
+    def close(self) -> None:
+        """Write out everything still buffered and close the sink."""
+        if self.closed:
+            return
+        self.closed = True
+        with self.lock:
+            self._hand_off_locked()
+        self.blocks.put(None)
+        self.thread.join()
+        self.sink.close()
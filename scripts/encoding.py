@@ -0,0 +1,227 @@
+import ipaddress
+import json
+import os
+import numpy as np
+
+ENCODING_VERSION = 1
+# Columns with a special meaning, by name; they are named alike in packet and flow records.
+ADDRESS_COLUMNS = ("src_addr", "dst_addr")
+PORT_COLUMNS = ("src_port", "dst_port")
+PROTOCOL_COLUMN = "protocol"
+DEFAULT_INTERNAL_NETWORKS = ("10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16")
+DEFAULT_PREFIX_LEN = 24
+# Longest prefix held exactly by float32 (24-bit significand), the training matrix's type.
+MAX_PREFIX_LEN = 24
+# Ports with a class of their own; every other port falls in one of the PORT_RANGES buckets.
+DEFAULT_SERVICE_PORTS = (20, 21, 22, 23, 25, 53, 67, 68, 80, 110, 123, 137, 138, 139, 143,
+                         161, 389, 443, 445, 465, 587, 993, 995, 1433, 1521, 3306, 3389,
+                         5060, 5432, 5900, 8080, 8443)
+# Port classes 1-3: well-known, registered and dynamic ports (class 0 is "no port").
+PORT_RANGES = (1, 1024, 49152)
+# Protocols with a class of their own (ICMP, TCP, UDP); all others share class 0.
+DEFAULT_PROTOCOLS = (1, 6, 17)
+
+def octet_sum(ip: np.ndarray) -> np.ndarray:
+    """Sum of the octets of 32-bit IPv4 addresses (the encoding of models without a spec)."""
+    ip = ip.astype(np.int64)
+    return (ip >> 24 & 0xFF) + (ip >> 16 & 0xFF) + (ip >> 8 & 0xFF) + (ip & 0xFF)
+
+def network_index(networks) -> tuple:
+    """Build a sorted-prefix index of ``networks`` for ``np.searchsorted`` lookups.
+
+    The address space is cut at every network boundary into ranges that lie
+    either entirely inside or entirely outside each network. Each range is
+    labelled with the most specific network covering it (its position in
+    ``networks`` plus one) or 0, so a lookup is one binary search.
+
+    Returns:
+        tuple: Range start addresses (sorted uint64) and the label of each range.
+    """
+    ranges = [(int(net.network_address), int(net.broadcast_address), net.prefixlen, label)
+              for label, net in enumerate(map(ipaddress.IPv4Network, networks), 1)]
+    starts = sorted({0} | {first for first, _, _, _ in ranges}
+                    | {last + 1 for _, last, _, _ in ranges if last < 2 ** 32 - 1})
+    labels = []
+    for start in starts:
+        covering = [(prefixlen, label) for first, last, prefixlen, label in ranges
+                    if first <= start <= last]
+        labels.append(max(covering)[1] if covering else 0)
+    return np.array(starts, dtype=np.uint64), np.array(labels, dtype=np.uint16)
+
+def port_class_table(service_ports) -> np.ndarray:
+    """Class of every port number: 0 for none, 1-3 for the IANA ranges, then one per service."""
+    table = np.zeros(65536, dtype=np.uint16)
+    for port_class, start in enumerate(PORT_RANGES, 1):
+        table[start:] = port_class
+    for index, port in enumerate(service_ports):
+        table[port] = len(PORT_RANGES) + 1 + index
+    return table
+
+def protocol_class_table(protocols) -> np.ndarray:
+    """Class of every IP protocol number: one per listed protocol, 0 for the rest."""
+    table = np.zeros(256, dtype=np.uint16)
+    for index, protocol in enumerate(protocols):
+        table[protocol] = index + 1
+    return table
+
+class FeatureEncoding:
+    """Turns raw capture records into the feature matrix a model is trained on.
+
+    Raw records (packet features or flow records) hold IPv4 addresses as
+    32-bit integers and ports and protocols as captured. ``transform``
+    encodes whole batches with NumPy operations:
+
+    - each address becomes its network prefix (the address shifted right to
+      ``prefix_len`` bits, at most ``MAX_PREFIX_LEN`` so it is exact in
+      float32) and, with ``internal_networks``, the internal network it
+      belongs to (0 outside of them), looked up in a
+      sorted-prefix index with ``np.searchsorted``;
+    - each port becomes its class in a 65536-entry table (the IANA range, or
+      one class per port of ``service_ports``);
+    - the protocol becomes its class in a 256-entry table;
+    - every other column is passed through.
+
+    ``service_ports`` or ``protocols`` set to None keeps those columns raw,
+    and ``addresses="octet_sum"`` reproduces the features of models trained
+    before encodings existed (see ``legacy``). The spec (``to_dict``) is
+    saved next to the model, so detection rebuilds the identical transform.
+    """
+
+    def __init__(self, columns, addresses: str = "prefix", prefix_len: int = DEFAULT_PREFIX_LEN,
+                 internal_networks=DEFAULT_INTERNAL_NETWORKS, service_ports=DEFAULT_SERVICE_PORTS,
+                 protocols=DEFAULT_PROTOCOLS):
+        if addresses not in ("prefix", "octet_sum"):
+            raise ValueError(f"Unknown address encoding '{addresses}'.")
+        if not 0 < prefix_len <= MAX_PREFIX_LEN:
+            raise ValueError(f"prefix_len must be between 1 and {MAX_PREFIX_LEN}, as longer "
+                             f"prefixes are not exact in float32")
+        self.columns = list(columns)
+        self.addresses = addresses
+        self.prefix_len = prefix_len
+        self.internal_networks = [str(ipaddress.IPv4Network(net)) for net in internal_networks]
+        self.service_ports = None if service_ports is None else [int(p) for p in service_ports]
+        self.protocols = None if protocols is None else [int(p) for p in protocols]
+        self.boundaries, self.zones = network_index(self.internal_networks)
+        self.port_classes = None if service_ports is None else port_class_table(self.service_ports)
+        self.protocol_classes = None if protocols is None else protocol_class_table(self.protocols)
+
+    @classmethod
+    def legacy(cls, columns) -> "FeatureEncoding":
+        """The encoding of models saved without a spec: octet sums, everything else raw."""
+        return cls(columns, addresses="octet_sum", internal_networks=(), service_ports=None,
+                   protocols=None)
+
+    def to_dict(self) -> dict:
+        return {"version": ENCODING_VERSION, "columns": self.columns,
+                "addresses": self.addresses, "prefix_len": self.prefix_len,
+                "internal_networks": self.internal_networks,
+                "service_ports": self.service_ports, "protocols": self.protocols}
+
+    @classmethod
+    def from_dict(cls, spec: dict) -> "FeatureEncoding":
+        if spec.get("version") != ENCODING_VERSION:
+            raise ValueError(f"Unsupported feature encoding version {spec.get('version')}")
+        return cls(spec["columns"], spec["addresses"], spec["prefix_len"],
+                   spec["internal_networks"], spec["service_ports"], spec["protocols"])
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, FeatureEncoding) and self.to_dict() == other.to_dict()
+
+    @property
+    def output_columns(self) -> list:
+        """Names of the encoded columns, in order."""
+        names = []
+        for name in self.columns:
+            if name in ADDRESS_COLUMNS:
+                names.append(f"{name}_{self.addresses}")
+                if self.internal_networks:
+                    names.append(f"{name}_network")
+            elif name in PORT_COLUMNS and self.port_classes is not None:
+                names.append(f"{name}_class")
+            elif name == PROTOCOL_COLUMN and self.protocol_classes is not None:
+                names.append(f"{name}_class")
+            else:
+                names.append(name)
+        return names
+
+    def transform(self, X: np.ndarray, dtype=np.float64) -> np.ndarray:
+        """Encode an (n, len(columns)) batch of raw records into an (n, len(output_columns)) array."""
+        X = np.asarray(X)
+        if X.ndim != 2 or X.shape[1] != len(self.columns):
+            raise ValueError(f"Expected raw records with {len(self.columns)} columns "
+                             f"({', '.join(self.columns)}), got shape {X.shape}")
+        out = np.empty((len(X), len(self.output_columns)), dtype=dtype)
+        position = 0
+        for index, name in enumerate(self.columns):
+            column = X[:, index]
+            if name in ADDRESS_COLUMNS:
+                address = column.astype(np.int64)
+                if self.addresses == "prefix":
+                    out[:, position] = address >> (32 - self.prefix_len)
+                else:
+                    out[:, position] = octet_sum(address)
+                position += 1
+                if self.internal_networks:
+                    ranges = np.searchsorted(self.boundaries, address.astype(np.uint64),
+                                             side="right") - 1
+                    out[:, position] = self.zones[ranges]
+                    position += 1
+            elif name in PORT_COLUMNS and self.port_classes is not None:
+                out[:, position] = self.port_classes[column.astype(np.int64)]
+                position += 1
+            elif name == PROTOCOL_COLUMN and self.protocol_classes is not None:
+                out[:, position] = self.protocol_classes[column.astype(np.int64) & 0xFF]
+                position += 1
+            else:
+                out[:, position] = column
+                position += 1
+        return out
+
+def encoding_path(model_file: str) -> str:
+    """Where the encoding spec of a model is saved: next to it, shared by .joblib and .npz."""
+    return os.path.splitext(model_file)[0] + ".encoding.json"
+
+def save_encoding(encoding: FeatureEncoding, model_file: str) -> None:
+    """Write the spec next to ``model_file`` atomically, so a reloading IDS never reads half of it."""
+    path = encoding_path(model_file)
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(encoding.to_dict(), f, indent=1)
+    os.replace(tmp_file, path)
+
+def load_encoding(model_file: str, legacy_columns) -> FeatureEncoding:
+    """Read the spec saved next to ``model_file``.
+
+    Models saved without one were trained on octet sums, so they get
+    ``FeatureEncoding.legacy(legacy_columns)``.
+    """
+    try:
+        with open(encoding_path(model_file)) as f:
+            spec = json.load(f)
+    except FileNotFoundError:
+        return FeatureEncoding.legacy(legacy_columns)
+    return FeatureEncoding.from_dict(spec)
+
+class EncodedModel:
+    """A model fed raw records: ``decision_function`` encodes each batch first.
+
+    Detectors buffer raw records and call ``decision_function`` as on any
+    model, so the encoding is applied in one place, once per batch (and not
+    at all for rows answered by a ``VerdictCache`` in front of it).
+    ``n_features_in_`` is the raw record width.
+    """
+
+    def __init__(self, model, encoding: FeatureEncoding):
+        self.model = model
+        self.encoding = encoding
+
+    @property
+    def offset_(self) -> float:
+        return self.model.offset_
+
+    @property
+    def n_features_in_(self) -> int:
+        return len(self.encoding.columns)
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.model.decision_function(self.encoding.transform(X))
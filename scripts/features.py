@@ -0,0 +1,214 @@
+import ipaddress
+import struct
+import numpy as np
+from scapy.layers.l2 import Ether, CookedLinux
+from scapy.layers.inet import IP, TCP
+
+# Raw packet record: addresses as 32-bit integers, TCP ports (0 otherwise), protocol
+# and frame length. encoding.FeatureEncoding turns records into model features.
+# Captures holding octet sums instead of addresses named those columns src_ip/dst_ip.
+HEADERS = ["src_addr", "dst_addr", "src_port", "dst_port", "protocol", "packet_size"]
+N_FEATURES = len(HEADERS)
+
+ETH_HEADER_LEN = 14
+SLL_HEADER_LEN = 16
+ETHERTYPE_IPV4 = 0x0800
+VLAN_ETHERTYPES = (0x8100, 0x88A8)
+PROTO_TCP = 6
+PROTO_UDP = 17
+# pcap link-layer header types understood by extract_features_frame.
+LINKTYPE_ETHERNET = 1
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_RAW = (12, 14, 101)
+# Ethernet + two VLAN tags + the largest IPv4 header + both TCP ports.
+SNAP_LEN = ETH_HEADER_LEN + 8 + 60 + 4
+
+def _ipv4_offset(frame: bytes, offset: int, ethertype: int):
+    """Skip VLAN tags and return the IPv4 header offset, or None."""
+    while ethertype in VLAN_ETHERTYPES and len(frame) >= offset + 4:
+        ethertype = struct.unpack_from("!H", frame, offset + 2)[0]
+        offset += 4
+    return offset if ethertype == ETHERTYPE_IPV4 else None
+
+def extract_features_raw(frame: bytes, offset: int = 0):
+    """Extract features from the IPv4 header starting at ``offset`` in ``frame``.
+
+    Returns the 6 raw feature values as a tuple (addresses as 32-bit
+    integers), or None if there is no IPv4 header.
+    """
+    if len(frame) < offset + 20 or frame[offset] >> 4 != 4:
+        return None
+    src_ip, dst_ip = struct.unpack_from("!II", frame, offset + 12)
+    protocol = frame[offset + 9]
+    src_port = dst_port = 0
+    # Only the first fragment carries the TCP header.
+    fragment = struct.unpack_from("!H", frame, offset + 6)[0] & 0x1FFF
+    l4 = offset + (frame[offset] & 0x0F) * 4
+    if protocol == PROTO_TCP and fragment == 0 and len(frame) >= l4 + 4:
+        src_port, dst_port = struct.unpack_from("!HH", frame, l4)
+    return (src_ip, dst_ip, src_port, dst_port, protocol, len(frame))
+
+def ipv4_header_offset(frame: bytes, linktype: int = LINKTYPE_ETHERNET):
+    """Return the offset of the IPv4 header in a raw frame, or None."""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(frame) < ETH_HEADER_LEN:
+            return None
+        ethertype = struct.unpack_from("!H", frame, 12)[0]
+        return _ipv4_offset(frame, ETH_HEADER_LEN, ethertype)
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(frame) < SLL_HEADER_LEN:
+            return None
+        ethertype = struct.unpack_from("!H", frame, 14)[0]
+        return _ipv4_offset(frame, SLL_HEADER_LEN, ethertype)
+    if linktype in LINKTYPE_RAW:
+        return 0
+    return None
+
+def extract_features_frame(frame: bytes, linktype: int = LINKTYPE_ETHERNET):
+    """Extract features from a raw frame with the given pcap link type.
+
+    Returns a tuple of 6 values, or None for non-IPv4 traffic.
+    """
+    offset = ipv4_header_offset(frame, linktype)
+    if offset is None:
+        return None
+    return extract_features_raw(frame, offset)
+
+def extract_flow_key_frame(frame: bytes, linktype: int = LINKTYPE_ETHERNET):
+    """Extract the flow 5-tuple, frame length and TCP flags from a raw frame.
+
+    Unlike the packet features, UDP ports are included, so distinct flows
+    get distinct keys.
+
+    Returns:
+        tuple: ``(src_ip, dst_ip, src_port, dst_port, protocol, length, tcp_flags)``,
+        or None for non-IPv4 traffic.
+    """
+    offset = ipv4_header_offset(frame, linktype)
+    if offset is None or len(frame) < offset + 20 or frame[offset] >> 4 != 4:
+        return None
+    src_ip, dst_ip = struct.unpack_from("!II", frame, offset + 12)
+    protocol = frame[offset + 9]
+    src_port = dst_port = flags = 0
+    fragment = struct.unpack_from("!H", frame, offset + 6)[0] & 0x1FFF
+    l4 = offset + (frame[offset] & 0x0F) * 4
+    if fragment == 0 and protocol in (PROTO_TCP, PROTO_UDP) and len(frame) >= l4 + 4:
+        src_port, dst_port = struct.unpack_from("!HH", frame, l4)
+        if protocol == PROTO_TCP and len(frame) >= l4 + 14:
+            flags = frame[l4 + 13]
+    return (src_ip, dst_ip, src_port, dst_port, protocol, len(frame), flags)
+
+def ipv4_source(frame: bytes, linktype: int = LINKTYPE_ETHERNET) -> int:
+    """Return the source address of a raw frame as a 32-bit integer (0 for non-IPv4)."""
+    offset = ipv4_header_offset(frame, linktype)
+    if offset is None or len(frame) < offset + 20:
+        return 0
+    return struct.unpack_from("!I", frame, offset + 12)[0]
+
+def packet_frame(packet):
+    """Return the raw bytes and pcap link type of a scapy packet.
+
+    Uses the bytes scapy captured off the wire when available, so sniffed
+    packets are never rebuilt. Returns None for unsupported link layers.
+    """
+    if isinstance(packet, Ether):
+        linktype = LINKTYPE_ETHERNET
+    elif isinstance(packet, CookedLinux):
+        linktype = LINKTYPE_LINUX_SLL
+    elif isinstance(packet, IP):
+        linktype = LINKTYPE_RAW[0]
+    else:
+        return None
+    return (packet.original if packet.original else bytes(packet)), linktype
+
+def extract_features(packet):
+    """Extract features from a scapy packet without dissecting its layers.
+
+    Returns a tuple of 6 values, or None for non-IPv4 traffic.
+    """
+    frame = packet_frame(packet)
+    if frame is None:
+        return None
+    return extract_features_frame(*frame)
+
+class RawFrame:
+    """A raw captured frame, dissected by scapy only when it is displayed."""
+
+    __slots__ = ("data", "linktype")
+
+    def __init__(self, data: bytes, linktype: int):
+        self.data = data
+        self.linktype = linktype
+
+    def summary(self) -> str:
+        if self.linktype == LINKTYPE_ETHERNET:
+            return Ether(self.data).summary()
+        if self.linktype == LINKTYPE_LINUX_SLL:
+            return CookedLinux(self.data).summary()
+        return IP(self.data).summary()
+
+def extract_features_batch(frames):
+    """Extract features from a list of raw Ethernet frames in one pass.
+
+    Returns:
+        tuple: An (N, 6) int64 feature array and a boolean mask marking the
+        rows that came from IPv4 frames. Rows outside the mask are zero.
+    """
+    n = len(frames)
+    lengths = np.fromiter((len(f) for f in frames), dtype=np.int64, count=n)
+    head = np.frombuffer(
+        b"".join(bytes(f[:SNAP_LEN]).ljust(SNAP_LEN, b"\0") for f in frames),
+        dtype=np.uint8,
+    ).reshape(n, SNAP_LEN).astype(np.int64)
+    rows = np.arange(n)
+
+    def u16(at):
+        return (head[rows, at] << 8) | head[rows, at + 1]
+
+    offset = np.full(n, ETH_HEADER_LEN, dtype=np.int64)
+    ethertype = u16(np.full(n, 12))
+    for _ in range(2):  # At most two stacked VLAN tags.
+        tagged = np.isin(ethertype, VLAN_ETHERTYPES)
+        ethertype = np.where(tagged, u16(np.minimum(offset + 2, SNAP_LEN - 2)), ethertype)
+        offset = np.where(tagged, offset + 4, offset)
+
+    version_ihl = head[rows, offset]
+    valid = ((lengths >= ETH_HEADER_LEN) & (ethertype == ETHERTYPE_IPV4)
+             & (lengths >= offset + 20) & (version_ihl >> 4 == 4))
+
+    def u32(at):
+        return (u16(at) << 16) | u16(at + 2)
+
+    features = np.zeros((n, N_FEATURES), dtype=np.int64)
+    features[:, 0] = u32(offset + 12)
+    features[:, 1] = u32(offset + 16)
+    protocol = head[rows, offset + 9]
+    features[:, 4] = protocol
+    features[:, 5] = lengths
+
+    l4 = offset + (version_ihl & 0x0F) * 4
+    fragment = u16(offset + 6) & 0x1FFF
+    has_ports = valid & (protocol == PROTO_TCP) & (fragment == 0) & (lengths >= l4 + 4)
+    l4 = np.where(has_ports, l4, 0)
+    features[:, 2] = np.where(has_ports, u16(l4), 0)
+    features[:, 3] = np.where(has_ports, u16(l4 + 2), 0)
+
+    features[~valid] = 0
+    return features, valid
+
+def extract_features_scapy(packet):
+    """Reference extractor using full scapy dissection (slow)."""
+    if packet.haslayer(IP):
+        src_ip = int(ipaddress.IPv4Address(packet[IP].src))
+        dst_ip = int(ipaddress.IPv4Address(packet[IP].dst))
+        protocol = packet[IP].proto
+        packet_size = len(packet)
+
+        if packet.haslayer(TCP):
+            src_port = packet[TCP].sport
+            dst_port = packet[TCP].dport
+        else:
+            src_port = dst_port = 0
+
+        return (src_ip, dst_ip, src_port, dst_port, protocol, packet_size)
+    return None
@@ -0,0 +1,239 @@
+import numpy as np
+
+FLOW_HEADERS = [
+    "src_addr", "dst_addr", "src_port", "dst_port", "protocol",
+    "packets", "bytes", "duration", "mean_iat", "std_iat", "max_iat",
+    "syn_count", "fin_count", "rst_count",
+]
+N_FLOW_FEATURES = len(FLOW_HEADERS)
+# Fixed-width on-disk type of each flow column in the binary capture format.
+FLOW_COLUMN_DTYPES = {
+    "src_addr": np.dtype("<u4"),
+    "dst_addr": np.dtype("<u4"),
+    "src_port": np.dtype("<u2"),
+    "dst_port": np.dtype("<u2"),
+    "protocol": np.dtype("<u2"),
+    "packets": np.dtype("<i4"),
+    "bytes": np.dtype("<i8"),
+    "duration": np.dtype("<f4"),
+    "mean_iat": np.dtype("<f4"),
+    "std_iat": np.dtype("<f4"),
+    "max_iat": np.dtype("<f4"),
+    "syn_count": np.dtype("<i4"),
+    "fin_count": np.dtype("<i4"),
+    "rst_count": np.dtype("<i4"),
+}
+
+DEFAULT_CAPACITY = 65536
+DEFAULT_IDLE_TIMEOUT = 15.0
+DEFAULT_ACTIVE_TIMEOUT = 120.0
+TCP_FIN, TCP_SYN, TCP_RST = 0x01, 0x02, 0x04
+EMPTY = -1
+
+def format_ip(ip: int) -> str:
+    return ".".join(str(ip >> shift & 0xFF) for shift in (24, 16, 8, 0))
+
+class FlowRecord:
+    """An emitted flow, formatted like a packet summary when it is logged."""
+
+    __slots__ = ("hi", "lo", "packets", "bytes")
+    kind = "Flow"
+
+    def __init__(self, key, features):
+        self.hi, self.lo = int(key[0]), int(key[1])
+        self.packets, self.bytes = int(features[5]), int(features[6])
+
+    def summary(self) -> str:
+        return (f"{format_ip(self.hi >> 32)}:{self.lo >> 24 & 0xFFFF} > "
+                f"{format_ip(self.hi & 0xFFFFFFFF)}:{self.lo >> 8 & 0xFFFF} "
+                f"proto {self.lo & 0xFF} ({self.packets} packets, {self.bytes} bytes)")
+
+class FlowTable:
+    """Memory-bounded table of active flows keyed by 5-tuple.
+
+    Flow state lives in preallocated NumPy columns indexed by row, and an
+    open-addressing hash index (linear probing, backward-shift deletion) maps
+    each packed 5-tuple to its row, so the table never allocates per flow.
+    Flows are emitted once idle for ``idle_timeout`` seconds or active for
+    ``active_timeout`` seconds. When every row is taken, the least recently
+    seen flows are evicted (and emitted) to make room.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY,
+                 idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                 active_timeout: float = DEFAULT_ACTIVE_TIMEOUT):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+
+        # Packed key: (src_ip << 32 | dst_ip, src_port << 24 | dst_port << 8 | protocol).
+        self.key_hi = np.zeros(capacity, dtype=np.uint64)
+        self.key_lo = np.zeros(capacity, dtype=np.uint64)
+        self.home = np.zeros(capacity, dtype=np.int64)
+        self.first_seen = np.zeros(capacity, dtype=np.float64)
+        self.last_seen = np.zeros(capacity, dtype=np.float64)
+        self.packets = np.zeros(capacity, dtype=np.int64)
+        self.bytes = np.zeros(capacity, dtype=np.int64)
+        self.iat_sum_sq = np.zeros(capacity, dtype=np.float64)
+        self.iat_max = np.zeros(capacity, dtype=np.float64)
+        self.flag_counts = np.zeros((capacity, 3), dtype=np.int32)
+        self.active = np.zeros(capacity, dtype=bool)
+
+        # Index twice the capacity so probe chains stay short.
+        self.index_size = 1 << max(1, (2 * capacity - 1).bit_length())
+        self.mask = self.index_size - 1
+        self.index = np.full(self.index_size, EMPTY, dtype=np.int64)
+        self.free_rows = list(range(capacity - 1, -1, -1))
+        self.pending = []
+        self.stats = {"packets": 0, "flows_created": 0, "flows_expired": 0,
+                      "flows_evicted": 0, "probes": 0, "peak_flows": 0}
+
+    def __len__(self) -> int:
+        return self.capacity - len(self.free_rows)
+
+    def add(self, src_ip: int, dst_ip: int, src_port: int, dst_port: int,
+            protocol: int, length: int, tcp_flags: int, timestamp: float) -> None:
+        """Account one packet to its flow, creating the flow if needed."""
+        if not self.free_rows:
+            self._evict_oldest()
+        hi = (src_ip << 32) | dst_ip
+        lo = (src_port << 24) | (dst_port << 8) | protocol
+        home = hash((hi, lo)) & self.mask
+        slot = home
+        index, key_hi, key_lo = self.index, self.key_hi, self.key_lo
+        self.stats["packets"] += 1
+        while True:
+            row = index[slot]
+            if row == EMPTY:
+                break
+            if key_hi[row] == hi and key_lo[row] == lo:
+                iat = timestamp - self.last_seen[row]
+                self.iat_sum_sq[row] += iat * iat
+                if iat > self.iat_max[row]:
+                    self.iat_max[row] = iat
+                self.last_seen[row] = timestamp
+                self.packets[row] += 1
+                self.bytes[row] += length
+                self._count_flags(row, tcp_flags)
+                return
+            slot = (slot + 1) & self.mask
+            self.stats["probes"] += 1
+
+        row = self.free_rows.pop()
+        index[slot] = row
+        key_hi[row] = hi
+        key_lo[row] = lo
+        self.home[row] = home
+        self.first_seen[row] = self.last_seen[row] = timestamp
+        self.packets[row] = 1
+        self.bytes[row] = length
+        self.iat_sum_sq[row] = self.iat_max[row] = 0.0
+        self.flag_counts[row] = 0
+        self._count_flags(row, tcp_flags)
+        self.active[row] = True
+        self.stats["flows_created"] += 1
+        self.stats["peak_flows"] = max(self.stats["peak_flows"], len(self))
+
+    def _count_flags(self, row: int, tcp_flags: int) -> None:
+        if tcp_flags:
+            if tcp_flags & TCP_SYN:
+                self.flag_counts[row, 0] += 1
+            if tcp_flags & TCP_FIN:
+                self.flag_counts[row, 1] += 1
+            if tcp_flags & TCP_RST:
+                self.flag_counts[row, 2] += 1
+
+    def _find_slot(self, row: int) -> int:
+        slot = self.home[row]
+        while self.index[slot] != row:
+            slot = (slot + 1) & self.mask
+        return slot
+
+    def _remove(self, row: int) -> None:
+        """Drop ``row`` from the index, shifting back later entries of its probe chain."""
+        hole = self._find_slot(row)
+        slot = hole
+        while True:
+            slot = (slot + 1) & self.mask
+            other = self.index[slot]
+            if other == EMPTY:
+                break
+            home = self.home[other]
+            # Move the entry into the hole unless its home lies cyclically in (hole, slot].
+            if (slot - home) & self.mask >= (slot - hole) & self.mask:
+                self.index[hole] = other
+                hole = slot
+        self.index[hole] = EMPTY
+        self.active[row] = False
+        self.free_rows.append(row)
+
+    def _emit(self, rows: np.ndarray) -> tuple:
+        """Build flow feature rows and release the table rows.
+
+        Returns the features and the packed keys (an (n, 2) uint64 array).
+        """
+        features = np.empty((len(rows), N_FLOW_FEATURES), dtype=np.float64)
+        hi, lo = self.key_hi[rows], self.key_lo[rows]
+        features[:, 0] = hi >> np.uint64(32)
+        features[:, 1] = hi & np.uint64(0xFFFFFFFF)
+        features[:, 2] = (lo >> np.uint64(24)) & np.uint64(0xFFFF)
+        features[:, 3] = (lo >> np.uint64(8)) & np.uint64(0xFFFF)
+        features[:, 4] = lo & np.uint64(0xFF)
+        packets = self.packets[rows]
+        duration = self.last_seen[rows] - self.first_seen[rows]
+        gaps = np.maximum(packets - 1, 1)
+        mean_iat = duration / gaps
+        features[:, 5] = packets
+        features[:, 6] = self.bytes[rows]
+        features[:, 7] = duration
+        features[:, 8] = mean_iat
+        features[:, 9] = np.sqrt(np.maximum(self.iat_sum_sq[rows] / gaps - mean_iat ** 2, 0.0))
+        features[:, 10] = self.iat_max[rows]
+        features[:, 11:14] = self.flag_counts[rows]
+        keys = np.column_stack([hi, lo])
+        for row in rows.tolist():
+            self._remove(row)
+        return features, keys
+
+    def _evict_oldest(self) -> None:
+        """Emit the least recently seen 1/64 of the table to make room."""
+        count = max(1, self.capacity // 64)
+        rows = np.flatnonzero(self.active)
+        if count < len(rows):
+            rows = rows[np.argpartition(self.last_seen[rows], count)[:count]]
+        self.stats["flows_evicted"] += len(rows)
+        self.pending.append(self._emit(rows))
+
+    def expire(self, now: float) -> tuple:
+        """Emit every flow that hit the idle or active timeout, plus evicted flows.
+
+        Returns:
+            tuple: The (n, 14) flow features and the (n, 2) packed flow keys.
+        """
+        expired = np.flatnonzero(self.active & (
+            (now - self.last_seen > self.idle_timeout)
+            | (now - self.first_seen > self.active_timeout)
+        ))
+        self.stats["flows_expired"] += len(expired)
+        return self._collect(self._emit(expired))
+
+    def flush(self) -> tuple:
+        """Emit every flow still in the table, as ``expire`` does."""
+        rows = np.flatnonzero(self.active)
+        self.stats["flows_expired"] += len(rows)
+        return self._collect(self._emit(rows))
+
+    def _collect(self, emitted: tuple) -> tuple:
+        if self.pending:
+            self.pending.append(emitted)
+            emitted = tuple(np.concatenate(parts) for parts in zip(*self.pending))
+            self.pending = []
+        return emitted
+
+    def occupancy(self) -> dict:
+        """Table usage and lifetime counters."""
+        active = len(self)
+        return dict(self.stats, active_flows=active, capacity=self.capacity,
+                    occupancy=active / self.capacity)
@@ -0,0 +1,173 @@
+import argparse
+import time
+import numpy as np
+
+def average_path_length(n_samples) -> np.ndarray:
+    """Average path length of an unsuccessful BST search over n samples.
+
+    This is the c(n) normalisation term used by IsolationForest.
+    """
+    n = np.asarray(n_samples, dtype=np.float64)
+    result = np.zeros_like(n)
+    result[n == 2] = 1.0
+    mask = n > 2
+    result[mask] = (2.0 * (np.log(n[mask] - 1.0) + np.euler_gamma)
+                    - 2.0 * (n[mask] - 1.0) / n[mask])
+    return result
+
+# Node arrays of a CompiledForest, as stored in its .npz artifact.
+NODE_ARRAYS = ("feature", "threshold", "left", "right", "leaf_value", "roots")
+ARTIFACT_VERSION = 1
+
+class CompiledForest:
+    """Array-backed copy of a fitted IsolationForest.
+
+    Every tree's nodes are concatenated into flat arrays so that a whole batch
+    is walked through all trees with a handful of vectorized NumPy operations.
+    Leaves point back at themselves, which lets every sample take exactly
+    ``max_depth`` steps without per-tree bookkeeping. The public scoring
+    methods mirror sklearn's so the two models are interchangeable.
+    """
+
+    def __init__(self, feature, threshold, left, right, leaf_value, roots,
+                 max_depth: int, max_samples: int, offset: float, n_features: int = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.leaf_value = leaf_value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.max_samples = int(max_samples)
+        self.offset_ = float(offset)
+        self.n_features_in_ = n_features
+        self.denominator = len(roots) * float(average_path_length([max_samples])[0])
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        """Flatten a fitted sklearn IsolationForest."""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        max_depth = 0
+        base = 0
+        for estimator, columns in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(n_nodes)
+
+            depth = np.zeros(n_nodes, dtype=np.int64)
+            for node in range(n_nodes):  # Children always follow their parent.
+                if not is_leaf[node]:
+                    depth[tree.children_left[node]] = depth[node] + 1
+                    depth[tree.children_right[node]] = depth[node] + 1
+            max_depth = max(max_depth, int(depth.max()))
+
+            feature = np.asarray(columns)[np.where(is_leaf, 0, tree.feature)]
+            threshold = np.where(is_leaf, np.inf, tree.threshold)
+            left = np.where(is_leaf, node_ids, tree.children_left) + base
+            right = np.where(is_leaf, node_ids, tree.children_right) + base
+            value = np.where(is_leaf, depth + average_path_length(tree.n_node_samples), 0.0)
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(value)
+            roots.append(base)
+            base += n_nodes
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            leaf_value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            max_samples=model.max_samples_,
+            offset=model.offset_,
+            n_features=model.n_features_in_,
+        )
+
+    def save(self, file) -> None:
+        """Write the forest as an uncompressed .npz of plain arrays.
+
+        The artifact needs neither pickle nor sklearn to load, so detector
+        startup skips importing sklearn and unpickling its trees.
+        """
+        n_features = -1 if self.n_features_in_ is None else self.n_features_in_
+        np.savez(file, version=ARTIFACT_VERSION, max_depth=self.max_depth,
+                 max_samples=self.max_samples, offset=self.offset_, n_features=n_features,
+                 **{name: getattr(self, name) for name in NODE_ARRAYS})
+
+    @classmethod
+    def load(cls, file) -> "CompiledForest":
+        """Load a forest written by ``save``."""
+        with np.load(file, allow_pickle=False) as data:
+            if int(data["version"]) != ARTIFACT_VERSION:
+                raise ValueError(f"Unsupported compiled model version {int(data['version'])}.")
+            n_features = int(data["n_features"])
+            return cls(**{name: data[name] for name in NODE_ARRAYS},
+                       max_depth=int(data["max_depth"]), max_samples=int(data["max_samples"]),
+                       offset=float(data["offset"]),
+                       n_features=None if n_features < 0 else n_features)
+
+    def path_lengths(self, X) -> np.ndarray:
+        """Summed path length of every sample over all trees."""
+        # sklearn's trees compare float32 inputs against float64 thresholds.
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.leaf_value[nodes].sum(axis=1)
+
+    def score_samples(self, X) -> np.ndarray:
+        """Opposite of the anomaly score, as in IsolationForest.score_samples."""
+        return -np.exp2(-self.path_lengths(X) / self.denominator)
+
+    def decision_function(self, X) -> np.ndarray:
+        """Shifted score: negative values are outliers."""
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X) -> np.ndarray:
+        """Return -1 for outliers and 1 for inliers."""
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+def compare(model_file: str, n_rows: int, batch_size: int, repeats: int) -> None:
+    """Time the sklearn model and its compiled forest (parity is tested in tests/test_forest.py)."""
+    import joblib
+
+    model = joblib.load(model_file)
+    compiled = CompiledForest.from_sklearn(model)
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 1020, size=(n_rows, model.n_features_in_))
+
+    for name, scorer in (("sklearn", model), ("compiled", compiled)):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            scorer.decision_function(X[:1])
+        single = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        for _ in range(repeats):
+            scorer.decision_function(X[:batch_size])
+        batch = (time.perf_counter() - start) / repeats
+        print(f"{name:>9}: {single * 1e6:9.1f} µs/packet (single), "
+              f"{batch * 1e3:8.3f} ms/batch of {batch_size} "
+              f"({batch / batch_size * 1e6:.2f} µs/packet)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the compiled forest against the sklearn model."
+    )
+    parser.add_argument("--model", type=str, default="models/model.joblib",
+                        help="Path to the trained model file")
+    parser.add_argument("--rows", type=int, default=10000,
+                        help="Number of random rows to score")
+    parser.add_argument("--batch-size", type=int, default=256,
+                        help="Batch size used for the batched timing")
+    parser.add_argument("--repeats", type=int, default=200,
+                        help="Number of timed calls per measurement")
+    args = parser.parse_args()
+    compare(args.model, args.rows, args.batch_size, args.repeats)
@@ -1,10 +1,34 @@
+import time
+# Taken before everything else is imported, for the --time-startup report.
+IMPORT_STARTED = time.perf_counter()
 import numpy as np
-import joblib
 import os
 import logging
 import argparse
 import sys
-from scapy.all import sniff, IP, TCP
+import threading
+import glob
+import atexit
+import queue
+import logging.handlers
+import hashlib
+import io
+import signal
+import cProfile
+from collections import OrderedDict
+from scapy.utils import RawPcapReader
+from features import (extract_features, extract_features_frame, extract_flow_key_frame,
+                      ipv4_source, packet_frame, N_FEATURES, HEADERS, LINKTYPE_ETHERNET, RawFrame)
+from flows import (FlowTable, FlowRecord, N_FLOW_FEATURES, FLOW_HEADERS, DEFAULT_CAPACITY,
+                   DEFAULT_IDLE_TIMEOUT, DEFAULT_ACTIVE_TIMEOUT)
+from forest import CompiledForest
+from encoding import EncodedModel, load_encoding, encoding_path
+from metrics import Metrics, serve_metrics, DEFAULT_METRICS_HOST
+from ipc import IpcChannel, SCORE_RANGE, SCORE_BINS, TOP_TALKERS
+from sampling import PacketSampler
+from online import (OnlineLearner, DEFAULT_UPDATE_INTERVAL, DEFAULT_RESERVOIR_ROWS,
+                    DEFAULT_REPLACE_FRACTION)
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
 
 # Ensure UTF-8 encoding for Windows compatibility
 try:
@@ -15,90 +39,1027 @@ except AttributeError:
 MODEL_FILE = "models/model.joblib"
 LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, "ids.log")
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_LATENCY_MS = 50.0
+PCAP_EXTENSIONS = (".pcap", ".pcapng", ".cap")
+STAGES = ("read", "extract", "score", "report")
+# Latency histograms kept per detector: the stages above, plus how long packets
+# waited between the kernel timestamp and the capture callback, and in the batch.
+METRIC_STAGES = STAGES + ("capture", "batch_wait")
+DEFAULT_STATS_INTERVAL = 10.0
+DEFAULT_CACHE_SIZE = 65536
+# How often counters are streamed to the GUI with --ipc.
+STATUS_INTERVAL = 1.0
+# How often the model file is checked for a newer version (0 disables polling).
+DEFAULT_RELOAD_INTERVAL = 2.0
+# How often expired flows are swept out of the flow table and scored.
+FLOW_SWEEP_INTERVAL = 1.0
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+# Verdict lines go to both the log file and stdout; everything else only to the file.
+verdict_logger = logging.getLogger("bigdefend.verdicts")
 
-def setup_logging(log_file: str) -> None:
-    """Create log directory and configure logging."""
+def setup_logging(log_file: str) -> logging.handlers.QueueListener:
+    """Create log directory and configure logging.
+
+    Records are handed to a ``QueueListener`` thread, so the detection path
+    never blocks on file or console writes. The listener is stopped (and the
+    queue drained) at interpreter exit.
+    """
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    logging.basicConfig(
-        filename=log_file,
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
+    file_handler = logging.FileHandler(log_file, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+    console_handler.addFilter(lambda record: record.name == verdict_logger.name)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
     )
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
 
-def load_model(model_file: str):
-    """Load the trained model from file."""
+def load_model(model_file: str, compiled: bool = False, reload: bool = False):
+    """Load the trained model from file.
+
+    With ``compiled`` set, the sklearn forest is flattened into a
+    ``CompiledForest`` that scores batches without sklearn's per-call overhead.
+    A ``.npz`` artifact written by ``train_model.py --npz`` is always loaded
+    as a ``CompiledForest``, without importing joblib or sklearn at all.
+    The file is read once, so the logged SHA-256 is that of the bytes loaded.
+    The model is returned as an ``EncodedModel`` scoring raw feature rows
+    with the encoding spec saved next to it (octet sums for older models).
+    """
     if not os.path.exists(model_file):
         raise FileNotFoundError("Model not found! Please run train_model.py first.")
     try:
-        model = joblib.load(model_file)
-        logging.info("✔️ IDS Model Loaded.")
-        print("✔️ IDS Model Loaded.")
+        with open(model_file, "rb") as f:
+            data = f.read()
+        if model_file.endswith(".npz"):
+            model = CompiledForest.load(io.BytesIO(data))
+        else:
+            import joblib
+
+            model = joblib.load(io.BytesIO(data))
+            if compiled:
+                model = CompiledForest.from_sklearn(model)
+        n_features = getattr(model, "n_features_in_", None)
+        encoding = load_encoding(model_file,
+                                 FLOW_HEADERS if n_features == N_FLOW_FEATURES else HEADERS)
+        if n_features is not None and n_features != len(encoding.output_columns):
+            raise ValueError(f"{encoding_path(model_file)} encodes {len(encoding.output_columns)} "
+                             f"features but the model expects {n_features}.")
+        model = EncodedModel(model, encoding)
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        message = f"{'🔄 IDS Model Reloaded' if reload else '✔️ IDS Model Loaded'} (sha256 {digest})."
+        logging.info(message)
+        print(message)
         return model
     except Exception as e:
         logging.error(f"Error loading model: {e}")
         raise
 
-def extract_features(packet) -> np.ndarray:
-    """Extract features from a network packet."""
-    if packet.haslayer(IP):
-        ip_layer = packet[IP]
-        src_ip = sum(map(int, ip_layer.src.split('.')))
-        dst_ip = sum(map(int, ip_layer.dst.split('.')))
-        protocol = ip_layer.proto
-        packet_size = len(packet)
-
-        if packet.haslayer(TCP):
-            tcp_layer = packet[TCP]
-            src_port = tcp_layer.sport
-            dst_port = tcp_layer.dport
+class ModelWatcher:
+    """Reloads the model in the background when the model file changes.
+
+    The file is polled every ``poll_interval`` seconds (size, mtime and inode,
+    so an atomic rename is picked up), and ``request_reload`` forces a reload,
+    e.g. from a SIGHUP handler. The new model is loaded on the watcher thread
+    and handed to ``on_reload``; detection keeps using the old model until
+    then. A model that fails to load, or expects a different number of
+    features, is rejected and the old one stays in use.
+    """
+
+    def __init__(self, model_file: str, compiled: bool, on_reload,
+                 poll_interval: float = DEFAULT_RELOAD_INTERVAL, n_features: int = None):
+        self.model_file = model_file
+        self.compiled = compiled
+        self.on_reload = on_reload
+        self.poll_interval = poll_interval
+        self.n_features = n_features
+        self.signature = self._signature()
+        self.forced = False
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.model_file)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def request_reload(self) -> None:
+        """Reload the model on the watcher thread even if the file looks unchanged."""
+        self.forced = True
+        self.wake.set()
+
+    def _loop(self) -> None:
+        while True:
+            self.wake.wait(self.poll_interval or None)
+            self.wake.clear()
+            if self.stop_event.is_set():
+                break
+            signature = self._signature()
+            if signature is None or (signature == self.signature and not self.forced):
+                continue
+            self.signature, self.forced = signature, False
+            self.reload()
+
+    def reload(self) -> bool:
+        """Load the model file and hand it to ``on_reload``. Returns True on success."""
+        try:
+            model = load_model(self.model_file, self.compiled, reload=True)
+        except Exception as e:
+            print(f"❌ Model reload failed, keeping the current model: {e}")
+            return False
+        n_features = getattr(model, "n_features_in_", None)
+        if self.n_features is not None and n_features not in (None, self.n_features):
+            message = (f"Reloaded model expects {n_features} features instead of "
+                       f"{self.n_features}; keeping the current model.")
+            logging.error(message)
+            print(f"❌ {message}")
+            return False
+        self.on_reload(model)
+        return True
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+
+def install_reload_signal(reload) -> None:
+    """Call ``reload`` on SIGHUP (a no-op on platforms without it)."""
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload())
+
+def report_verdict(packet, score: float) -> None:
+    """Print and log the verdict for a single scored packet."""
+    # decision_function is negative for outliers, the same rule predict() applies.
+    status = "🚨 Threat Detected!" if score < 0 else "✔️ Safe"
+    kind = getattr(packet, "kind", "Packet")
+    verdict_logger.info(f"{kind} {packet.summary()} -> Score: {score:.4f} -> {status}")
+
+class VerdictCache:
+    """Bounded LRU cache of scores keyed on the packed feature row.
+
+    Wraps a model and exposes the same ``decision_function``, so it can be
+    used anywhere a model is. Rows already seen are answered from the cache;
+    the remaining distinct rows go to the model in a single call.
+    """
+
+    def __init__(self, model, capacity: int = DEFAULT_CACHE_SIZE):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.model = model
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = self.model_rows = 0
+
+    @property
+    def offset_(self) -> float:
+        return self.model.offset_
+
+    def set_model(self, model) -> None:
+        """Swap in a new model; cached scores of the old one are discarded."""
+        self.model = model
+        self.entries.clear()
+
+    def decision_function(self, X) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        scores = np.empty(len(X), dtype=np.float64)
+        entries = self.entries
+        missing = {}
+        for i, row in enumerate(X):
+            key = row.tobytes()
+            score = entries.get(key)
+            if score is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                entries.move_to_end(key)
+                scores[i] = score
+        n_missing = sum(map(len, missing.values()))
+        self.hits += len(X) - n_missing
+        self.misses += n_missing
+        if missing:
+            # Identical rows within the batch are scored only once.
+            first_rows = [rows[0] for rows in missing.values()]
+            fresh = self.model.decision_function(X[first_rows])
+            self.model_rows += len(first_rows)
+            for (key, rows), score in zip(missing.items(), fresh.tolist()):
+                scores[rows] = score
+                entries[key] = score
+            overflow = len(entries) - self.capacity
+            for _ in range(max(overflow, 0)):
+                entries.popitem(last=False)
+            self.evictions += max(overflow, 0)
+        return scores
+
+    def describe(self) -> str:
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0.0
+        return (f"cache {self.hits} hits / {self.misses} misses ({rate:.1f}% hit rate), "
+                f"{self.model_rows} rows scored by the model, {self.evictions} evictions, "
+                f"{len(self.entries)}/{self.capacity} entries")
+
+def source_address(packet) -> int:
+    """Source IPv4 address of a scapy packet or ``RawFrame`` as an integer (0 if none)."""
+    if isinstance(packet, RawFrame):
+        return ipv4_source(packet.data, packet.linktype)
+    frame = packet_frame(packet)
+    return ipv4_source(*frame) if frame is not None else 0
+
+class TrafficAggregator:
+    """Verdict aggregates for the GUI charts, taken once per status interval.
+
+    Each scored batch adds its counts, a fixed-bin histogram of its scores
+    and its packets per source address, so the GUI receives one small frame
+    per second however many packets are scored.
+    """
+
+    def __init__(self, top_n: int = TOP_TALKERS):
+        self.top_n = top_n
+        self.edges = np.linspace(*SCORE_RANGE, SCORE_BINS + 1)[1:-1]
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.scored = 0
+        self.anomalies = 0
+        self.histogram = np.zeros(SCORE_BINS, dtype=np.int64)
+        self.talkers = {}  # source address -> [packets, anomalies]
+
+    def add(self, scores: np.ndarray, anomalous: np.ndarray, sources: np.ndarray) -> None:
+        bins = np.bincount(np.searchsorted(self.edges, scores, side="right"), minlength=SCORE_BINS)
+        addresses, inverse = np.unique(sources, return_inverse=True)
+        packets = np.bincount(inverse, minlength=len(addresses))
+        flagged = np.bincount(inverse, weights=anomalous, minlength=len(addresses))
+        with self.lock:
+            self.scored += len(scores)
+            self.anomalies += int(np.count_nonzero(anomalous))
+            self.histogram += bins
+            talkers = self.talkers
+            for address, count, bad in zip(addresses.tolist(), packets.tolist(), flagged.tolist()):
+                entry = talkers.get(address)
+                if entry is None:
+                    talkers[address] = [count, int(bad)]
+                else:
+                    entry[0] += count
+                    entry[1] += int(bad)
+
+    def take(self) -> tuple:
+        """Return and reset ``(scored, anomalies, histogram, top talkers)``."""
+        with self.lock:
+            top = sorted(self.talkers.items(), key=lambda item: item[1][0], reverse=True)[:self.top_n]
+            taken = (self.scored, self.anomalies, self.histogram.tolist(),
+                     [(address, packets, anomalies) for address, (packets, anomalies) in top])
+            self._reset()
+        return taken
+
+class VerdictReporter:
+    """Reports batches of verdicts without a log line per safe packet.
+
+    Anomalies are always logged individually. Safe packets are only counted
+    and summarised every ``stats_interval`` seconds, unless ``log_safe`` is
+    set. Packet summaries are only built for packets that are logged. If a
+    ``VerdictCache`` is given, its counters are appended to each summary, and
+    with ``metrics`` the verdicts are counted and stage latencies appended.
+    With an ``aggregator``, every batch is also added to the GUI's aggregates.
+    ``unit`` names what is scored in the summaries ("flows" for flow records).
+    """
+
+    def __init__(self, log_safe: bool = False, stats_interval: float = DEFAULT_STATS_INTERVAL,
+                 cache: VerdictCache = None, metrics: Metrics = None,
+                 aggregator: TrafficAggregator = None, unit: str = "packets"):
+        self.log_safe = log_safe
+        self.unit = unit
+        self.stats_interval = stats_interval
+        self.cache = cache
+        self.metrics = metrics
+        self.aggregator = aggregator
+        self.safe = 0
+        self.anomalies = 0
+        self.last_stats = time.monotonic()
+
+    def report_batch(self, scores, get_packet, sources: np.ndarray = None) -> None:
+        """Report ``scores``; ``get_packet(i)`` returns the packet of row ``i``.
+
+        ``sources`` holds the source address of each row; it is only needed
+        with an aggregator and is read from the packets if not given.
+        """
+        anomalous = scores < 0
+        n_anomalies = int(np.count_nonzero(anomalous))
+        rows = range(len(scores)) if self.log_safe else np.flatnonzero(anomalous)
+        for i in rows:
+            report_verdict(get_packet(i), scores[i])
+        self.anomalies += n_anomalies
+        self.safe += len(scores) - n_anomalies
+        if self.metrics is not None:
+            self.metrics.inc("scored_total", len(scores))
+            self.metrics.inc("anomalies_total", n_anomalies)
+        if self.aggregator is not None:
+            if sources is None:
+                sources = np.fromiter((source_address(get_packet(i)) for i in range(len(scores))),
+                                      dtype=np.uint32, count=len(scores))
+            self.aggregator.add(scores, anomalous, sources)
+        if time.monotonic() - self.last_stats >= self.stats_interval:
+            self.log_stats()
+
+    def log_stats(self) -> None:
+        """Log the verdicts since the previous summary and reset the counters."""
+        now = time.monotonic()
+        if self.safe or self.anomalies:
+            message = (f"📊 {self.safe + self.anomalies} {self.unit} in {now - self.last_stats:.1f}s: "
+                       f"{self.safe} safe, {self.anomalies} threats")
+            if self.cache is not None:
+                message += f"; {self.cache.describe()}"
+            if self.metrics is not None:
+                message += f"; {self.metrics.summary()}"
+            verdict_logger.info(message)
+        self.safe = self.anomalies = 0
+        self.last_stats = now
+
+class StatusStream:
+    """Streams a snapshot of ``metrics`` to the GUI every ``interval`` seconds.
+
+    Each snapshot is preceded by a verdict frame: the ``aggregator``'s figures
+    for the interval or, without one, figures derived from the change in the
+    scored/anomaly counters, for detectors whose reporter runs in another
+    process (the multi-process pipeline, which sends no histogram or talkers).
+    """
+
+    def __init__(self, channel: IpcChannel, metrics: Metrics, interval: float = STATUS_INTERVAL,
+                 aggregator: TrafficAggregator = None):
+        self.channel = channel
+        self.metrics = metrics
+        self.interval = interval
+        self.aggregator = aggregator
+        self.sent = (0, 0)
+        self.last_sent = time.monotonic()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def send(self) -> None:
+        now = time.monotonic()
+        elapsed, self.last_sent = now - self.last_sent, now
+        snapshot = self.metrics.snapshot()
+        if self.aggregator is not None:
+            scored, anomalies, histogram, talkers = self.aggregator.take()
+            self.channel.verdicts(scored, anomalies, elapsed, histogram, talkers)
         else:
-            src_port = dst_port = 0
+            totals = (int(snapshot.get("scored_total", 0)), int(snapshot.get("anomalies_total", 0)))
+            self.channel.verdicts(totals[0] - self.sent[0], totals[1] - self.sent[1], elapsed)
+            self.sent = totals
+        self.channel.counters(snapshot)
 
-        return np.array([[src_ip, dst_ip, src_port, dst_port, protocol, packet_size]])
-    return None
+    def _loop(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            self.send()
 
-def detect_threat(packet, model) -> None:
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop streaming after sending the final figures."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.send()
+
+def detect_threat(packet, model, metrics: Metrics = None) -> None:
     """Detect if a network packet is anomalous and log the result."""
+    start = time.perf_counter()
     features = extract_features(packet)
+    extracted = time.perf_counter()
     if features is not None:
         try:
-            score = model.decision_function(features)[0]
-            is_anomalous = model.predict(features)[0] == -1  # -1 indicates anomaly
+            score = model.decision_function(np.array([features]))[0]
+        except Exception as e:
+            logging.error(f"Error during threat detection: {e}")
+            if metrics is not None:
+                metrics.inc("scoring_errors_total")
+            return
+        scored = time.perf_counter()
+        report_verdict(packet, score)
+        if metrics is not None:
+            metrics.observe("score", scored - extracted)
+            metrics.observe("report", time.perf_counter() - scored)
+            metrics.inc("scored_total")
+            metrics.inc("anomalies_total", int(score < 0))
+    if metrics is not None:
+        metrics.observe("extract", extracted - start)
+
+class BatchDetector:
+    """Buffer packet features and score them with one model call per batch.
+
+    A batch is scored as soon as it holds ``batch_size`` rows, or once the
+    oldest buffered packet has waited ``max_latency_ms`` milliseconds. Every
+    stage is timed into ``metrics`` (per-packet extraction, per-batch scoring
+    and reporting). Scored batches are also passed to the ``learner``, if any.
+    """
+
+    def __init__(self, model, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_latency_ms: float = DEFAULT_MAX_LATENCY_MS, reporter: VerdictReporter = None,
+                 metrics: Metrics = None, learner: OnlineLearner = None):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self.model = model
+        self.reporter = reporter or VerdictReporter()
+        self.batch_size = batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.learner = learner
+        self.features = np.empty((batch_size, N_FEATURES), dtype=np.float64)
+        self.packets = [None] * batch_size
+        self.count = 0
+        self.oldest = 0.0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.timer_thread = None
+        self.metrics = metrics or Metrics(METRIC_STAGES)
+        self.metrics.register('queue_depth{queue="batch"}', "gauge", lambda: self.count)
+
+    @property
+    def stage_seconds(self) -> dict:
+        return self.metrics.stage_seconds
+
+    def set_model(self, model) -> None:
+        """Swap the model between batches; the batch in flight finishes on the old one."""
+        with self.lock:
+            if isinstance(self.model, VerdictCache):
+                self.model.set_model(model)
+            else:
+                self.model = model
+
+    def add(self, packet) -> None:
+        """Buffer a packet, scoring the batch if it is full."""
+        self.metrics.observe("capture", time.time() - float(packet.time))
+        start = time.perf_counter()
+        row = extract_features(packet)
+        self.metrics.observe("extract", time.perf_counter() - start)
+        if row is not None:
+            self.add_features(row, packet)
+
+    def add_frame(self, data: bytes, linktype: int, timestamp: float = None) -> None:
+        """Buffer a raw frame, e.g. one read from a pcap file."""
+        start = time.perf_counter()
+        row = extract_features_frame(data, linktype)
+        self.metrics.observe("extract", time.perf_counter() - start)
+        if row is not None:
+            self.add_features(row, RawFrame(data, linktype))
+
+    def add_features(self, row, packet) -> None:
+        """Buffer an already extracted feature row for ``packet``."""
+        with self.lock:
+            if self.count == 0:
+                self.oldest = time.monotonic()
+            self.features[self.count] = row
+            self.packets[self.count] = packet
+            self.count += 1
+            if self.count == self.batch_size:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """Score whatever is currently buffered."""
+        with self.lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        n = self.count
+        if n == 0:
+            return
+        packets = self.packets[:n]
+        self.count = 0
+        self.metrics.observe("batch_wait", time.monotonic() - self.oldest)
+        start = time.perf_counter()
+        try:
+            scores = self.model.decision_function(self.features[:n])
+        except Exception as e:
+            logging.error(f"Error during threat detection: {e}")
+            self.metrics.inc("scoring_errors_total")
+            return
+        scored = time.perf_counter()
+        if self.learner is not None:
+            self.learner.observe(self.features[:n], scores)
+        self.reporter.report_batch(scores, packets.__getitem__)
+        self.metrics.observe("score", scored - start)
+        self.metrics.observe("report", time.perf_counter() - scored)
+
+    def _latency_loop(self) -> None:
+        tick = min(self.max_latency, 0.01) or 0.001
+        while not self.stop_event.wait(tick):
+            with self.lock:
+                if self.count and time.monotonic() - self.oldest >= self.max_latency:
+                    self._flush_locked()
+
+    def start(self) -> None:
+        """Start the background thread enforcing the latency bound."""
+        self.timer_thread = threading.Thread(target=self._latency_loop, daemon=True)
+        self.timer_thread.start()
+
+    def stop(self) -> None:
+        """Stop the latency thread and score any remaining packets."""
+        self.stop_event.set()
+        if self.timer_thread is not None:
+            self.timer_thread.join()
+        self.flush()
+        self.reporter.log_stats()
+
+class FlowDetector:
+    """Aggregates packets into flows and scores each flow once it expires.
+
+    Requires a model trained with ``train_model.py --flows``. Packet time is
+    taken from the capture, so pcap replays expire flows in capture time;
+    for live traffic a background thread also sweeps out idle flows. Scored
+    flows are also passed to the ``learner``, if any.
+    """
+
+    def __init__(self, model, table: FlowTable, reporter: VerdictReporter = None,
+                 live: bool = True, sweep_interval: float = FLOW_SWEEP_INTERVAL,
+                 metrics: Metrics = None, learner: OnlineLearner = None):
+        self.model = model
+        self.learner = learner
+        self.table = table
+        self.reporter = reporter or VerdictReporter()
+        self.live = live
+        self.sweep_interval = sweep_interval
+        self.last_sweep = 0.0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.sweep_thread = None
+        self.metrics = metrics or Metrics(METRIC_STAGES)
+        self.metrics.register('queue_depth{queue="flows"}', "gauge", lambda: len(self.table))
+        self.metrics.register("flows_evicted_total", "counter",
+                              lambda: self.table.stats["flows_evicted"])
+
+    @property
+    def stage_seconds(self) -> dict:
+        return self.metrics.stage_seconds
+
+    def set_model(self, model) -> None:
+        """Swap the model used for flows expiring from now on."""
+        with self.lock:
+            self.model = model
+
+    def add(self, packet) -> None:
+        """Account a scapy packet to its flow."""
+        frame = packet_frame(packet)
+        if frame is not None:
+            timestamp = float(packet.time)
+            self.metrics.observe("capture", time.time() - timestamp)
+            self.add_frame(*frame, timestamp=timestamp)
+
+    def add_frame(self, data: bytes, linktype: int, timestamp: float = None) -> None:
+        """Account a raw frame to its flow, scoring flows that have expired."""
+        start = time.perf_counter()
+        key = extract_flow_key_frame(data, linktype)
+        self.metrics.observe("extract", time.perf_counter() - start)
+        if key is None:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        with self.lock:
+            self.table.add(*key, timestamp)
+            if timestamp - self.last_sweep >= self.sweep_interval:
+                self.last_sweep = timestamp
+                self._score(*self.table.expire(timestamp))
+
+    def _score(self, features: np.ndarray, keys: np.ndarray) -> None:
+        if not len(features):
+            return
+        start = time.perf_counter()
+        try:
+            scores = self.model.decision_function(features)
         except Exception as e:
             logging.error(f"Error during threat detection: {e}")
+            self.metrics.inc("scoring_errors_total")
             return
+        scored = time.perf_counter()
+        if self.learner is not None:
+            self.learner.observe(features, scores)
+        self.reporter.report_batch(scores, lambda i: FlowRecord(keys[i], features[i]),
+                                   sources=keys[:, 0] >> np.uint64(32))
+        self.metrics.observe("score", scored - start)
+        self.metrics.observe("report", time.perf_counter() - scored)
+
+    def _sweep_loop(self) -> None:
+        while not self.stop_event.wait(self.sweep_interval):
+            with self.lock:
+                self._score(*self.table.expire(time.time()))
+
+    def start(self) -> None:
+        """Start sweeping idle flows in the background (live capture only)."""
+        if self.live:
+            self.sweep_thread = threading.Thread(target=self._sweep_loop, daemon=True)
+            self.sweep_thread.start()
+
+    def stop(self) -> None:
+        """Score every flow still in the table and log flow table statistics."""
+        self.stop_event.set()
+        if self.sweep_thread is not None:
+            self.sweep_thread.join()
+        with self.lock:
+            self._score(*self.table.flush())
+        self.reporter.log_stats()
+        stats = self.table.occupancy()
+        message = (f"📊 Flow table: {stats['flows_created']} flows from {stats['packets']} packets, "
+                   f"{stats['flows_evicted']} evicted, peak occupancy "
+                   f"{stats['peak_flows']}/{stats['capacity']}")
+        logging.info(message)
+        print(message)
+
+class InterfaceCapture:
+    """Sniffs one network interface on its own thread into a shared detector.
+
+    Each interface has its own ``PacketSampler``, so its packet and sampling
+    counters are kept separately.
+    """
+
+    def __init__(self, iface: str, detector, bpf: str = None, sampler: PacketSampler = None):
+        self.iface = iface
+        self.detector = detector
+        self.bpf = bpf
+        self.sampler = sampler or PacketSampler()
+        self.sniffer = None
+
+    def handle(self, packet) -> None:
+        if self.sampler.accept_packet(packet):
+            self.detector.add(packet)
+
+    def start(self) -> None:
+        from scapy.sendrecv import AsyncSniffer
 
-        status = "🚨 Threat Detected!" if is_anomalous else "✔️ Safe"
-        log_msg = f"Packet {packet.summary()} -> Score: {score:.4f} -> {status}"
-        print(log_msg)
-        logging.info(log_msg)
+        self.sniffer = AsyncSniffer(iface=self.iface, prn=self.handle, store=False, filter=self.bpf)
+        self.sniffer.start()
 
-def start_detection(model, iface: str) -> None:
-    """Start real-time IDS monitoring on the specified network interface."""
-    print(f"🔍 IDS is monitoring live traffic on interface '{iface}'...")
-    sniff(prn=lambda pkt: detect_threat(pkt, model), store=False, iface=iface)
+    def wait(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds; return True once sniffing has ended.
+
+        Raises a RuntimeError if sniffing failed, e.g. on an unknown interface.
+        """
+        try:
+            self.sniffer.join(timeout)
+        except Exception as e:
+            raise RuntimeError(f"Capture on '{self.iface}' failed: {e}") from e
+        return not self.sniffer.thread.is_alive()
+
+    def stop(self) -> None:
+        if self.sniffer is not None and self.sniffer.thread.is_alive():
+            self.sniffer.stop(join=False)
+            self.sniffer.thread.join()
+
+def start_detection(detector, ifaces, bpf: str = None, samplers: dict = None) -> None:
+    """Start real-time IDS monitoring on one or more network interfaces.
+
+    ``detector`` is a ``BatchDetector``, ``FlowDetector`` or a multi-process
+    ``pipeline.Pipeline``; every interface is sniffed on its own thread and
+    feeds the same detector, so the model (or scoring pool) is loaded once.
+    ``bpf`` is a capture filter compiled into the kernel, and ``samplers``
+    maps each interface to the sampler thinning out what passes it.
+    """
+    if isinstance(ifaces, str):
+        ifaces = [ifaces]
+    samplers = samplers or {}
+    captures = [InterfaceCapture(iface, detector, bpf, samplers.get(iface)) for iface in ifaces]
+    print(f"🔍 IDS is monitoring live traffic on {', '.join(repr(iface) for iface in ifaces)}...")
+    if bpf:
+        print(f"🧹 Capture filter: {bpf}")
+    detector.start()
+    try:
+        for capture in captures:
+            capture.start()
+        pending = list(captures)
+        while pending:
+            pending = [capture for capture in pending if not capture.wait(0.5)]
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        logging.error(str(e))
+        print(f"❌ {e}")
+    finally:
+        for capture in captures:
+            capture.stop()
+        detector.stop()
+        for capture in captures:
+            message = f"📊 {capture.iface}: {capture.sampler.seen} packets captured"
+            if capture.sampler.active:
+                message = f"📊 {capture.iface}: {capture.sampler.describe()}"
+            logging.info(message)
+            print(message)
+
+def expand_pcap_paths(patterns) -> list:
+    """Resolve pcap files, directories and glob patterns into a sorted file list."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(sorted(
+                os.path.join(pattern, name) for name in os.listdir(pattern)
+                if name.lower().endswith(PCAP_EXTENSIONS)
+            ))
+        else:
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise FileNotFoundError(f"No pcap files match '{pattern}'.")
+            files.extend(matches)
+    return files
+
+def frame_timestamp(meta) -> float:
+    """Capture time of a frame from RawPcapReader/RawPcapNgReader metadata."""
+    if hasattr(meta, "tsresol"):
+        return ((meta.tshigh << 32) | meta.tslow) / meta.tsresol
+    return meta.sec + meta.usec / 1e6
+
+def replay_pcaps(detector, paths, sampler: PacketSampler = None) -> dict:
+    """Score packets from pcap/pcapng files as fast as possible.
+
+    Frames are read without scapy dissection and go through the same feature
+    extraction, batching and reporting as live traffic. Throughput and a
+    per-stage time breakdown are printed at the end.
+
+    Returns:
+        dict: Packet, byte and timing totals of the replay.
+    """
+    files = expand_pcap_paths(paths)
+    print(f"📂 Replaying {len(files)} capture file(s)...")
+    packets = total_bytes = 0
+    read_seconds = 0.0
+    detector.start()
+    started = time.perf_counter()
+    try:
+        for path in files:
+            reader = RawPcapReader(path)
+            try:
+                default_linktype = getattr(reader, "linktype", LINKTYPE_ETHERNET)
+                frames = iter(reader)
+                while True:
+                    t0 = time.perf_counter()
+                    try:
+                        data, meta = next(frames)
+                    except StopIteration:
+                        break
+                    read_seconds += time.perf_counter() - t0
+                    packets += 1
+                    total_bytes += len(data)
+                    linktype = getattr(meta, "linktype", None) or default_linktype
+                    if sampler and not sampler.accept_frame(data, linktype):
+                        continue
+                    detector.add_frame(data, linktype, frame_timestamp(meta))
+            finally:
+                reader.close()
+    finally:
+        detector.stop()
+    elapsed = time.perf_counter() - started
+    stages = dict(detector.stage_seconds, read=read_seconds)
+
+    print(f"✔️ Replayed {packets} packets ({total_bytes} bytes) in {elapsed:.2f} s: "
+          f"{packets / elapsed if elapsed else 0:,.0f} packets/s, "
+          f"{total_bytes / elapsed if elapsed else 0:,.0f} bytes/s")
+    for stage in STAGES:
+        share = stages[stage] / elapsed * 100 if elapsed else 0
+        print(f"   {stage:>8}: {stages[stage]:8.3f} s ({share:5.1f}%)")
+    if sampler and sampler.active:
+        print(f"📊 {sampler.describe()}")
+    return {"packets": packets, "bytes": total_bytes, "seconds": elapsed, "stages": stages}
 
 def parse_args():
     """Parse command-line arguments."""
     parser = argparse.ArgumentParser(description="IDS: Real-time Intrusion Detection System")
-    parser.add_argument("--iface", type=str, default="Wi-Fi", help="Network interface to monitor")
+    parser.add_argument("--iface", type=str, nargs="+", default=["Wi-Fi"],
+                        help="Network interface(s) to monitor, each captured on its own thread")
     parser.add_argument("--model", type=str, default=MODEL_FILE, help="Path to the trained model file")
     parser.add_argument("--log", type=str, default=LOG_FILE, help="Path to the log file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Number of packets scored per model call")
+    parser.add_argument("--max-latency-ms", type=float, default=DEFAULT_MAX_LATENCY_MS,
+                        help="Maximum time a packet waits in the batch before scoring")
+    parser.add_argument("--pcap", type=str, nargs="+", default=None,
+                        help="Replay pcap/pcapng files, directories or globs instead of sniffing")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Scorer processes fed through a shared-memory ring (0 scores in-process)")
+    parser.add_argument("--log-safe", action="store_true",
+                        help="Log every safe packet instead of periodic summaries")
+    parser.add_argument("--stats-interval", type=float, default=DEFAULT_STATS_INTERVAL,
+                        help="Seconds between summaries of safe/threat packet counts")
+    parser.add_argument("--flows", action="store_true",
+                        help="Score 5-tuple flows on expiry (needs a model trained with --flows)")
+    parser.add_argument("--flow-capacity", type=int, default=DEFAULT_CAPACITY,
+                        help="Maximum number of flows tracked at once")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="Seconds without packets after which a flow is scored")
+    parser.add_argument("--active-timeout", type=float, default=DEFAULT_ACTIVE_TIMEOUT,
+                        help="Maximum flow lifetime in seconds before it is scored")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help="Entries in the LRU cache of scores per feature row (0 disables)")
+    parser.add_argument("--bpf", type=str, default=None,
+                        help="BPF capture filter applied in the kernel, e.g. 'not vlan 20 and not port 53'")
+    parser.add_argument("--sample", type=int, default=1,
+                        help="Keep one packet in N before feature extraction")
+    parser.add_argument("--flow-sample", type=int, default=1,
+                        help="Keep one 5-tuple flow in N (hash-based, deterministic)")
+    parser.add_argument("--compiled", action="store_true",
+                        help="Score with the array-backed forest instead of sklearn")
+    parser.add_argument("--metrics-port", type=int, default=0,
+                        help="Serve Prometheus metrics at http://<metrics-host>:PORT/metrics (0 disables)")
+    parser.add_argument("--metrics-host", type=str, default=DEFAULT_METRICS_HOST,
+                        help="Address the metrics endpoint listens on")
+    parser.add_argument("--profile", type=str, default=None, metavar="FILE",
+                        help="Profile a --pcap replay with cProfile and write pstats to FILE on exit "
+                             "(live capture extracts and scores on capture threads, "
+                             "which are not profiled)")
+    parser.add_argument("--ipc", action="store_true",
+                        help="Stream framed verdict/counter messages on stdout (for gui.py); "
+                             "text output moves to stderr")
+    parser.add_argument("--time-startup", action="store_true",
+                        help="Print how long imports, model loading and the first score took")
+    parser.add_argument("--reload-interval", type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help="Seconds between checks of the model file for a new version "
+                             "(0 disables; SIGHUP always forces a reload)")
+    parser.add_argument("--online", action="store_true",
+                        help="Continuously rebuild a share of the forest's trees from recent "
+                             "benign traffic (needs a .joblib model; updates are kept in memory)")
+    parser.add_argument("--update-interval", type=float, default=DEFAULT_UPDATE_INTERVAL,
+                        help="Seconds between online updates")
+    parser.add_argument("--reservoir-rows", type=int, default=DEFAULT_RESERVOIR_ROWS,
+                        help="Benign feature rows sampled between online updates")
+    parser.add_argument("--replace-fraction", type=float, default=DEFAULT_REPLACE_FRACTION,
+                        help="Share of the oldest trees replaced by each online update")
     return parser.parse_args()
 
+def report_startup(model, n_features: int, load_seconds: float) -> None:
+    """Print the import, model load and first-score times of this run."""
+    start = time.perf_counter()
+    model.decision_function(np.zeros((1, n_features)))
+    score_seconds = time.perf_counter() - start
+    total = time.perf_counter() - IMPORT_STARTED
+    message = (f"⏱️ Startup: imports {IMPORT_SECONDS * 1e3:.0f} ms, "
+               f"model load {load_seconds * 1e3:.0f} ms, "
+               f"first score {score_seconds * 1e3:.1f} ms, ready after {total * 1e3:.0f} ms")
+    logging.info(message)
+    print(message)
+
+def register_metrics(metrics: Metrics, listener, samplers: dict,
+                     cache: VerdictCache = None) -> None:
+    """Expose the log queue, sampler and cache counters through ``metrics``.
+
+    ``samplers`` maps each capture source (an interface, or "pcap") to its
+    sampler; its counters are labelled with the source.
+    """
+    metrics.register('queue_depth{queue="log"}', "gauge", listener.queue.qsize)
+    for source, sampler in samplers.items():
+        metrics.register(f'packets_seen_total{{source="{source}"}}', "counter",
+                         lambda sampler=sampler: sampler.seen)
+        metrics.register(f'dropped_packets_total{{reason="sample",source="{source}"}}', "counter",
+                         lambda sampler=sampler: sampler.dropped_every_n)
+        metrics.register(f'dropped_packets_total{{reason="flow_sample",source="{source}"}}',
+                         "counter", lambda sampler=sampler: sampler.dropped_flow)
+    if cache is not None:
+        metrics.register('cache_lookups_total{result="hit"}', "counter", lambda: cache.hits)
+        metrics.register('cache_lookups_total{result="miss"}', "counter", lambda: cache.misses)
+
 def main():
     args = parse_args()
-    setup_logging(args.log)
+    # Before anything is printed, so stdout carries nothing but frames.
+    channel = IpcChannel.open() if args.ipc else None
+    listener = setup_logging(args.log)
+    profiler = None
+    if args.profile:
+        if not args.pcap:
+            # cProfile follows one thread; only a replay extracts and scores on this one.
+            print("⚠️ --profile only covers the main thread; live capture extracts and scores "
+                  "on capture threads. Profile a --pcap replay of the traffic instead.")
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        run(args, listener, channel)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"📈 Profile written to {args.profile} (inspect with: python -m pstats {args.profile})")
+
+def run(args, listener, channel: IpcChannel = None) -> None:
+    """Load the model, build the detector and run live detection or a pcap replay."""
+    start = time.perf_counter()
+    if args.online and args.workers > 0 and not args.flows:
+        print("⚠️ --online is not supported with --workers; the model stays as loaded.")
+        args.online = False
     try:
-        model = load_model(args.model)
+        # The learner replaces trees in the sklearn model and compiles each update itself.
+        model = load_model(args.model, args.compiled and not args.online)
     except FileNotFoundError as e:
         print(f"❌ {e}")
         return
     except Exception as e:
         print(f"❌ An error occurred while loading the model: {e}")
         return
+    n_features = N_FLOW_FEATURES if args.flows else N_FEATURES
+    if model.n_features_in_ != n_features:
+        message = (f"{args.model} expects {model.n_features_in_} features, but "
+                   f"{'flow' if args.flows else 'packet'} mode produces {n_features}; "
+                   f"train it {'with' if args.flows else 'without'} --flows.")
+        logging.error(message)
+        print(f"❌ {message}")
+        return
+    base_model = model
+    if args.online and args.compiled and not isinstance(model.model, CompiledForest):
+        model = EncodedModel(CompiledForest.from_sklearn(base_model.model), base_model.encoding)
+    if args.time_startup:
+        report_startup(model, n_features, time.perf_counter() - start)
+
+    metrics = Metrics(METRIC_STAGES)
+    learner = None
+    if args.online:
+        try:
+            # The detector's set_model is only known once it exists; see below.
+            learner = OnlineLearner(base_model, None, args.update_interval, args.reservoir_rows,
+                                    args.replace_fraction, args.compiled, metrics)
+        except ValueError as e:
+            print(f"⚠️ Online updates disabled: {e}")
+    # Per-second chart data for the GUI; the pipeline's reporter runs in another process.
+    aggregator = None
+    if channel is not None and (args.flows or args.workers == 0):
+        aggregator = TrafficAggregator()
+    cache = None
+    if args.flows:
+        if args.workers > 0:
+            print("⚠️ --workers is not supported with --flows; scoring flows in-process.")
+        table = FlowTable(args.flow_capacity, args.idle_timeout, args.active_timeout)
+        reporter = VerdictReporter(args.log_safe, args.stats_interval, metrics=metrics,
+                                   aggregator=aggregator, unit="flows")
+        detector = FlowDetector(model, table, reporter, live=not args.pcap, metrics=metrics,
+                                learner=learner)
+    elif args.workers > 0:
+        # Scorer processes load their own copy of the model.
+        from pipeline import Pipeline
+        detector = Pipeline(args.model, args.log, args.workers, args.batch_size,
+                            args.max_latency_ms, args.compiled, block=bool(args.pcap),
+                            log_safe=args.log_safe, stats_interval=args.stats_interval,
+                            reload_interval=args.reload_interval, metrics=metrics)
+    else:
+        cache = VerdictCache(model, args.cache_size) if args.cache_size > 0 else None
+        reporter = VerdictReporter(args.log_safe, args.stats_interval, cache, metrics, aggregator)
+        detector = BatchDetector(cache or model, args.batch_size, args.max_latency_ms, reporter,
+                                 metrics, learner)
+
+    watcher = None
+    if args.workers > 0 and not args.flows:
+        # Scorer processes watch the model file themselves; SIGHUP is forwarded to them.
+        install_reload_signal(detector.reload_model)
+    elif learner is not None:
+        # A reloaded model file replaces the online model and becomes the base of updates.
+        learner.on_update = detector.set_model
+        watcher = ModelWatcher(args.model, False, learner.set_model,
+                               args.reload_interval, getattr(model, "n_features_in_", None))
+        install_reload_signal(watcher.request_reload)
+        watcher.start()
+        learner.start()
+        print(f"🌲 Online updates every {args.update_interval:g}s, replacing "
+              f"{args.replace_fraction:.0%} of the trees from up to {args.reservoir_rows} benign rows")
+    else:
+        watcher = ModelWatcher(args.model, args.compiled, detector.set_model,
+                               args.reload_interval, getattr(model, "n_features_in_", None))
+        install_reload_signal(watcher.request_reload)
+        watcher.start()
+
+    # One sampler per capture source, so each interface keeps its own counters.
+    samplers = {source: PacketSampler(args.sample, args.flow_sample)
+                for source in (["pcap"] if args.pcap else args.iface)}
+    register_metrics(metrics, listener, samplers, cache)
+    if args.metrics_port:
+        serve_metrics(metrics, args.metrics_port, args.metrics_host)
+        print(f"📈 Metrics at http://{args.metrics_host}:{args.metrics_port}/metrics")
+    status = None
+    if channel is not None:
+        status = StatusStream(channel, metrics, aggregator=aggregator)
+        status.start()
+    try:
+        if args.pcap:
+            if args.bpf:
+                print("⚠️ --bpf only applies to live capture; replaying every packet.")
+            try:
+                replay_pcaps(detector, args.pcap, samplers["pcap"])
+            except FileNotFoundError as e:
+                print(f"❌ {e}")
+            return
 
-    start_detection(model, args.iface)
+        start_detection(detector, args.iface, args.bpf, samplers)
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        if learner is not None:
+            learner.stop()
+        if status is not None:
+            status.stop()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,154 @@
+import os
+import struct
+import sys
+import threading
+import time
+
+# Every frame: payload length (u32) and message type (u8), then the payload.
+HEADER = struct.Struct("<IB")
+VERDICTS, COUNTERS, PROGRESS = 1, 2, 3
+# VERDICTS: one aggregate per interval - sender time, interval length (s), packets
+# (or flows) scored and anomalies among them, then a score histogram (u16 bin
+# count, u32 per bin) and the top talkers (u16 count, then source IPv4, packets
+# and anomalies as u32 each).
+VERDICT_RECORD = struct.Struct("<dfII")
+ITEM_COUNT = struct.Struct("<H")
+TALKER_RECORD = struct.Struct("<III")
+# Histogram range of decision_function scores; scores outside it fall in the end bins.
+SCORE_RANGE = (-0.5, 0.5)
+SCORE_BINS = 20
+TOP_TALKERS = 5
+# PROGRESS: steps done, total steps, followed by a UTF-8 label.
+PROGRESS_RECORD = struct.Struct("<QQ")
+# COUNTERS: repeated (name length u8, UTF-8 name, value f64).
+COUNTER_NAME_LEN = struct.Struct("<B")
+COUNTER_VALUE = struct.Struct("<d")
+# Frames larger than this are treated as a corrupt stream.
+MAX_PAYLOAD = 1 << 20
+
+def encode_frame(kind: int, payload: bytes) -> bytes:
+    return HEADER.pack(len(payload), kind) + payload
+
+def encode_verdicts(scored: int, anomalies: int, timestamp: float = None, interval: float = 0.0,
+                    histogram=(), talkers=()) -> bytes:
+    """Encode a verdict aggregate; ``talkers`` holds ``(ipv4, packets, anomalies)`` tuples."""
+    timestamp = time.time() if timestamp is None else timestamp
+    parts = [VERDICT_RECORD.pack(timestamp, interval, scored, anomalies),
+             ITEM_COUNT.pack(len(histogram)), struct.pack(f"<{len(histogram)}I", *histogram),
+             ITEM_COUNT.pack(len(talkers))]
+    parts.extend(TALKER_RECORD.pack(*talker) for talker in talkers)
+    return encode_frame(VERDICTS, b"".join(parts))
+
+def encode_counters(counters: dict) -> bytes:
+    parts = []
+    for name, value in counters.items():
+        name = name.encode("utf-8")[:255]
+        parts.append(COUNTER_NAME_LEN.pack(len(name)) + name + COUNTER_VALUE.pack(value))
+    return encode_frame(COUNTERS, b"".join(parts))
+
+def encode_progress(done: int, total: int, label: str = "") -> bytes:
+    return encode_frame(PROGRESS, PROGRESS_RECORD.pack(done, total) + label.encode("utf-8"))
+
+def decode_payload(kind: int, payload: bytes):
+    """Decode one frame payload into a tuple (VERDICTS, PROGRESS) or a dict (COUNTERS).
+
+    VERDICTS decode to ``(timestamp, interval, scored, anomalies, histogram, talkers)``.
+    """
+    if kind == VERDICTS:
+        timestamp, interval, scored, anomalies = VERDICT_RECORD.unpack_from(payload)
+        offset = VERDICT_RECORD.size
+        (bins,) = ITEM_COUNT.unpack_from(payload, offset)
+        histogram = struct.unpack_from(f"<{bins}I", payload, offset + ITEM_COUNT.size)
+        offset += ITEM_COUNT.size + 4 * bins
+        (count,) = ITEM_COUNT.unpack_from(payload, offset)
+        offset += ITEM_COUNT.size
+        talkers = [TALKER_RECORD.unpack_from(payload, offset + i * TALKER_RECORD.size)
+                   for i in range(count)]
+        return timestamp, interval, scored, anomalies, histogram, talkers
+    if kind == PROGRESS:
+        done, total = PROGRESS_RECORD.unpack_from(payload)
+        return done, total, payload[PROGRESS_RECORD.size:].decode("utf-8", errors="replace")
+    if kind == COUNTERS:
+        counters, offset = {}, 0
+        while offset < len(payload):
+            (length,) = COUNTER_NAME_LEN.unpack_from(payload, offset)
+            offset += COUNTER_NAME_LEN.size
+            name = payload[offset:offset + length].decode("utf-8", errors="replace")
+            offset += length
+            (counters[name],) = COUNTER_VALUE.unpack_from(payload, offset)
+            offset += COUNTER_VALUE.size
+        return counters
+    return payload
+
+class FrameDecoder:
+    """Incremental decoder: feed it stream chunks, get back complete messages."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """Return the ``(kind, message)`` pairs completed by ``data``."""
+        self.buffer += data
+        messages, offset = [], 0
+        while len(self.buffer) - offset >= HEADER.size:
+            length, kind = HEADER.unpack_from(self.buffer, offset)
+            if length > MAX_PAYLOAD:
+                raise ValueError(f"Frame of {length} bytes; the stream is not framed IPC.")
+            end = offset + HEADER.size + length
+            if end > len(self.buffer):
+                break
+            messages.append((kind, decode_payload(kind, bytes(self.buffer[offset + HEADER.size:end]))))
+            offset = end
+        del self.buffer[:offset]
+        return messages
+
+class IpcChannel:
+    """Write end of the framed message stream read by gui.py.
+
+    ``open`` moves the process's stdout (fd 1) onto stderr and keeps a private
+    duplicate of the original stdout for frames, so prints, log lines and
+    output of child processes all stay human-readable text on stderr while
+    stdout carries nothing but frames. Sends are thread-safe; if the reader
+    goes away the channel quietly stops sending.
+    """
+
+    def __init__(self, fd: int):
+        self.file = os.fdopen(fd, "wb")
+        self.lock = threading.Lock()
+        self.closed = False
+
+    @classmethod
+    def open(cls) -> "IpcChannel":
+        sys.stdout.flush()
+        fd = os.dup(sys.__stdout__.fileno())
+        os.dup2(sys.__stderr__.fileno(), sys.__stdout__.fileno())
+        return cls(fd)
+
+    def send(self, frame: bytes) -> None:
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.file.write(frame)
+                self.file.flush()
+            except OSError:
+                self.closed = True
+
+    def verdicts(self, scored: int, anomalies: int, interval: float = 0.0,
+                 histogram=(), talkers=()) -> None:
+        self.send(encode_verdicts(scored, anomalies, None, interval, histogram, talkers))
+
+    def counters(self, counters: dict) -> None:
+        self.send(encode_counters(counters))
+
+    def progress(self, done: int, total: int, label: str = "") -> None:
+        self.send(encode_progress(done, total, label))
+
+    def close(self) -> None:
+        with self.lock:
+            if not self.closed:
+                self.closed = True
+                try:
+                    self.file.close()
+                except OSError:
+                    pass
@@ -0,0 +1,208 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_PREFIX = "bigdefend_"
+# Each power of two is split into 2**SUB_BUCKET_BITS linear buckets (12.5% precision).
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# Largest tracked latency: 2**40 ns, about 18 minutes. Anything slower lands in the last bucket.
+MAX_EXPONENT = 40
+# Bucket boundaries (seconds) exported to Prometheus.
+PROMETHEUS_BOUNDS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                     1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+def bucket_bounds(index: int) -> tuple:
+    """Lower and upper bound, in nanoseconds, of a histogram bucket."""
+    if index < SUB_BUCKETS:
+        return index, index + 1
+    shift = index // SUB_BUCKETS - 1
+    sub = SUB_BUCKETS + index % SUB_BUCKETS
+    return sub << shift, (sub + 1) << shift
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}µs"
+    if seconds < 1.0:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+class LatencyHistogram:
+    """Log-linear latency histogram in the style of HdrHistogram.
+
+    Latencies are kept in nanoseconds: each power of two is split into
+    ``SUB_BUCKETS`` equal buckets, so any percentile is known to within
+    12.5% whatever its magnitude. Recording is a bit-length and a shift,
+    cheap enough to do for every packet.
+    """
+
+    def __init__(self):
+        self.counts = [0] * ((MAX_EXPONENT - SUB_BUCKET_BITS + 1) * SUB_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        ns = int(seconds * 1e9)
+        if ns < 0:
+            ns = 0
+        exponent = ns.bit_length()
+        if exponent <= SUB_BUCKET_BITS:
+            index = ns
+        else:
+            index = ((exponent - SUB_BUCKET_BITS) * SUB_BUCKETS
+                     + (ns >> (exponent - SUB_BUCKET_BITS - 1)) - SUB_BUCKETS)
+            index = min(index, len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound (seconds) of the bucket holding the ``q`` quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bucket_bounds(index)[1] / 1e9, self.max)
+        return self.max
+
+    def cumulative(self, bounds=PROMETHEUS_BOUNDS) -> list:
+        """Observations at or below each bound, as Prometheus ``le`` buckets need."""
+        result, seen, index = [], 0, 0
+        for bound in bounds:
+            limit = bound * 1e9
+            while index < len(self.counts) and bucket_bounds(index)[1] <= limit:
+                seen += self.counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+class Metrics:
+    """Counters, gauges and per-stage latency histograms of one detector.
+
+    Counters are incremented on the hot path; gauges and external counters
+    (e.g. the sampler's drop counts) are registered as callables and only read
+    when the metrics are rendered. ``render`` produces the Prometheus text
+    exposition format and ``summary`` a one-line digest for the periodic stats.
+    Several capture threads may update one instance, so updates and reads of
+    the counters and histograms hold ``lock``; registered callables are read
+    outside of it.
+    """
+
+    def __init__(self, stages=()):
+        self.histograms = {stage: LatencyHistogram() for stage in stages}
+        self.counters = {}
+        self.collectors = []
+        self.lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.record(seconds)
+
+    def inc(self, name: str, value: int = 1) -> None:
+        """Add to a counter; ``name`` may carry Prometheus labels, e.g. 'x{reason="y"}'."""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def register(self, name: str, kind: str, read) -> None:
+        """Expose ``read()`` as a ``kind`` ('counter' or 'gauge') metric."""
+        self.collectors.append((name, kind, read))
+
+    def snapshot(self) -> dict:
+        """Current value of every counter and registered metric, by name."""
+        with self.lock:
+            values = dict(self.counters)
+        for name, kind, read in self.collectors:
+            try:
+                values[name] = read()
+            except Exception:
+                continue
+        return values
+
+    @property
+    def stage_seconds(self) -> dict:
+        with self.lock:
+            return {stage: histogram.total for stage, histogram in self.histograms.items()}
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        families = {}  # Base name -> (type, sample lines); samples must stay grouped.
+
+        def add(name, kind, value):
+            base = METRIC_PREFIX + name.split("{")[0]
+            families.setdefault(base, (kind, []))[1].append(f"{METRIC_PREFIX}{name} {value}")
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+        for name, value in counters:
+            add(name, "counter", value)
+        for name, kind, read in self.collectors:
+            try:
+                add(name, kind, read())
+            except Exception:  # A gauge whose source is gone is simply left out.
+                continue
+        histogram = f"{METRIC_PREFIX}stage_latency_seconds"
+        with self.lock:
+            for stage, h in self.histograms.items():
+                samples = families.setdefault(histogram, ("histogram", []))[1]
+                for bound, count in zip(PROMETHEUS_BOUNDS, h.cumulative()):
+                    samples.append(f'{histogram}_bucket{{stage="{stage}",le="{bound:g}"}} {count}')
+                samples.append(f'{histogram}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                samples.append(f'{histogram}_sum{{stage="{stage}"}} {h.total}')
+                samples.append(f'{histogram}_count{{stage="{stage}"}} {h.count}')
+
+        lines = []
+        for base, (kind, samples) in families.items():
+            lines.append(f"# TYPE {base} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """One line of p50/p99 latencies per stage and current gauge values."""
+        with self.lock:
+            parts = [f"{stage} p50 {format_seconds(h.quantile(0.5))} "
+                     f"p99 {format_seconds(h.quantile(0.99))}"
+                     for stage, h in self.histograms.items() if h.count]
+        gauges = []
+        for name, kind, read in self.collectors:
+            if kind == "gauge":
+                # 'queue_depth{queue="batch"}' is shown as 'batch'.
+                label = name.split('"')[1] if "{" in name else name
+                try:
+                    gauges.append(f"{label}={read()}")
+                except Exception:
+                    continue
+        if gauges:
+            parts.append("depth " + " ".join(gauges))
+        return ", ".join(parts)
+
+def serve_metrics(metrics: Metrics, port: int, host: str = DEFAULT_METRICS_HOST):
+    """Serve ``metrics`` at http://host:port/metrics from a background thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Keep scrapes out of the console.
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
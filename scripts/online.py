@@ -0,0 +1,253 @@
+import logging
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+import numpy as np
+from encoding import EncodedModel
+
+DEFAULT_UPDATE_INTERVAL = 600.0
+DEFAULT_RESERVOIR_ROWS = 100_000
+DEFAULT_REPLACE_FRACTION = 0.1
+# Fewer benign rows than this (or than the forest's max_samples) postpone an update.
+MIN_UPDATE_ROWS = 1000
+# Rows of the reservoir scored to recalibrate the decision threshold after an update.
+CALIBRATION_ROWS = 10_000
+
+class RowReservoir:
+    """Uniform sample of at most ``capacity`` of the rows added since the last ``take``.
+
+    Vectorized reservoir sampling (Algorithm R), as in ``train_model.py``, but
+    fed incrementally from the scoring path: adding rows is a few NumPy
+    operations under a lock, and memory stays at ``capacity`` rows. Rows of
+    another width than those sampled so far start the sample over.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_RESERVOIR_ROWS, seed: int = 42,
+                 dtype=np.float32):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.dtype = dtype
+        self.rng = np.random.default_rng(seed)
+        self.rows = None
+        self.filled = 0
+        self.seen = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.filled
+
+    def add(self, rows: np.ndarray) -> None:
+        if not len(rows):
+            return
+        with self.lock:
+            if self.rows is not None and self.rows.shape[1] != rows.shape[1]:
+                self.rows = None
+                self.filled = self.seen = 0
+            if self.rows is None:
+                self.rows = np.empty((self.capacity, rows.shape[1]), dtype=self.dtype)
+            take = min(self.capacity - self.filled, len(rows))
+            self.rows[self.filled:self.filled + take] = rows[:take]
+            self.filled += take
+            rest = rows[take:]
+            if len(rest):
+                positions = np.arange(self.seen + take, self.seen + len(rows)) + 1
+                slots = (self.rng.random(len(rest)) * positions).astype(np.int64)
+                keep = slots < self.capacity
+                self.rows[slots[keep]] = rest[keep]
+            self.seen += len(rows)
+
+    def take(self) -> tuple:
+        """Return a copy of the sampled rows and the number of rows seen, and start over."""
+        with self.lock:
+            rows = self.rows[:self.filled].copy() if self.rows is not None else None
+            seen = self.seen
+            self.filled = self.seen = 0
+        return rows, seen
+
+    def clear(self) -> None:
+        """Drop the sample and its buffer."""
+        with self.lock:
+            self.rows = None
+            self.filled = self.seen = 0
+
+def refresh_forest(model, X: np.ndarray, replace: int, seed: int, compiled: bool = False) -> tuple:
+    """Replace the ``replace`` oldest trees of a fitted IsolationForest with trees grown on ``X``.
+
+    Runs in the learner's worker process. The oldest trees are dropped and
+    the same warm-start ``fit`` that ``train_isolation_forest`` uses grows
+    the replacements, so ``max_samples`` and ``max_features`` are those of
+    the original forest. ``X`` only holds benign rows, so the threshold is
+    not recomputed as a percentile of it: it is moved by the shift of the
+    median score of ``X``, keeping the distance between normal traffic and
+    the threshold the model was trained with.
+
+    Returns:
+        tuple: The updated model, its ``CompiledForest`` (None unless
+        ``compiled``) and the CPU seconds the update took.
+    """
+    started = time.process_time()
+    calibration = X[:CALIBRATION_ROWS]
+    before = model.score_samples(calibration) if model.contamination != "auto" else None
+    settings = (model.n_estimators, model.warm_start, model.random_state, model.n_jobs,
+                model.max_samples, model.contamination)
+    offset = model.offset_
+    model.estimators_ = model.estimators_[replace:]
+    model.estimators_features_ = model.estimators_features_[replace:]
+    model.n_estimators = len(model.estimators_) + replace
+    model.warm_start = True
+    model.random_state = seed
+    model.n_jobs = 1
+    model.max_samples = model.max_samples_
+    model.contamination = "auto"  # Skips sklearn's percentile pass over X; set below instead.
+    try:
+        model.fit(X)
+    finally:
+        (model.n_estimators, model.warm_start, model.random_state, model.n_jobs,
+         model.max_samples, model.contamination) = settings
+    if before is not None:
+        shift = np.median(model.score_samples(calibration)) - np.median(before)
+        model.offset_ = offset + float(shift)
+    scorer = None
+    if compiled:
+        from forest import CompiledForest
+
+        scorer = CompiledForest.from_sklearn(model)
+    return model, scorer, time.process_time() - started
+
+def init_worker() -> None:
+    """Learner worker initializer: let scoring win the CPU over updates.
+
+    Ctrl+C is left to the parent, which terminates the worker on ``stop``.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(os, "nice"):
+        os.nice(10)
+
+class OnlineLearner:
+    """Keeps an sklearn IsolationForest in step with live traffic.
+
+    ``model`` is an ``encoding.EncodedModel`` around the forest, as
+    ``ids.load_model`` returns it. Detectors pass every scored batch of raw
+    rows to ``observe``; rows scored as benign are encoded and sampled into a
+    float32 ``RowReservoir``, as in the training matrix (the sample starts
+    over when a reloaded model comes with another encoding). Every
+    ``update_interval`` seconds the reservoir is handed to a background
+    process that replaces the
+    ``replace_fraction`` oldest trees with trees grown on it (see
+    ``refresh_forest``), and the result goes to ``on_update`` (the detector's
+    ``set_model``), so scoring never waits for an update. With ``compiled``
+    the detector gets a ``CompiledForest`` of each model. ``set_model``
+    installs a model from elsewhere (e.g. a reloaded model file); an update
+    started from the previous model is then discarded. Updates only live in
+    memory: the model file is never written.
+    """
+
+    def __init__(self, model, on_update, update_interval: float = DEFAULT_UPDATE_INTERVAL,
+                 reservoir_rows: int = DEFAULT_RESERVOIR_ROWS,
+                 replace_fraction: float = DEFAULT_REPLACE_FRACTION, compiled: bool = False,
+                 metrics=None):
+        if not 0 < replace_fraction <= 1:
+            raise ValueError("replace_fraction must be in (0, 1]")
+        if not hasattr(model.model, "estimators_"):
+            raise ValueError("online updates need the sklearn model (.joblib), not a .npz artifact")
+        self.model = model
+        self.on_update = on_update
+        self.update_interval = update_interval
+        self.reservoir = RowReservoir(reservoir_rows, dtype=np.float32)
+        self.replace_fraction = replace_fraction
+        self.compiled = compiled
+        self.metrics = metrics
+        self.generation = 0
+        self.updates = 0
+        self.rng = np.random.default_rng(42)
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.pool = None
+
+    def observe(self, features: np.ndarray, scores: np.ndarray) -> None:
+        """Sample the rows of a scored batch that were not flagged."""
+        benign = features[scores >= 0]
+        if len(benign):
+            self.reservoir.add(self.model.encoding.transform(benign, np.float32))
+
+    def set_model(self, model) -> None:
+        """Install ``model`` as the base of future updates and pass it to the detector."""
+        scorer = model
+        if self.compiled:
+            from forest import CompiledForest
+
+            scorer = EncodedModel(CompiledForest.from_sklearn(model.model), model.encoding)
+        with self.lock:
+            if model.encoding != self.model.encoding:
+                self.reservoir.clear()
+            self.model = model
+            self.generation += 1
+            self.on_update(scorer)
+
+    def update(self) -> bool:
+        """Run one update now, waiting for the worker; returns True if a new model was installed."""
+        with self.lock:
+            model, generation = self.model, self.generation
+        forest, encoding = model.model, model.encoding
+        needed = max(forest.max_samples_, MIN_UPDATE_ROWS)
+        if len(self.reservoir) < needed:
+            logging.info(f"Online update postponed: {len(self.reservoir)} of {needed} "
+                         f"benign rows sampled.")
+            return False
+        rows, seen = self.reservoir.take()
+        replace = max(1, round(len(forest.estimators_) * self.replace_fraction))
+        seed = int(self.rng.integers(2 ** 31 - 1))
+        started = time.perf_counter()
+        job = self.pool.apply_async(refresh_forest, (forest, rows, replace, seed, self.compiled))
+        while not job.ready():
+            if self.stop_event.is_set():
+                return False
+            job.wait(0.5)
+        try:
+            updated, scorer, cpu_seconds = job.get()
+        except Exception as e:
+            logging.error(f"Online update failed, keeping the current model: {e}")
+            print(f"❌ Online update failed, keeping the current model: {e}")
+            return False
+        wall_seconds = time.perf_counter() - started
+        with self.lock:
+            if generation != self.generation:
+                logging.info("Online update discarded: the model was replaced meanwhile.")
+                return False
+            self.model = EncodedModel(updated, encoding)
+            self.on_update(EncodedModel(scorer or updated, encoding))
+        self.updates += 1
+        if self.metrics is not None:
+            self.metrics.inc("online_updates_total")
+            self.metrics.inc("online_update_cpu_seconds_total", cpu_seconds)
+            self.metrics.observe("online_update", wall_seconds)
+        message = (f"🌲 Online update {self.updates}: replaced {replace}/{len(updated.estimators_)} "
+                   f"trees using {len(rows)} of {seen} benign rows; "
+                   f"{cpu_seconds:.2f}s CPU, {wall_seconds:.2f}s wall")
+        logging.info(message)
+        print(message)
+        return True
+
+    def _loop(self) -> None:
+        while not self.stop_event.wait(self.update_interval):
+            self.update()
+
+    def start(self) -> None:
+        """Start the worker process and the update thread."""
+        # Spawned rather than forked: the capture threads are already running.
+        self.pool = mp.get_context("spawn").Pool(1, initializer=init_worker)
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop updating; an update in progress is abandoned."""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
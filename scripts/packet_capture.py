@@ -1,9 +1,18 @@
-import csv
-import os
+import argparse
+import logging
+import signal
 import time
 import threading
 import sys
-from scapy.all import sniff, IP, TCP
+from scapy.sendrecv import sniff
+from features import extract_features, extract_flow_key_frame, packet_frame
+from capture_writer import (CaptureWriter, FORMATS, DEFAULT_FLUSH_ROWS,
+                            DEFAULT_FLUSH_INTERVAL, COLUMN_DTYPES)
+from shards import ShardedSink, DEFAULT_SHARD_SECONDS, DEFAULT_SHARD_BYTES
+from sampling import PacketSampler
+from ipc import IpcChannel
+from flows import (FlowTable, FLOW_COLUMN_DTYPES, DEFAULT_CAPACITY, DEFAULT_IDLE_TIMEOUT,
+                   DEFAULT_ACTIVE_TIMEOUT)
 
 # Ensure UTF-8 encoding for Windows compatibility
 try:
@@ -12,35 +21,55 @@ except AttributeError:
     pass  # Fallback for older Python versions
 
 CAPTURE_FILE = "packets/captured_packets.csv"
-HEADERS = ["src_ip", "dst_ip", "src_port", "dst_port", "protocol", "packet_size"]
-
-def extract_features(packet):
-    """Extract features from a network packet."""
-    if packet.haslayer(IP):
-        src_ip = sum(map(int, packet[IP].src.split('.')))
-        dst_ip = sum(map(int, packet[IP].dst.split('.')))
-        protocol = packet[IP].proto
-        packet_size = len(packet)
-        
-        if packet.haslayer(TCP):
-            src_port = packet[TCP].sport
-            dst_port = packet[TCP].dport
-        else:
-            src_port = dst_port = 0
-
-        return [src_ip, dst_ip, src_port, dst_port, protocol, packet_size]
-    return None
-
-def packet_callback(packet):
-    """Handles incoming packets and saves them."""
+CAPTURE_DIR = "packets/captured_packets"
+FLOW_FILE = "packets/captured_flows.csv"
+FLOW_DIR = "packets/captured_flows"
+SHARD_DIR = "packets/packet_shards"
+FLOW_SHARD_DIR = "packets/flow_shards"
+# How often (in capture time) expired flows are swept out of the flow table.
+FLOW_SWEEP_INTERVAL = 1.0
+
+def packet_callback(packet, writer: CaptureWriter):
+    """Handles incoming packets and buffers them for saving."""
     features = extract_features(packet)
     if features:
-        with open(CAPTURE_FILE, "a", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(features)
-
-def countdown_timer(duration, stop_event):
-    """Displays a reverse countdown with a progress bar and percentage."""
+        writer.write(features)
+
+class FlowRecorder:
+    """Aggregates captured packets into flows and writes each flow once it expires."""
+
+    def __init__(self, writer: CaptureWriter, table: FlowTable):
+        self.writer = writer
+        self.table = table
+        self.last_sweep = 0.0
+
+    def __call__(self, packet) -> None:
+        frame = packet_frame(packet)
+        key = extract_flow_key_frame(*frame) if frame else None
+        if key is None:
+            return
+        timestamp = float(packet.time)
+        self.table.add(*key, timestamp)
+        if timestamp - self.last_sweep >= FLOW_SWEEP_INTERVAL:
+            self.last_sweep = timestamp
+            self.writer.write_block(self.table.expire(timestamp)[0])
+
+    def close(self) -> None:
+        """Write out the flows still in the table."""
+        self.writer.write_block(self.table.flush()[0])
+        stats = self.table.occupancy()
+        print(f"📊 Flow table: {stats['flows_created']} flows from {stats['packets']} packets, "
+              f"{stats['flows_evicted']} evicted under pressure")
+
+def raise_keyboard_interrupt(signum, frame):
+    """Turn SIGTERM (e.g. from the GUI's stop button) into a clean shutdown."""
+    raise KeyboardInterrupt
+
+def countdown_timer(duration, stop_event, on_tick=None):
+    """Displays a reverse countdown with a progress bar and percentage.
+
+    ``on_tick(elapsed)`` is called on every update, e.g. to stream progress to the GUI.
+    """
     start_time = time.monotonic()
     bar_length = 30  # Length of the progress bar
 
@@ -55,33 +84,139 @@ def countdown_timer(duration, stop_event):
         bar = '█' * filled_length + '-' * (bar_length - filled_length)
         
         print(f"\r⏳ Time remaining: {remaining:3d} sec |{bar}| {percent_complete:3d}% ", end="", flush=True)
+        if on_tick is not None:
+            on_tick(elapsed)
         time.sleep(0.5)
 
     print("\r✔️ Capture completed. Processing data...")
 
-def start_packet_capture(duration=60):
-    """Capture live packets for a specified duration."""
+def start_packet_capture(duration=60, output=None, fmt="csv",
+                         flush_rows=DEFAULT_FLUSH_ROWS, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                         flows=False, flow_table=None, bpf=None, sampler=None, channel=None,
+                         iface=None, shards=None):
+    """Capture live packets (or flows, with ``flows`` set) for a specified duration.
+
+    ``bpf`` is a capture filter compiled into the kernel; ``sampler`` thins out
+    the packets that pass it before their features are extracted. With an IPC
+    ``channel``, progress and row counts are streamed to the GUI. ``iface`` is
+    an interface or list of interfaces (scapy's default interface if None).
+    ``shards``, a dict of ``ShardedSink`` rotation and retention settings,
+    turns ``output`` into a directory of rotating shards.
+    """
+    column_dtypes = FLOW_COLUMN_DTYPES if flows else COLUMN_DTYPES
+    if shards is not None:
+        output = output or (FLOW_SHARD_DIR if flows else SHARD_DIR)
+    elif flows:
+        output = output or (FLOW_FILE if fmt == "csv" else FLOW_DIR)
+    else:
+        output = output or (CAPTURE_FILE if fmt == "csv" else CAPTURE_DIR)
+    try:
+        sink = ShardedSink(output, fmt, column_dtypes, **shards) if shards is not None else None
+        writer = CaptureWriter(output, fmt, flush_rows, flush_interval, column_dtypes, sink)
+    except ValueError as e:
+        # E.g. a capture left from before full IPv4 addresses were recorded.
+        logging.error(f"Cannot capture to {output}: {e}")
+        print(f"❌ Cannot capture to {output}; pass another --output or remove it.")
+        return
     print(f"🌐 Capturing network traffic for {duration} seconds...")
-
-    if not os.path.exists(CAPTURE_FILE):
-        with open(CAPTURE_FILE, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(HEADERS)
-
+    if flows:
+        recorder = callback = FlowRecorder(writer, flow_table or FlowTable())
+    else:
+        callback = lambda pkt: packet_callback(pkt, writer)
+    if sampler:
+        callback = sampler.filter(callback)
+    if bpf:
+        print(f"🧹 Capture filter: {bpf}")
     stop_event = threading.Event()
+
+    def on_tick(elapsed):
+        channel.progress(int(min(elapsed, duration)), duration, "Capturing")
+        channel.counters({"rows": writer.rows_written + writer.count,
+                          "packets_seen": sampler.seen if sampler else 0})
     
     # Start countdown timer in a separate thread
-    timer_thread = threading.Thread(target=countdown_timer, args=(duration, stop_event))
+    timer_thread = threading.Thread(target=countdown_timer,
+                                    args=(duration, stop_event, on_tick if channel else None))
     timer_thread.start()
 
-    # Start packet sniffing
-    sniff(prn=packet_callback, store=False, timeout=duration)
-
-    # Signal the countdown to stop and wait for the thread to finish
-    stop_event.set()
-    timer_thread.join()
-
-    print(f"✔️ Packet capture completed. Data saved in {CAPTURE_FILE}")
+    signal.signal(signal.SIGTERM, raise_keyboard_interrupt)
+    try:
+        # Start packet sniffing
+        sniff(prn=callback, store=False, timeout=duration, filter=bpf, iface=iface)
+    except KeyboardInterrupt:
+        print("\n⛔ Capture interrupted.")
+    finally:
+        # Signal the countdown to stop and wait for the thread to finish
+        stop_event.set()
+        timer_thread.join()
+        if flows:
+            recorder.close()
+        writer.close()
+        if sampler and sampler.active:
+            print(f"📊 {sampler.describe()}")
+
+    kind = "flows" if flows else "packets"
+    print(f"✔️ Packet capture completed. {writer.rows_written} {kind} saved in {output}")
+    if channel:
+        channel.progress(duration, duration, "Capturing")
+        channel.counters({"rows": writer.rows_written})
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Capture live network traffic for training")
+    parser.add_argument("--duration", type=int, default=120,
+                        help="Capture duration in seconds")
+    parser.add_argument("--output", type=str, default=None,
+                        help=f"Output path (default: {CAPTURE_FILE} for csv, {CAPTURE_DIR} for npy)")
+    parser.add_argument("--format", type=str, choices=FORMATS, default="csv",
+                        help="csv for compatibility, npy for fixed-width binary columns")
+    parser.add_argument("--flush-rows", type=int, default=DEFAULT_FLUSH_ROWS,
+                        help="Number of buffered packets written per block")
+    parser.add_argument("--flush-interval", type=float, default=DEFAULT_FLUSH_INTERVAL,
+                        help="Maximum seconds between writes of buffered packets")
+    parser.add_argument("--flows", action="store_true",
+                        help=f"Record one row per 5-tuple flow instead of per packet (default output {FLOW_FILE})")
+    parser.add_argument("--flow-capacity", type=int, default=DEFAULT_CAPACITY,
+                        help="Maximum number of flows tracked at once")
+    parser.add_argument("--idle-timeout", type=float, default=DEFAULT_IDLE_TIMEOUT,
+                        help="Seconds without packets after which a flow is emitted")
+    parser.add_argument("--active-timeout", type=float, default=DEFAULT_ACTIVE_TIMEOUT,
+                        help="Maximum flow lifetime in seconds before it is emitted")
+    parser.add_argument("--bpf", type=str, default=None,
+                        help="BPF capture filter applied in the kernel, e.g. 'not vlan 20 and not port 53'")
+    parser.add_argument("--sample", type=int, default=1,
+                        help="Keep one packet in N before feature extraction")
+    parser.add_argument("--flow-sample", type=int, default=1,
+                        help="Keep one 5-tuple flow in N (hash-based, deterministic)")
+    parser.add_argument("--shards", action="store_true",
+                        help="Write rotating shards with a manifest to a directory "
+                             f"(default output {SHARD_DIR}, or {FLOW_SHARD_DIR} with --flows)")
+    parser.add_argument("--shard-seconds", type=float, default=DEFAULT_SHARD_SECONDS,
+                        help="Start a new shard after this many seconds")
+    parser.add_argument("--shard-mb", type=float, default=DEFAULT_SHARD_BYTES / 2 ** 20,
+                        help="Start a new shard once the current one reaches this size (MiB)")
+    parser.add_argument("--retain-hours", type=float, default=0,
+                        help="Delete shards older than this (0 keeps them)")
+    parser.add_argument("--retain-mb", type=float, default=0,
+                        help="Delete the oldest shards while the capture exceeds this size "
+                             "in MiB (0 keeps them)")
+    parser.add_argument("--iface", type=str, nargs="+", default=None,
+                        help="Interface(s) to capture on (default: scapy's default interface)")
+    parser.add_argument("--ipc", action="store_true",
+                        help="Stream framed progress/counter messages on stdout (for gui.py); "
+                             "text output moves to stderr")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    start_packet_capture(120)  # Captures packets for 2 minutes
+    args = parse_args()
+    channel = IpcChannel.open() if args.ipc else None
+    table = FlowTable(args.flow_capacity, args.idle_timeout, args.active_timeout)
+    shards = None
+    if args.shards:
+        shards = {"shard_seconds": args.shard_seconds, "shard_bytes": int(args.shard_mb * 2 ** 20),
+                  "retain_seconds": args.retain_hours * 3600,
+                  "retain_bytes": int(args.retain_mb * 2 ** 20)}
+    start_packet_capture(args.duration, args.output, args.format,
+                         args.flush_rows, args.flush_interval, args.flows, table,
+                         args.bpf, PacketSampler(args.sample, args.flow_sample), channel,
+                         args.iface, shards)
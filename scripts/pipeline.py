@@ -0,0 +1,342 @@
+import logging
+import multiprocessing as mp
+import os
+import signal
+import queue
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from metrics import Metrics
+from features import (extract_features_frame, packet_frame, N_FEATURES, SNAP_LEN,
+                      RawFrame)
+
+DEFAULT_SLOTS = 64
+STOP = -1
+# Per-process timing rows: the capture process, the writer, then one per scorer.
+CAPTURE_ROW, WRITER_ROW = 0, 1
+STAGES = ("read", "extract", "score", "report")
+COUNTERS = ("captured", "dropped", "scored", "anomalies")
+
+class FeatureRing:
+    """Fixed-size ring of feature slots in one shared memory block.
+
+    Each slot holds up to ``slot_rows`` feature rows, their scores and the
+    first ``SNAP_LEN`` bytes of every frame (so the writer can print packet
+    summaries). Slots are passed between processes by index only; the data
+    never goes through a pipe.
+    """
+
+    def __init__(self, slots: int, slot_rows: int, workers: int, name: str = None):
+        self.slots = slots
+        self.slot_rows = slot_rows
+        self.workers = workers
+        layout = [
+            ("features", np.float64, (slots, slot_rows, N_FEATURES)),
+            ("scores", np.float64, (slots, slot_rows)),
+            ("heads", np.uint8, (slots, slot_rows, SNAP_LEN)),
+            ("lengths", np.int32, (slots, slot_rows)),
+            ("linktypes", np.int32, (slots, slot_rows)),
+            ("counts", np.int64, (slots,)),
+            ("counters", np.int64, (len(COUNTERS),)),
+            ("stage_seconds", np.float64, (workers + 2, len(STAGES))),
+        ]
+        size = sum(np.dtype(dtype).itemsize * int(np.prod(shape)) for _, dtype, shape in layout)
+        self.owner = name is None
+        # Only the creating process may unlink the block, so attachments are untracked.
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size,
+                                              track=self.owner)
+        offset = 0
+        for field, dtype, shape in layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            setattr(self, field, array)
+            offset += array.nbytes
+        if self.owner:
+            self.counts[:] = 0
+            self.counters[:] = 0
+            self.stage_seconds[:] = 0
+
+    @property
+    def spec(self) -> tuple:
+        """Arguments needed to attach to this ring from another process."""
+        return (self.slots, self.slot_rows, self.workers, self.shm.name)
+
+    def counter(self, name: str) -> int:
+        return int(self.counters[COUNTERS.index(name)])
+
+    def close(self) -> None:
+        # Drop the NumPy views before releasing the buffer they point into.
+        for field in ("features", "scores", "heads", "lengths", "linktypes",
+                      "counts", "counters", "stage_seconds"):
+            setattr(self, field, None)
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def score_worker(index: int, ring_spec: tuple, model_file: str, compiled: bool,
+                 reload_interval: float, log_file: str, work_queue, done_queue) -> None:
+    """Scorer process: score every slot taken from ``work_queue``.
+
+    Each scorer watches the model file itself (and reloads on SIGHUP), swapping
+    in a new model between slots. STOP is always posted to ``done_queue``, even
+    if the scorer fails to start, so the writer never waits for it. A scorer
+    that cannot load the model passes its slots on unscored, so capture does
+    not stall on a ring that never drains.
+    """
+    from ids import setup_logging, load_model, ModelWatcher, install_reload_signal
+
+    ring = watcher = model = None
+    try:
+        setup_logging(log_file)
+        ring = FeatureRing(*ring_spec)
+        row, score_stage = WRITER_ROW + 1 + index, STAGES.index("score")
+        try:
+            model = load_model(model_file, compiled)
+        except Exception as e:
+            logging.error(f"Scorer {index} could not load the model; its slots go unscored: {e}")
+
+        def swap(new_model):
+            nonlocal model
+            model = new_model
+
+        if model is not None:
+            watcher = ModelWatcher(model_file, compiled, swap, reload_interval,
+                                   getattr(model, "n_features_in_", None))
+            install_reload_signal(watcher.request_reload)
+            watcher.start()
+        while True:
+            slot = work_queue.get()
+            if slot == STOP:
+                break
+            n = ring.counts[slot]
+            start = time.perf_counter()
+            if model is None:
+                ring.counts[slot] = 0
+            else:
+                try:
+                    ring.scores[slot, :n] = model.decision_function(ring.features[slot, :n])
+                except Exception as e:
+                    logging.error(f"Error during threat detection: {e}")
+                    ring.counts[slot] = 0
+            ring.stage_seconds[row, score_stage] += time.perf_counter() - start
+            done_queue.put(slot)
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        done_queue.put(STOP)
+        if ring is not None:
+            ring.close()
+
+def verdict_writer(ring_spec: tuple, log_file: str, log_safe: bool, stats_interval: float,
+                   done_queue, free_queue) -> None:
+    """Writer process: emit the verdicts of scored slots and recycle them."""
+    from ids import setup_logging, VerdictReporter
+
+    setup_logging(log_file)
+    reporter = VerdictReporter(log_safe, stats_interval)
+    ring = FeatureRing(*ring_spec)
+    report_stage = STAGES.index("report")
+    scored = COUNTERS.index("scored")
+    anomalies = COUNTERS.index("anomalies")
+    running = ring.workers
+    try:
+        while running:
+            slot = done_queue.get()
+            if slot == STOP:
+                running -= 1
+                continue
+            start = time.perf_counter()
+            n = ring.counts[slot]
+
+            def frame_at(i, slot=slot):
+                length = min(ring.lengths[slot, i], SNAP_LEN)
+                return RawFrame(ring.heads[slot, i, :length].tobytes(),
+                                int(ring.linktypes[slot, i]))
+
+            reporter.report_batch(ring.scores[slot, :n], frame_at)
+            ring.counters[scored] += n
+            ring.counters[anomalies] += int(np.sum(ring.scores[slot, :n] < 0))
+            ring.stage_seconds[WRITER_ROW, report_stage] += time.perf_counter() - start
+            free_queue.put(slot)
+    finally:
+        reporter.log_stats()
+        ring.close()
+
+class Pipeline:
+    """Capture-side front end of the multi-process detection pipeline.
+
+    The capturing process extracts features straight into a free ring slot;
+    full slots (or slots older than ``max_latency_ms``) are queued for the
+    scorer processes, and a single writer process prints and logs verdicts
+    before handing the slot back. When no slot is free, packets are dropped
+    and counted, unless ``block`` is set (used for pcap replay), in which case
+    capture waits for the scorers instead.
+
+    Exposes the same ``add``/``add_frame``/``start``/``stop`` interface as
+    ``ids.BatchDetector``. Capture-side latencies go into ``metrics``, along
+    with the ring counters, per-stage totals of every process and queue depths.
+    """
+
+    def __init__(self, model_file: str, log_file: str, workers: int, batch_size: int,
+                 max_latency_ms: float, compiled: bool = False, slots: int = DEFAULT_SLOTS,
+                 block: bool = False, log_safe: bool = False, stats_interval: float = 10.0,
+                 reload_interval: float = 2.0, metrics: Metrics = None):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.model_file = model_file
+        self.log_file = log_file
+        self.workers = workers
+        self.compiled = compiled
+        self.slots = slots
+        self.batch_size = batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self.block = block
+        self.log_safe = log_safe
+        self.stats_interval = stats_interval
+        self.reload_interval = reload_interval
+        self.ring = None
+        self.processes = []
+        self.slot = None
+        self.count = 0
+        self.oldest = 0.0
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.timer_thread = None
+        self.totals = None
+        self.metrics = metrics or Metrics(("capture", "extract"))
+        # Named like the in-process detector's counters, so readers need not care which ran.
+        for metric, name in (('pipeline_packets_total{state="captured"}', "captured"),
+                             ('dropped_packets_total{reason="ring_full"}', "dropped"),
+                             ("scored_total", "scored"), ("anomalies_total", "anomalies")):
+            self.metrics.register(metric, "counter", lambda name=name: self.counters[name])
+        for stage in STAGES:
+            self.metrics.register(f'pipeline_stage_seconds_total{{stage="{stage}"}}', "counter",
+                                  lambda stage=stage: self.stage_seconds[stage])
+        # Reading these fails until start() (and qsize is unsupported on macOS); render skips them.
+        self.metrics.register('queue_depth{queue="score"}', "gauge", lambda: self.work_queue.qsize())
+        self.metrics.register('queue_depth{queue="free_slots"}', "gauge",
+                              lambda: self.free_queue.qsize())
+
+    @property
+    def stage_seconds(self) -> dict:
+        """Time spent per stage, summed over all processes."""
+        if self.totals is not None:
+            return self.totals[0]
+        totals = self.ring.stage_seconds.sum(axis=0)
+        return dict(zip(STAGES, totals.tolist()))
+
+    @property
+    def counters(self) -> dict:
+        if self.totals is not None:
+            return self.totals[1]
+        return {name: self.ring.counter(name) for name in COUNTERS}
+
+    def add(self, packet) -> None:
+        """Extract and enqueue a scapy packet."""
+        self.metrics.observe("capture", time.time() - float(packet.time))
+        frame = packet_frame(packet)
+        if frame is not None:
+            self.add_frame(*frame)
+
+    def add_frame(self, data: bytes, linktype: int, timestamp: float = None) -> None:
+        """Extract features from a raw frame into the current ring slot."""
+        start = time.perf_counter()
+        row = extract_features_frame(data, linktype)
+        elapsed = time.perf_counter() - start
+        self.metrics.observe("extract", elapsed)
+        ring = self.ring
+        # Capture threads of several interfaces may add frames at once.
+        with self.lock:
+            ring.stage_seconds[CAPTURE_ROW, STAGES.index("extract")] += elapsed
+            if row is None:
+                return
+            if self.slot is None:
+                try:
+                    self.slot = self.free_queue.get(block=self.block)
+                except queue.Empty:
+                    ring.counters[COUNTERS.index("dropped")] += 1
+                    return
+                self.count = 0
+                self.oldest = time.monotonic()
+            slot, i = self.slot, self.count
+            ring.features[slot, i] = row
+            head = data[:SNAP_LEN]
+            ring.heads[slot, i, :len(head)] = np.frombuffer(head, dtype=np.uint8)
+            ring.lengths[slot, i] = len(data)
+            ring.linktypes[slot, i] = linktype
+            ring.counters[COUNTERS.index("captured")] += 1
+            self.count += 1
+            if self.count == self.batch_size:
+                self._submit_locked()
+
+    def _submit_locked(self) -> None:
+        if self.slot is not None:
+            self.ring.counts[self.slot] = self.count
+            self.work_queue.put(self.slot)
+            self.slot = None
+            self.count = 0
+
+    def flush(self) -> None:
+        """Queue the partially filled slot for scoring."""
+        with self.lock:
+            self._submit_locked()
+
+    def _latency_loop(self) -> None:
+        tick = min(self.max_latency, 0.01) or 0.001
+        while not self.stop_event.wait(tick):
+            with self.lock:
+                if self.count and time.monotonic() - self.oldest >= self.max_latency:
+                    self._submit_locked()
+
+    def reload_model(self) -> None:
+        """Ask every scorer process to reload the model file now."""
+        if not hasattr(signal, "SIGHUP"):
+            return
+        for process in self.processes[:self.workers]:
+            if process.pid is not None:
+                os.kill(process.pid, signal.SIGHUP)
+
+    def start(self) -> None:
+        """Create the ring, start the scorer and writer processes and the latency thread."""
+        # Spawned rather than forked: a forked child would inherit the parent's
+        # logging QueueHandler, whose queue no listener drains in the child.
+        context = mp.get_context("spawn")
+        self.ring = FeatureRing(self.slots, self.batch_size, self.workers)
+        self.free_queue = context.Queue()
+        self.work_queue = context.Queue()
+        self.done_queue = context.Queue()
+        for slot in range(self.slots):
+            self.free_queue.put(slot)
+        self.processes = [
+            context.Process(target=score_worker, daemon=True,
+                            args=(i, self.ring.spec, self.model_file, self.compiled,
+                                  self.reload_interval, self.log_file, self.work_queue,
+                                  self.done_queue))
+            for i in range(self.workers)
+        ]
+        self.processes.append(context.Process(
+            target=verdict_writer, daemon=True,
+            args=(self.ring.spec, self.log_file, self.log_safe, self.stats_interval,
+                  self.done_queue, self.free_queue),
+        ))
+        for process in self.processes:
+            process.start()
+        self.timer_thread = threading.Thread(target=self._latency_loop, daemon=True)
+        self.timer_thread.start()
+
+    def stop(self) -> None:
+        """Drain the pipeline, stop every process, release the ring and print the counters."""
+        self.stop_event.set()
+        if self.timer_thread is not None:
+            self.timer_thread.join()
+        self.flush()
+        for _ in range(self.ring.workers):
+            self.work_queue.put(STOP)
+        for process in self.processes:
+            process.join()
+        # Keep the final figures around once the shared ring is released.
+        self.totals = (self.stage_seconds, self.counters)
+        self.ring.close()
+        counters = self.counters
+        print(f"📊 Pipeline: {counters['captured']} captured, {counters['dropped']} dropped, "
+              f"{counters['scored']} scored, {counters['anomalies']} anomalies")
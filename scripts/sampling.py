@@ -0,0 +1,81 @@
+import struct
+import zlib
+from features import ipv4_header_offset, packet_frame, PROTO_TCP, PROTO_UDP
+
+class PacketSampler:
+    """Deterministic sampling applied before any feature extraction.
+
+    ``every_n`` keeps one packet in N, counted in arrival order.
+    ``flow_n`` keeps one flow in N: the 5-tuple is hashed with CRC32, so
+    every packet of a sampled flow is kept and the choice is the same on
+    every run and every sensor. Both stages count what they accept and drop,
+    which is what sampling rates should be sized against. Kernel-side BPF
+    filtering happens before this, so packets rejected by ``--bpf`` are
+    never seen here.
+    """
+
+    def __init__(self, every_n: int = 1, flow_n: int = 1):
+        if every_n < 1 or flow_n < 1:
+            raise ValueError("sampling rates must be at least 1")
+        self.every_n = every_n
+        self.flow_n = flow_n
+        self.seen = 0
+        self.dropped_every_n = 0
+        self.dropped_flow = 0
+        self.accepted = 0
+
+    @property
+    def active(self) -> bool:
+        return self.every_n > 1 or self.flow_n > 1
+
+    def accept_frame(self, data: bytes, linktype: int) -> bool:
+        """Return True if the frame should be processed."""
+        self.seen += 1
+        if self.every_n > 1 and (self.seen - 1) % self.every_n:
+            self.dropped_every_n += 1
+            return False
+        if self.flow_n > 1 and flow_hash(data, linktype) % self.flow_n:
+            self.dropped_flow += 1
+            return False
+        self.accepted += 1
+        return True
+
+    def accept_packet(self, packet) -> bool:
+        """Return True if the scapy packet should be processed."""
+        if not self.active:  # Only counted; no need to look at the frame.
+            self.seen += 1
+            self.accepted += 1
+            return True
+        frame = packet_frame(packet)
+        if frame is None:
+            return self.accept_frame(b"", 0)
+        return self.accept_frame(*frame)
+
+    def filter(self, callback):
+        """Wrap a sniff ``prn`` callback so only sampled packets reach it."""
+        if not self.active:
+            return callback
+
+        def sampled(packet):
+            if self.accept_packet(packet):
+                callback(packet)
+
+        return sampled
+
+    def describe(self) -> str:
+        return (f"Sampling: {self.seen} packets passed the capture filter, {self.accepted} accepted, "
+                f"{self.dropped_every_n} dropped by 1-in-{self.every_n}, "
+                f"{self.dropped_flow} dropped by 1-in-{self.flow_n} flow sampling")
+
+def flow_hash(data: bytes, linktype: int) -> int:
+    """CRC32 of a frame's IPv4 5-tuple (0 for non-IPv4 frames, so they are kept)."""
+    offset = ipv4_header_offset(data, linktype)
+    if offset is None or len(data) < offset + 20:
+        return 0
+    key = data[offset + 12:offset + 20] + data[offset + 9:offset + 10]
+    protocol = data[offset + 9]
+    fragment = struct.unpack_from("!H", data, offset + 6)[0] & 0x1FFF
+    l4 = offset + (data[offset] & 0x0F) * 4
+    if protocol in (PROTO_TCP, PROTO_UDP) and fragment == 0:
+        key += data[l4:l4 + 4]
+    return zlib.crc32(key)
@@ -0,0 +1,173 @@
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+import numpy as np
+from capture_writer import open_sink, COLUMN_DTYPES
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_SHARD_SECONDS = 3600.0
+DEFAULT_SHARD_BYTES = 64 * 2 ** 20
+# Suffixes accepted by parse_time for times relative to now, e.g. "6h".
+TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def manifest_path(path: str) -> str:
+    return os.path.join(path, MANIFEST_FILE)
+
+def is_sharded(path: str) -> bool:
+    """True if ``path`` is a capture directory written by ``ShardedSink``."""
+    return os.path.isfile(manifest_path(path))
+
+def load_manifest(path: str) -> dict:
+    with open(manifest_path(path)) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported shard manifest version {manifest.get('version')} in {path}")
+    return manifest
+
+def save_manifest(path: str, manifest: dict) -> None:
+    """Replace the manifest atomically, so readers never see a partial index."""
+    tmp_file = manifest_path(path) + ".tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_file, manifest_path(path))
+
+def shard_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
+
+def parse_time(value: str) -> float:
+    """Parse an ISO 8601 time or a time relative to now ("90s", "30m", "6h", "2d")."""
+    unit = TIME_UNITS.get(value[-1:].lower())
+    if unit is not None:
+        try:
+            return time.time() - float(value[:-1]) * unit
+        except ValueError:
+            pass
+    return datetime.fromisoformat(value).timestamp()
+
+def select_shards(path: str, since: float = None, until: float = None, last: int = None,
+                  ranges: dict = None) -> list:
+    """Return the paths of the shards of a capture directory matching a selection.
+
+    Only the manifest is read: shards whose time range misses ``[since, until]``,
+    or whose column min/max misses a ``ranges`` entry (``{column: (low, high)}``),
+    are skipped without being opened. ``last`` keeps only the newest N shards
+    of what remains. Shards are returned oldest first.
+    """
+    shards = load_manifest(path)["shards"]
+    if since is not None:
+        shards = [shard for shard in shards if shard["end"] >= since]
+    if until is not None:
+        shards = [shard for shard in shards if shard["start"] <= until]
+    for column, (low, high) in (ranges or {}).items():
+        shards = [shard for shard in shards
+                  if shard["max"][column] >= low and shard["min"][column] <= high]
+    if last is not None:
+        shards = shards[-last:] if last > 0 else []
+    return [os.path.join(path, shard["name"]) for shard in shards]
+
+class ShardedSink:
+    """Writes a capture as a directory of rotating shards indexed by a manifest.
+
+    Each shard is a CSV file or an npy column directory, as with the other
+    sinks. A new shard starts once the current one covers ``shard_seconds`` or
+    reaches ``shard_bytes``. The manifest records every shard's time range
+    (wall-clock time of its first and last block), row count, size and
+    per-column min/max, and is rewritten after every block, so training can
+    pick shards without opening them. After each rotation, the oldest shards
+    are deleted while they are older than ``retain_seconds`` or the capture
+    exceeds ``retain_bytes`` (0 keeps everything).
+    """
+
+    def __init__(self, path: str, fmt: str = "csv", column_dtypes=COLUMN_DTYPES,
+                 shard_seconds: float = DEFAULT_SHARD_SECONDS,
+                 shard_bytes: int = DEFAULT_SHARD_BYTES,
+                 retain_seconds: float = 0.0, retain_bytes: int = 0):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.fmt = fmt
+        self.column_dtypes = column_dtypes
+        self.shard_seconds = shard_seconds
+        self.shard_bytes = shard_bytes
+        self.retain_seconds = retain_seconds
+        self.retain_bytes = retain_bytes
+        if is_sharded(path):
+            self.manifest = load_manifest(path)
+            if self.manifest["format"] != fmt or self.manifest["columns"] != list(column_dtypes):
+                raise ValueError(f"{path} holds a different capture format or column set.")
+        else:
+            self.manifest = {"version": MANIFEST_VERSION, "format": fmt,
+                             "columns": list(column_dtypes), "next_shard": 0, "shards": []}
+        self.sink = None
+        self.shard = None
+
+    def _open_shard(self, now: float) -> None:
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now))
+        name = f"shard-{stamp}-{self.manifest['next_shard']:06d}"
+        if self.fmt == "csv":
+            name += ".csv"
+        self.manifest["next_shard"] += 1
+        self.sink = open_sink(os.path.join(self.path, name), self.fmt, self.column_dtypes)
+        self.shard = {"name": name, "start": now, "end": now, "rows": 0, "bytes": 0,
+                      "min": {}, "max": {}}
+        self.manifest["shards"].append(self.shard)
+
+    def _close_shard(self) -> None:
+        if self.sink is not None:
+            self.sink.close()
+            self.shard["bytes"] = shard_size(os.path.join(self.path, self.shard["name"]))
+            self.sink = self.shard = None
+
+    def write(self, block: np.ndarray) -> None:
+        now = time.time()
+        if self.shard is not None and (now - self.shard["start"] >= self.shard_seconds
+                                       or self.shard["bytes"] >= self.shard_bytes):
+            self._close_shard()
+            self.apply_retention(now)
+        if self.shard is None:
+            self._open_shard(now)
+        self.sink.write(block)
+        shard = self.shard
+        shard["end"] = now
+        shard["rows"] += len(block)
+        shard["bytes"] = shard_size(os.path.join(self.path, shard["name"]))
+        lows, highs = block.min(axis=0).tolist(), block.max(axis=0).tolist()
+        for column, low, high in zip(self.column_dtypes, lows, highs):
+            shard["min"][column] = min(low, shard["min"].get(column, low))
+            shard["max"][column] = max(high, shard["max"].get(column, high))
+        save_manifest(self.path, self.manifest)
+
+    def apply_retention(self, now: float = None) -> list:
+        """Delete the oldest shards beyond the retention limits; return their names.
+
+        The newest shard, open or not, is always kept.
+        """
+        now = time.time() if now is None else now
+        shards = self.manifest["shards"]
+        total = sum(shard["bytes"] for shard in shards)
+        deleted = []
+        for shard in shards[:-1]:
+            expired = self.retain_seconds and shard["end"] < now - self.retain_seconds
+            over_size = self.retain_bytes and total > self.retain_bytes
+            if not (expired or over_size):
+                break
+            shard_path = os.path.join(self.path, shard["name"])
+            if os.path.isdir(shard_path):
+                shutil.rmtree(shard_path)
+            elif os.path.exists(shard_path):
+                os.remove(shard_path)
+            total -= shard["bytes"]
+            deleted.append(shard["name"])
+        if deleted:
+            self.manifest["shards"] = [shard for shard in shards if shard["name"] not in deleted]
+            save_manifest(self.path, self.manifest)
+        return deleted
+
+    def close(self) -> None:
+        self._close_shard()
+        self.apply_retention()
+        save_manifest(self.path, self.manifest)
@@ -1,25 +1,70 @@
 import os
+import json
+import time
+import atexit
+import itertools
+import tempfile
 import logging
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 import joblib
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 from tqdm import tqdm
+from capture_writer import load_columns, check_capture_columns, NpyColumn, COLUMN_DTYPES
+from shards import is_sharded, select_shards, parse_time
+from flows import FLOW_COLUMN_DTYPES
+from forest import CompiledForest
+from encoding import (FeatureEncoding, save_encoding, DEFAULT_INTERNAL_NETWORKS,
+                      DEFAULT_PREFIX_LEN)
+from ipc import IpcChannel
+
+DEFAULT_CHUNK_TREES = 25
+DEFAULT_CHUNK_ROWS = 1_000_000
+DEFAULT_SAMPLE_ROWS = 1_000_000
+MIN_RECORDS = 10
+DATA_FILE = "packets/captured_packets.csv"
+FLOW_DATA_FILE = "packets/captured_flows.csv"
+# IsolationForest fits on float32, so a float32 row-major matrix is used as is.
+MATRIX_DTYPE = np.dtype("<f4")
+MATRIX_FILE = "training_matrix.npy"
+SWEEP_OBJECTIVES = ("fastest", "smallest", "fastest-train", "closest")
+DEFAULT_HOLDOUT = 0.2
+DEFAULT_TARGET_RATE = 0.05
+DEFAULT_RATE_TOLERANCE = 0.01
+# Scoring latency is timed on batches of this many held-out rows.
+LATENCY_ROWS = 1000
+LATENCY_BATCHES = 20
+# The held-out anomaly rate is also computed per slice, to show how much it drifts.
+RATE_SLICES = 10
 
 def configure_logging(log_level=logging.INFO):
     """Configure logging for the application."""
     logging.basicConfig(level=log_level, 
                         format="%(asctime)s - %(levelname)s - %(message)s")
 
-def load_data(data_file: str) -> np.ndarray:
-    """Load and validate data from the CSV file.
+def load_data(data_file: str, column_dtypes: dict = COLUMN_DTYPES,
+              shards: list = None, mmap: bool = False,
+              encoding: FeatureEncoding = None) -> np.ndarray:
+    """Load and validate data from a CSV file, an npy capture directory or a shard directory.
+    
+    With ``mmap``, the data is returned as a read-only memory map of the
+    capture's cached training matrix (see ``load_matrix``) instead of being
+    read into memory.
     
     Args:
-        data_file (str): Path to the CSV file containing the data.
+        data_file (str): Path to the CSV file, capture directory or shard directory.
+        column_dtypes (dict): Capture columns and their types (``FLOW_COLUMN_DTYPES`` for flows).
+        shards (list): Shards of a shard directory to load (default: all of them).
+        mmap (bool): Memory-map a float32 matrix instead of loading a copy.
+        encoding (FeatureEncoding): Encode the raw records into float32 model features.
+            The memory-mapped matrix is always encoded, with the default encoding
+            if none is given.
     
     Returns:
-        np.ndarray: Data in NumPy array format.
+        np.ndarray: Data in NumPy array format (an ``np.memmap`` with ``mmap``).
     
     Raises:
         FileNotFoundError: If the data file does not exist.
@@ -30,109 +75,722 @@ def load_data(data_file: str) -> np.ndarray:
         raise FileNotFoundError(f"Data file '{data_file}' not found!")
     
     try:
-        df = pd.read_csv(data_file)
+        if mmap:
+            data = load_matrix(data_file, column_dtypes, shards, encoding=encoding)
+        elif is_sharded(data_file):
+            parts = [load_data_file(shard, column_dtypes)
+                     for shard in (select_shards(data_file) if shards is None else shards)]
+            data = (np.concatenate(parts) if parts
+                    else np.empty((0, len(column_dtypes)), dtype=np.int64))
+        else:
+            data = load_data_file(data_file, column_dtypes)
+        if encoding is not None and not mmap:
+            data = encoding.transform(data, MATRIX_DTYPE)
     except Exception as e:
         logging.error(f"Error reading data file '{data_file}': {e}")
         raise
 
-    if df.shape[0] < 10:
+    if data.shape[0] < MIN_RECORDS:
+        logging.error("Not enough data to train the model. Minimum 10 records required.")
+        raise ValueError("Not enough data to train the model. Minimum 10 records required.")
+    
+    logging.info(f"Loaded data from {data_file} with shape {data.shape}")
+    return data
+
+def load_data_file(data_file: str, column_dtypes: dict = COLUMN_DTYPES) -> np.ndarray:
+    """Read a single CSV file or npy capture directory (only its columns are checked)."""
+    check_capture_columns(data_file, list(column_dtypes))
+    if os.path.isdir(data_file):
+        return load_columns(data_file, headers=list(column_dtypes))
+    return pd.read_csv(data_file, dtype=column_dtypes).to_numpy()
+
+def matrix_path(data_file: str) -> str:
+    """Where the training matrix of a capture is cached: inside a directory, next to a file."""
+    if os.path.isdir(data_file):
+        return os.path.join(data_file, MATRIX_FILE)
+    return os.path.splitext(data_file)[0] + "." + MATRIX_FILE
+
+def source_signature(data_file: str, column_dtypes: dict = COLUMN_DTYPES,
+                     shards: list = None, encoding: FeatureEncoding = None) -> dict:
+    """Columns, encoding, and size and mtime of every file a capture (or shard selection) is read from."""
+    if is_sharded(data_file):
+        sources = select_shards(data_file) if shards is None else shards
+    else:
+        sources = [data_file]
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            files.extend(os.path.join(source, f"{name}.npy") for name in column_dtypes)
+        else:
+            files.append(source)
+    stats = [os.stat(path) for path in files]
+    return {"columns": list(column_dtypes),
+            "encoding": encoding.to_dict() if encoding is not None else None,
+            "files": [[os.path.abspath(path), st.st_size, st.st_mtime_ns]
+                      for path, st in zip(files, stats)]}
+
+def load_matrix(data_file: str, column_dtypes: dict = COLUMN_DTYPES, shards: list = None,
+                chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                encoding: FeatureEncoding = None) -> np.memmap:
+    """Memory-map a capture as an (N, features) float32 matrix, building it if needed.
+    
+    The matrix is written once, chunk by chunk, to a row-major .npy file next to
+    the capture and rebuilt only when the capture (or shard selection) or the
+    encoding changes. Records are always encoded, as float32 cannot hold raw
+    IPv4 addresses exactly.
+    The read-only map is what IsolationForest fits on: it is already float32 and
+    C-contiguous, so sklearn uses it without a copy, every worker reads the same
+    pages from the page cache, and the rows only count once towards memory use.
+    
+    Args:
+        data_file (str): Path to the CSV file, capture directory or shard directory.
+        column_dtypes (dict): Capture columns and their types (``FLOW_COLUMN_DTYPES`` for flows).
+        shards (list): Shards of a shard directory to include (default: all of them).
+        chunk_rows (int): Rows converted at a time while building the matrix.
+        encoding (FeatureEncoding): How records are encoded (default: the default
+            ``FeatureEncoding`` of the capture's columns).
+    
+    Returns:
+        np.memmap: The read-only training matrix.
+    """
+    if encoding is None:
+        encoding = FeatureEncoding(list(column_dtypes))
+    if not is_sharded(data_file):
+        check_capture_columns(data_file, list(column_dtypes))
+    path = matrix_path(data_file)
+    signature = source_signature(data_file, column_dtypes, shards, encoding)
+    try:
+        with open(path + ".json") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = None
+    if cached != signature or not os.path.exists(path):
+        logging.info(f"Building training matrix {path}...")
+        tmp_file = path + ".tmp"
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        matrix = NpyColumn(tmp_file, MATRIX_DTYPE, width=len(encoding.output_columns))
+        try:
+            for chunk in iter_chunks(data_file, chunk_rows, column_dtypes, shards):
+                matrix.append(encoding.transform(chunk, MATRIX_DTYPE))
+        finally:
+            matrix.close()
+        os.replace(tmp_file, path)
+        with open(path + ".json", "w") as f:
+            json.dump(signature, f)
+    return np.load(path, mmap_mode="r")
+
+def iter_chunks(data_file: str, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                column_dtypes: dict = COLUMN_DTYPES, shards: list = None):
+    """Stream a capture in chunks of at most ``chunk_rows`` rows.
+    
+    CSV files are parsed chunk by chunk with the compact capture dtypes, and
+    binary (npy) capture directories are memory-mapped and sliced, so only one
+    chunk is ever held in memory. Shard directories are streamed shard by
+    shard, reading only the selected ``shards``.
+    
+    Args:
+        data_file (str): Path to the CSV file, capture directory or shard directory.
+        chunk_rows (int): Maximum rows per chunk.
+        column_dtypes (dict): Capture columns and their types (``FLOW_COLUMN_DTYPES`` for flows).
+        shards (list): Shards of a shard directory to read (default: all of them).
+    
+    Yields:
+        np.ndarray: An (n, columns) array of raw records per chunk (int64 for packet captures).
+    
+    Raises:
+        FileNotFoundError: If the data file does not exist.
+    """
+    if not os.path.exists(data_file):
+        logging.error(f"Data file '{data_file}' not found! Run packet_capture.py first.")
+        raise FileNotFoundError(f"Data file '{data_file}' not found!")
+    
+    if is_sharded(data_file):
+        for shard in select_shards(data_file) if shards is None else shards:
+            yield from iter_chunks(shard, chunk_rows, column_dtypes)
+        return
+
+    check_capture_columns(data_file, list(column_dtypes))
+    dtype = np.result_type(np.int32, *column_dtypes.values())
+    if os.path.isdir(data_file):
+        columns = [np.load(os.path.join(data_file, f"{name}.npy"), mmap_mode="r")
+                   for name in column_dtypes]
+        for start in range(0, len(columns[0]), chunk_rows):
+            yield np.column_stack([c[start:start + chunk_rows] for c in columns]).astype(dtype)
+    else:
+        with pd.read_csv(data_file, dtype=column_dtypes, chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                yield chunk.to_numpy(dtype=dtype)
+
+def reservoir_sample(chunks, sample_rows: int, seed: int = 42) -> tuple:
+    """Draw a uniform random sample of rows from a stream of chunks.
+    
+    Vectorized reservoir sampling (Algorithm R): row ``i`` of the stream
+    replaces a random reservoir slot with probability ``sample_rows / (i + 1)``,
+    so memory stays at ``sample_rows`` rows however long the stream is.
+    
+    Args:
+        chunks (iterable): Arrays of shape (n, 6).
+        sample_rows (int): Reservoir size.
+        seed (int): Random seed.
+    
+    Returns:
+        tuple: The sampled rows and the total number of rows seen.
+    """
+    rng = np.random.default_rng(seed)
+    reservoir = None
+    filled = 0
+    seen = 0
+    for chunk in chunks:
+        if reservoir is None:
+            reservoir = np.empty((sample_rows, chunk.shape[1]), dtype=chunk.dtype)
+        take = min(sample_rows - filled, len(chunk))
+        reservoir[filled:filled + take] = chunk[:take]
+        filled += take
+        rest = chunk[take:]
+        if len(rest):
+            positions = np.arange(seen + take, seen + len(chunk)) + 1
+            slots = (rng.random(len(rest)) * positions).astype(np.int64)
+            keep = slots < sample_rows
+            reservoir[slots[keep]] = rest[keep]
+        seen += len(chunk)
+    if reservoir is None:
+        return np.empty((0, 0), dtype=np.int32), 0
+    return reservoir[:filled], seen
+
+def load_sample(data_file: str, sample_rows: int = DEFAULT_SAMPLE_ROWS,
+                chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                column_dtypes: dict = COLUMN_DTYPES, shards: list = None,
+                encoding: FeatureEncoding = None) -> np.ndarray:
+    """Load a bounded uniform sample of a capture for training.
+    
+    IsolationForest only draws ``max_samples`` rows per tree, so a large
+    uniform sample trains an equivalent model while peak memory stays around
+    ``sample_rows + chunk_rows`` rows regardless of the capture size.
+    
+    Args:
+        data_file (str): Path to the CSV file, capture directory or shard directory.
+        sample_rows (int): Maximum rows kept for training.
+        chunk_rows (int): Rows read per chunk.
+        column_dtypes (dict): Capture columns and their types (``FLOW_COLUMN_DTYPES`` for flows).
+        shards (list): Shards of a shard directory to sample (default: all of them).
+        encoding (FeatureEncoding): Encode the sample into float32 model features.
+    
+    Returns:
+        np.ndarray: The sampled training data.
+    
+    Raises:
+        FileNotFoundError: If the data file does not exist.
+        ValueError: If there is insufficient data.
+    """
+    sample, seen = reservoir_sample(iter_chunks(data_file, chunk_rows, column_dtypes, shards),
+                                    sample_rows)
+
+    if seen < MIN_RECORDS:
         logging.error("Not enough data to train the model. Minimum 10 records required.")
         raise ValueError("Not enough data to train the model. Minimum 10 records required.")
     
-    logging.info(f"Loaded data from {data_file} with shape {df.shape}")
-    return df.to_numpy()
+    logging.info(f"Sampled {len(sample)} of {seen} rows from {data_file}")
+    if encoding is not None:
+        sample = encoding.transform(sample, MATRIX_DTYPE)
+    return sample
 
 def train_isolation_forest(X_train: np.ndarray, total_estimators: int = 100, 
-                           contamination: float = 0.05, n_jobs: int = -1) -> IsolationForest:
-    """Train the IsolationForest model iteratively using a progress bar.
+                           contamination: float = 0.05, n_jobs: int = -1,
+                           chunk_trees: int = DEFAULT_CHUNK_TREES,
+                           progress=None, max_samples="auto",
+                           max_features: float = 1.0) -> IsolationForest:
+    """Train the IsolationForest model in chunks of trees, reporting progress.
+    
+    Each ``fit`` call grows the forest by ``chunk_trees`` trees in one parallel
+    pass (warm start keeps the trees already built), so the data is validated
+    and dispatched to the workers once per chunk rather than once per tree.
     
     Args:
         X_train (np.ndarray): Training data.
         total_estimators (int): Total number of trees in the IsolationForest.
         contamination (float): Expected proportion of outliers.
         n_jobs (int): Number of parallel jobs (use -1 to utilize all processors).
+        chunk_trees (int): Trees added per fit call (0 builds all trees at once).
+        progress (callable, optional): Called as ``progress(trees_built, total_estimators)``
+            after each chunk. Defaults to a tqdm progress bar.
+        max_samples (int, float or "auto"): Rows drawn to build each tree.
+        max_features (float): Share (or number) of features drawn for each tree.
     
     Returns:
         IsolationForest: Trained model.
     """
+    if chunk_trees <= 0:
+        chunk_trees = total_estimators
     model = IsolationForest(
         n_estimators=0,  # Initialize with no trees.
         contamination=contamination,
+        max_samples=max_samples,
+        max_features=max_features,
         random_state=42,
         warm_start=True,  # Allow iterative addition of trees.
         n_jobs=n_jobs
     )
     
     logging.info("Starting model training...")
-    for _ in tqdm(range(total_estimators), desc="Training Isolation Forest", unit="tree"):
-        model.n_estimators += 1
+    bar = None
+    if progress is None:
+        bar = tqdm(total=total_estimators, desc="Training Isolation Forest", unit="tree")
+        progress = lambda built, total: bar.update(built - bar.n)
+    while model.n_estimators < total_estimators:
+        model.n_estimators = min(model.n_estimators + chunk_trees, total_estimators)
         model.fit(X_train)
+        progress(model.n_estimators, total_estimators)
+    if bar is not None:
+        bar.close()
     logging.info("Model training completed.")
     
     return model
 
-def save_model(model: IsolationForest, model_file: str):
+def save_model(model: IsolationForest, model_file: str, encoding: FeatureEncoding = None):
     """Save the trained model to disk.
+
+    The model is written to a temporary file next to ``model_file`` and then
+    renamed over it, so a running ``ids.py`` watching the file never loads a
+    half-written model. A ``CompiledForest`` is written as its .npz artifact,
+    anything else with joblib. The ``encoding`` spec is written next to it
+    first, so the model is never picked up without it.
     
     Args:
-        model (IsolationForest): Trained IsolationForest model.
+        model (IsolationForest or CompiledForest): Trained model.
         model_file (str): Path to save the model.
+        encoding (FeatureEncoding): Encoding of the features the model was trained on.
     
     Raises:
         Exception: If model saving fails.
     """
+    if encoding is not None:
+        save_encoding(encoding, model_file)
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(model_file) or ".",
+                                    prefix=".model-", suffix=".tmp")
     try:
-        joblib.dump(model, model_file)
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(model, CompiledForest):
+                model.save(f)
+            else:
+                joblib.dump(model, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as 0600; give it the mode a plain open() would,
+        # so a detector running as another user can still read the model.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_file, 0o666 & ~umask)
+        os.replace(tmp_file, model_file)
         logging.info(f"Model successfully saved as {model_file}")
     except Exception as e:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
         logging.error(f"Error saving model to '{model_file}': {e}")
         raise
 
-def evaluate_model(model: IsolationForest, X_train: np.ndarray):
-    """Evaluate the trained model on the training data and log a summary.
+def npz_path(model_file: str) -> str:
+    """Path of the compiled artifact written next to ``model_file``."""
+    return os.path.splitext(model_file)[0] + ".npz"
+
+def evaluate_model(model: IsolationForest, data):
+    """Evaluate the trained model chunk by chunk and log a summary.
     
     Args:
         model (IsolationForest): Trained model.
-        X_train (np.ndarray): Training data.
+        data (np.ndarray or iterable): Training data, or an iterable of chunks
+            such as ``iter_chunks(data_file)`` to score a capture of any size.
     """
-    predictions = model.predict(X_train)
-    # In IsolationForest, 1 indicates inliers and -1 indicates outliers.
-    inliers = np.sum(predictions == 1)
-    outliers = np.sum(predictions == -1)
+    if isinstance(data, np.ndarray):
+        data = [data]
+    inliers = outliers = 0
+    for chunk in data:
+        # decision_function < 0 is exactly where predict() returns -1 (outlier).
+        chunk_outliers = int(np.sum(model.decision_function(chunk) < 0))
+        outliers += chunk_outliers
+        inliers += len(chunk) - chunk_outliers
     logging.info(f"Training Data Evaluation: {inliers} inliers, {outliers} outliers detected.")
 
+def parse_max_samples(value: str):
+    """Parse a max_samples value: "auto", a row count ("256") or a share of the rows ("0.5")."""
+    if value == "auto":
+        return value
+    number = float(value)
+    return int(number) if number.is_integer() and number > 1 else number
+
+class SharedMatrix:
+    """A float32 training matrix that sweep worker processes read without copying.
+    
+    A matrix memory-mapped by ``load_matrix`` is shared by path: every worker
+    maps the same file, so its pages are held once in the page cache. Anything
+    else is copied once into a ``multiprocessing.shared_memory`` block that the
+    workers attach to. Either way, workers see a float32 C-contiguous array,
+    which IsolationForest fits on as is.
+    """
+
+    def __init__(self, X: np.ndarray = None, spec: tuple = None):
+        self.owner = spec is None
+        self.shm = None
+        if self.owner:
+            if isinstance(X, np.memmap) and X.dtype == MATRIX_DTYPE and X.flags.c_contiguous:
+                spec = ("file", X.filename)
+            else:
+                self.shm = shared_memory.SharedMemory(
+                    create=True, size=max(X.size * MATRIX_DTYPE.itemsize, 1))
+                spec = ("shm", self.shm.name, X.shape)
+        self.spec = spec
+        if spec[0] == "file":
+            self.array = np.load(spec[1], mmap_mode="r")
+            return
+        if self.shm is None:
+            # Only the creating process may unlink the block, so attachments are untracked.
+            self.shm = shared_memory.SharedMemory(name=spec[1], track=False)
+        self.array = np.ndarray(spec[2], dtype=MATRIX_DTYPE, buffer=self.shm.buf)
+        if self.owner:
+            self.array[:] = X
+        self.array.flags.writeable = False
+
+    def close(self) -> None:
+        self.array = None  # Drop the view before releasing the buffer it points into.
+        if self.shm is not None:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+            self.shm = None
+
+_sweep_matrix = None
+
+def attach_sweep_matrix(spec: tuple) -> None:
+    """Sweep worker initializer: attach to the shared training matrix once."""
+    global _sweep_matrix
+    logging.getLogger().setLevel(logging.WARNING)  # The parent logs a summary of every trial.
+    _sweep_matrix = SharedMatrix(spec=spec)
+    atexit.register(_sweep_matrix.close)
+
+def sweep_grid(estimators: list, max_samples: list, max_features: list,
+               contamination: list) -> list:
+    """Every combination of the swept IsolationForest parameters, as dicts."""
+    return [{"n_estimators": n, "max_samples": samples, "max_features": features,
+             "contamination": rate}
+            for n, samples, features, rate in itertools.product(
+                estimators, max_samples, max_features, contamination)]
+
+def run_trial(index: int, config: dict, train_rows: int, sweep_dir: str,
+              compiled: bool = False, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> dict:
+    """Train one sweep configuration and measure it (runs in a sweep worker).
+    
+    The forest is trained on the first ``train_rows`` rows of the shared
+    matrix and measured on the rows after them (on the training rows when
+    nothing is held out). With ``compiled``, size and latency are those of the
+    ``CompiledForest`` that ids.py would load from the .npz artifact.
+    
+    Args:
+        index (int): Trial number, used to name the saved model.
+        config (dict): IsolationForest parameters from ``sweep_grid``.
+        train_rows (int): Rows of the shared matrix used for training.
+        sweep_dir (str): Directory the trial's model is saved to.
+        compiled (bool): Measure the compiled model instead of the sklearn one.
+        chunk_rows (int): Rows scored at a time on the held-out rows.
+    
+    Returns:
+        dict: The configuration, training time, model size, scoring latency and
+        anomaly-rate statistics, plus the saved model's path.
+    """
+    X = _sweep_matrix.array
+    X_train = X[:train_rows]
+    X_eval = X[train_rows:] if train_rows < len(X) else X_train
+    start = time.perf_counter()
+    # The sweep already runs one trial per CPU, so each forest is built on one.
+    model = train_isolation_forest(X_train, config["n_estimators"], config["contamination"],
+                                   n_jobs=1, chunk_trees=0, progress=lambda built, total: None,
+                                   max_samples=config["max_samples"],
+                                   max_features=config["max_features"])
+    train_seconds = time.perf_counter() - start
+    model_file = os.path.join(sweep_dir, f"trial-{index:03d}.joblib")
+    joblib.dump(model, model_file)
+    scorer, artifact = model, model_file
+    if compiled:
+        scorer, artifact = CompiledForest.from_sklearn(model), npz_path(model_file)
+        with open(artifact, "wb") as f:
+            scorer.save(f)
+
+    latencies = []
+    for batch_start in range(0, min(len(X_eval), LATENCY_ROWS * LATENCY_BATCHES), LATENCY_ROWS):
+        batch = X_eval[batch_start:batch_start + LATENCY_ROWS]
+        start = time.perf_counter()
+        scorer.decision_function(batch)
+        latencies.append((time.perf_counter() - start) * LATENCY_ROWS / len(batch))
+    anomalous = np.concatenate([scorer.decision_function(X_eval[i:i + chunk_rows]) < 0
+                                for i in range(0, len(X_eval), chunk_rows)])
+    slice_rates = [part.mean() for part in np.array_split(anomalous, min(RATE_SLICES, len(anomalous)))]
+    return dict(config, trial=index, train_s=train_seconds,
+                model_bytes=os.path.getsize(artifact),
+                score_ms_per_1k=float(np.median(latencies)) * 1e3,
+                anomaly_rate=float(anomalous.mean()),
+                anomaly_rate_min=float(min(slice_rates)),
+                anomaly_rate_max=float(max(slice_rates)),
+                model_file=model_file)
+
+def run_sweep(X: np.ndarray, grid: list, sweep_dir: str, workers: int = None,
+              holdout: float = DEFAULT_HOLDOUT, compiled: bool = False,
+              chunk_rows: int = DEFAULT_CHUNK_ROWS, progress=None) -> list:
+    """Train every configuration of ``grid`` in a process pool sharing one copy of ``X``.
+    
+    The data is loaded once by the caller and shared with the workers through
+    ``SharedMatrix``. The last ``holdout`` share of the rows (the newest rows
+    of a mapped capture) is kept out of training to measure anomaly rates on.
+    
+    Args:
+        X (np.ndarray): Training data, e.g. from ``load_sample`` or ``load_data(mmap=True)``.
+        grid (list): Configurations from ``sweep_grid``.
+        sweep_dir (str): Directory the trial models are saved to.
+        workers (int): Worker processes (default: one per CPU, at most one per trial).
+        holdout (float): Share of the rows held out for measurement (0 measures on the
+            training rows).
+        compiled (bool): Measure the compiled models ids.py would load from .npz files.
+        chunk_rows (int): Rows scored at a time on the held-out rows.
+        progress (callable, optional): Called as ``progress(trials_done, len(grid))``.
+            Defaults to a tqdm progress bar.
+    
+    Returns:
+        list: The ``run_trial`` results of the trials that succeeded, in grid order.
+    """
+    train_rows = len(X) - int(len(X) * holdout)
+    if train_rows < MIN_RECORDS:
+        raise ValueError("Not enough data left for training after the holdout.")
+    workers = min(workers or os.cpu_count() or 1, len(grid))
+    logging.info(f"Sweeping {len(grid)} configurations on {train_rows} rows "
+                 f"({len(X) - train_rows} held out) with {workers} worker(s)...")
+    bar = None
+    if progress is None:
+        bar = tqdm(total=len(grid), desc="Sweeping Isolation Forests", unit="model")
+        progress = lambda done, total: bar.update(done - bar.n)
+    shared = SharedMatrix(X)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_sweep_matrix,
+                                 initargs=(shared.spec,)) as pool:
+            futures = {pool.submit(run_trial, index, config, train_rows, sweep_dir,
+                                   compiled, chunk_rows): config
+                       for index, config in enumerate(grid)}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logging.error(f"Sweep configuration {futures[future]} failed: {e}")
+                progress(done, len(grid))
+    finally:
+        shared.close()
+        if bar is not None:
+            bar.close()
+    return sorted(results, key=lambda result: result["trial"])
+
+def select_trial(results: list, objective: str = "fastest",
+                 target_rate: float = DEFAULT_TARGET_RATE,
+                 tolerance: float = DEFAULT_RATE_TOLERANCE) -> dict:
+    """Pick the best sweep result under an objective.
+    
+    "fastest", "smallest" and "fastest-train" pick the lowest scoring latency,
+    model size or training time among the trials whose held-out anomaly rate
+    is within ``tolerance`` of ``target_rate``; "closest" picks the anomaly
+    rate nearest the target. If no trial is within tolerance, the closest one
+    is returned.
+    
+    Args:
+        results (list): Results from ``run_sweep``.
+        objective (str): One of ``SWEEP_OBJECTIVES``.
+        target_rate (float): Anomaly rate the deployed model should flag.
+        tolerance (float): Accepted distance from ``target_rate``.
+    
+    Returns:
+        dict: The selected result.
+    """
+    distance = lambda result: abs(result["anomaly_rate"] - target_rate)
+    closest = min(results, key=lambda result: (distance(result), result["score_ms_per_1k"]))
+    if objective == "closest":
+        return closest
+    within = [result for result in results if distance(result) <= tolerance]
+    if not within:
+        logging.warning(f"No configuration flags {target_rate:.1%} ± {tolerance:.1%} of the "
+                        f"held-out rows; using the closest one.")
+        return closest
+    key = {"fastest": "score_ms_per_1k", "smallest": "model_bytes", "fastest-train": "train_s"}[objective]
+    return min(within, key=lambda result: (result[key], distance(result)))
+
+def sweep_report_path(model_file: str) -> str:
+    """Path of the sweep results CSV written next to ``model_file``."""
+    return os.path.splitext(model_file)[0] + ".sweep.csv"
+
+def sweep(args, X: np.ndarray, encoding: FeatureEncoding, channel=None):
+    """Run the --sweep mode: train the grid, save the best model and a CSV report."""
+    grid = sweep_grid(args.sweep_estimators or [args.total_estimators],
+                      args.sweep_max_samples or [args.max_samples],
+                      args.sweep_max_features or [args.max_features],
+                      args.sweep_contamination or [args.contamination])
+    progress = None
+    if channel:
+        progress = lambda done, total: channel.progress(done, total, "Sweep")
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(args.model_file) or ".",
+                                     prefix=".sweep-") as sweep_dir:
+        results = run_sweep(X, grid, sweep_dir, args.sweep_workers, args.holdout, args.npz,
+                            args.chunk_rows, progress)
+        if not results:
+            logging.error("Every sweep configuration failed; no model saved.")
+            return
+        best = select_trial(results, args.objective, args.target_rate, args.rate_tolerance)
+        for result in results:
+            logging.info(f"{'*' if result is best else ' '} trees={result['n_estimators']} "
+                         f"max_samples={result['max_samples']} "
+                         f"max_features={result['max_features']} "
+                         f"contamination={result['contamination']}: "
+                         f"train {result['train_s']:.2f}s, {result['model_bytes'] / 1024:.0f} KiB, "
+                         f"{result['score_ms_per_1k']:.2f} ms/1k rows, "
+                         f"anomaly rate {result['anomaly_rate']:.2%} "
+                         f"({result['anomaly_rate_min']:.2%}-{result['anomaly_rate_max']:.2%})")
+        model = joblib.load(best["model_file"])
+        save_model(model, args.model_file, encoding)
+        if args.npz:
+            save_model(CompiledForest.from_sklearn(model), npz_path(args.model_file), encoding)
+
+    report = pd.DataFrame(results).drop(columns="model_file")
+    report["selected"] = report["trial"] == best["trial"]
+    report.to_csv(sweep_report_path(args.model_file), index=False)
+    logging.info(f"Selected trial {best['trial']} ({args.objective}); "
+                 f"results written to {sweep_report_path(args.model_file)}")
+
 def main(args):
+    channel = IpcChannel.open() if args.ipc else None
     configure_logging()
+    column_dtypes = FLOW_COLUMN_DTYPES if args.flows else COLUMN_DTYPES
     try:
-        X_train = load_data(args.data_file)
+        encoding = FeatureEncoding(list(column_dtypes), prefix_len=args.prefix_len,
+                                   internal_networks=args.internal_networks)
+    except ValueError as e:
+        logging.error(f"Invalid feature encoding: {e}")
+        return
+    if args.data_file is None:
+        args.data_file = FLOW_DATA_FILE if args.flows else DATA_FILE
+    shards = None
+    if is_sharded(args.data_file):
+        # Only the manifest is read to pick the shards in the requested window.
+        shards = select_shards(args.data_file, args.since, args.until, args.last_shards)
+        logging.info(f"Selected {len(shards)} shard(s) from {args.data_file}")
+    elif args.since is not None or args.until is not None or args.last_shards is not None:
+        logging.warning("--since, --until and --last-shards only apply to shard directories.")
+    try:
+        if args.sample_rows > 0:
+            X_train = load_sample(args.data_file, args.sample_rows, args.chunk_rows,
+                                  column_dtypes, shards, encoding)
+        else:
+            # The whole capture, memory-mapped rather than loaded.
+            X_train = load_data(args.data_file, column_dtypes, shards, mmap=True,
+                                encoding=encoding)
     except Exception as e:
         logging.error(f"Data loading failed: {e}")
         return
+    if args.sweep:
+        sweep(args, X_train, encoding, channel)
+        return
     
+    progress = None
+    if channel:
+        # The GUI draws its own progress bar from the frames.
+        progress = lambda built, total: channel.progress(built, total, "Training")
     model = train_isolation_forest(
         X_train,
         total_estimators=args.total_estimators,
         contamination=args.contamination,
-        n_jobs=args.n_jobs
+        n_jobs=args.n_jobs,
+        chunk_trees=args.chunk_trees,
+        progress=progress,
+        max_samples=args.max_samples,
+        max_features=args.max_features
     )
     
-    save_model(model, args.model_file)
-    evaluate_model(model, X_train)
+    save_model(model, args.model_file, encoding)
+    if args.npz:
+        save_model(CompiledForest.from_sklearn(model), npz_path(args.model_file), encoding)
+    if args.sample_rows > 0:
+        evaluation = (encoding.transform(chunk, MATRIX_DTYPE) for chunk in
+                      iter_chunks(args.data_file, args.chunk_rows, column_dtypes, shards))
+    else:
+        evaluation = (X_train[start:start + args.chunk_rows]
+                      for start in range(0, len(X_train), args.chunk_rows))
+    evaluate_model(model, evaluation)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Train an IsolationForest IDS model using captured network data."
     )
-    parser.add_argument("--data_file", type=str, default="packets/captured_packets.csv", 
-                        help="Path to the CSV data file.")
+    parser.add_argument("--data_file", type=str, default=None, 
+                        help=f"Path to the CSV data file, capture directory or shard directory "
+                             f"(default: {DATA_FILE}, or {FLOW_DATA_FILE} with --flows).")
     parser.add_argument("--model_file", type=str, default="models/model.joblib", 
                         help="Path to save the trained model.")
     parser.add_argument("--total_estimators", type=int, default=100, 
                         help="Total number of trees in the IsolationForest.")
     parser.add_argument("--contamination", type=float, default=0.05, 
                         help="Expected proportion of outliers in the data.")
+    parser.add_argument("--max-samples", type=parse_max_samples, default="auto",
+                        help="Rows drawn per tree: auto, a count, or a share of the rows.")
+    parser.add_argument("--max-features", type=float, default=1.0,
+                        help="Share of the features drawn per tree.")
     parser.add_argument("--n_jobs", type=int, default=-1, 
                         help="Number of parallel jobs to run (-1 uses all processors).")
+    parser.add_argument("--chunk-trees", type=int, default=DEFAULT_CHUNK_TREES,
+                        help="Trees built per parallel fit call (0 builds the whole forest at once).")
+    parser.add_argument("--sample-rows", type=int, default=DEFAULT_SAMPLE_ROWS,
+                        help="Maximum rows sampled from the capture for training (0 trains on the "
+                             "whole capture, memory-mapped as a float32 matrix).")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="Rows read at a time when streaming the capture.")
+    parser.add_argument("--since", type=parse_time, default=None,
+                        help="With a shard directory, only use shards with data after this time "
+                             "(ISO 8601, or relative such as 6h or 2d).")
+    parser.add_argument("--until", type=parse_time, default=None,
+                        help="With a shard directory, only use shards with data before this time.")
+    parser.add_argument("--last-shards", type=int, default=None,
+                        help="With a shard directory, only use the newest N selected shards.")
+    parser.add_argument("--flows", action="store_true",
+                        help="Train on flow records from packet_capture.py --flows.")
+    parser.add_argument("--internal-networks", type=str, nargs="*",
+                        default=list(DEFAULT_INTERNAL_NETWORKS),
+                        help="CIDR ranges encoded as internal networks (one feature value each; "
+                             "addresses outside all of them are encoded as external).")
+    parser.add_argument("--prefix-len", type=int, default=DEFAULT_PREFIX_LEN,
+                        help="Prefix length (at most 24) IP addresses are reduced to before training.")
+    parser.add_argument("--npz", action="store_true",
+                        help="Also write a compiled .npz model next to --model_file, "
+                             "which ids.py loads without sklearn.")
+    parser.add_argument("--sweep", action="store_true",
+                        help="Train a grid of configurations in parallel on the data loaded once, "
+                             "save the best under --objective and write a .sweep.csv report "
+                             "next to --model_file.")
+    parser.add_argument("--sweep-estimators", type=int, nargs="+", default=None,
+                        help="Tree counts to sweep (default: --total_estimators).")
+    parser.add_argument("--sweep-max-samples", type=parse_max_samples, nargs="+", default=None,
+                        help="max_samples values to sweep (default: --max-samples).")
+    parser.add_argument("--sweep-max-features", type=float, nargs="+", default=None,
+                        help="max_features values to sweep (default: --max-features).")
+    parser.add_argument("--sweep-contamination", type=float, nargs="+", default=None,
+                        help="Contamination values to sweep (default: --contamination).")
+    parser.add_argument("--sweep-workers", type=int, default=None,
+                        help="Worker processes for the sweep (default: one per CPU). Each "
+                             "forest is built on a single core.")
+    parser.add_argument("--holdout", type=float, default=DEFAULT_HOLDOUT,
+                        help="Share of the rows held out of sweep training to measure "
+                             "anomaly rates and latency on.")
+    parser.add_argument("--objective", choices=SWEEP_OBJECTIVES, default="fastest",
+                        help="How the sweep picks its model: lowest scoring latency, smallest "
+                             "model or fastest training within the target anomaly rate, or "
+                             "the rate closest to it.")
+    parser.add_argument("--target-rate", type=float, default=DEFAULT_TARGET_RATE,
+                        help="Held-out anomaly rate the swept model should flag.")
+    parser.add_argument("--rate-tolerance", type=float, default=DEFAULT_RATE_TOLERANCE,
+                        help="Accepted distance from --target-rate.")
+    parser.add_argument("--ipc", action="store_true",
+                        help="Stream framed progress messages on stdout (for gui.py); "
+                             "text output moves to stderr.")
     args = parser.parse_args()
     
     main(args)
@@ -0,0 +1,62 @@
+import io
+import os
+import sys
+import unittest
+import numpy as np
+
+# Tests import the scripts the same way the scripts import each other.
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts")
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from sklearn.ensemble import IsolationForest
+from forest import CompiledForest
+
+TOLERANCE = 1e-9
+
+class CompiledForestParityTest(unittest.TestCase):
+    """CompiledForest must score exactly like the sklearn model it was built from."""
+
+    @classmethod
+    def setUpClass(cls):
+        rng = np.random.default_rng(0)
+        # Repeated rows and a long tail, like captured traffic.
+        cls.X_train = np.vstack([rng.integers(0, 20, size=(4000, 6)),
+                                 rng.uniform(0, 1020, size=(1000, 6))]).astype(np.float32)
+        cls.X = np.vstack([cls.X_train[::7], rng.uniform(-100, 2000, size=(2000, 6))])
+        cls.models = {
+            "auto": IsolationForest(n_estimators=50, random_state=0).fit(cls.X_train),
+            "contamination": IsolationForest(n_estimators=50, contamination=0.05,
+                                             max_samples=512, max_features=0.5,
+                                             random_state=0).fit(cls.X_train),
+        }
+
+    def test_decision_function_matches_sklearn(self):
+        for name, model in self.models.items():
+            with self.subTest(model=name):
+                compiled = CompiledForest.from_sklearn(model)
+                np.testing.assert_allclose(compiled.decision_function(self.X),
+                                           model.decision_function(self.X),
+                                           rtol=0, atol=TOLERANCE)
+                np.testing.assert_array_equal(compiled.predict(self.X), model.predict(self.X))
+
+    def test_single_rows_match_sklearn(self):
+        model = self.models["contamination"]
+        compiled = CompiledForest.from_sklearn(model)
+        for row in self.X[:50]:
+            np.testing.assert_allclose(compiled.decision_function(row[None, :]),
+                                       model.decision_function(row[None, :]),
+                                       rtol=0, atol=TOLERANCE)
+
+    def test_npz_round_trip(self):
+        model = self.models["contamination"]
+        buffer = io.BytesIO()
+        CompiledForest.from_sklearn(model).save(buffer)
+        buffer.seek(0)
+        loaded = CompiledForest.load(buffer)
+        self.assertEqual(loaded.n_features_in_, model.n_features_in_)
+        np.testing.assert_allclose(loaded.decision_function(self.X),
+                                   model.decision_function(self.X), rtol=0, atol=TOLERANCE)
+
+if __name__ == "__main__":
+    unittest.main()